@@ -0,0 +1,119 @@
+"""
+Conversion of dataset rows to Apache Arrow record batches and Parquet
+files, typed from the bamboo schema.  Requires pyarrow.
+"""
+import calendar
+import datetime
+
+from pybamboo.exceptions import PyBambooException
+
+try:
+    import pyarrow
+    import pyarrow.parquet
+except ImportError:  # pragma: no cover
+    pyarrow = None
+
+
+DEFAULT_COMPRESSION = 'snappy'
+
+
+def _require_pyarrow():
+    if pyarrow is None:
+        raise PyBambooException('pyarrow is required for Arrow and Parquet '
+                                'exports.')
+
+
+def _arrow_type(simpletype):
+    return {
+        'integer': pyarrow.int64(),
+        'float': pyarrow.float64(),
+        'datetime': pyarrow.timestamp('ms', tz='UTC'),
+    }.get(simpletype, pyarrow.string())
+
+
+def arrow_schema(schema, columns=None, index=False):
+    """
+    Returns the pyarrow.Schema of the bamboo *schema* ({column:
+    {'simpletype': ...}}), restricted to *columns* if given, with an int64
+    'index' column first if *index*.
+    """
+    _require_pyarrow()
+    names = columns if columns is not None else sorted(schema)
+    fields = [pyarrow.field(name, _arrow_type(
+        schema.get(name, {}).get('simpletype'))) for name in names]
+    if index:
+        fields.insert(0, pyarrow.field('index', pyarrow.int64()))
+    return pyarrow.schema(fields)
+
+
+def _converter(arrow_type):
+    if arrow_type == pyarrow.int64():
+        convert = int
+    elif arrow_type == pyarrow.float64():
+        convert = float
+    elif arrow_type == pyarrow.string():
+        convert = unicode
+    else:
+        def convert(value):
+            if not isinstance(value, datetime.datetime):
+                raise ValueError(value)
+            return calendar.timegm(value.utctimetuple()) * 1000 + \
+                value.microsecond // 1000
+
+    def safe_convert(value):
+        if value is None:
+            return None
+        try:
+            return convert(value)
+        except (TypeError, ValueError):
+            return None
+    return safe_convert
+
+
+def record_batch(rows, schema):
+    """
+    Returns a pyarrow.RecordBatch of *rows* (row dicts) with the
+    pyarrow.Schema *schema*; values that do not fit a column are null.
+    """
+    _require_pyarrow()
+    arrays = []
+    for field in schema:
+        convert = _converter(field.type)
+        values = [convert(row.get(field.name)) for row in rows]
+        if isinstance(field.type, pyarrow.TimestampType):
+            arrays.append(pyarrow.array(values, pyarrow.int64())
+                          .cast(field.type))
+        else:
+            arrays.append(pyarrow.array(values, field.type))
+    return pyarrow.RecordBatch.from_arrays(arrays, schema=schema)
+
+
+def to_table(batches, schema):
+    """
+    Returns a pyarrow.Table of *batches* (an iterable of lists of row
+    dicts) with the pyarrow.Schema *schema*, one record batch per batch.
+    """
+    _require_pyarrow()
+    return pyarrow.Table.from_batches(
+        [record_batch(rows, schema) for rows in batches if rows], schema)
+
+
+def write_parquet(path, batches, schema, compression=DEFAULT_COMPRESSION):
+    """
+    Writes *batches* (an iterable of lists of row dicts) to the Parquet
+    file *path*, one row group per batch.  Returns the number of rows.
+    """
+    _require_pyarrow()
+    num_rows = 0
+    writer = pyarrow.parquet.ParquetWriter(path, schema,
+                                           compression=compression)
+    try:
+        for rows in batches:
+            if not rows:
+                continue
+            table = pyarrow.Table.from_batches([record_batch(rows, schema)])
+            writer.write_table(table)
+            num_rows += len(rows)
+    finally:
+        writer.close()
+    return num_rows
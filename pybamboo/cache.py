@@ -0,0 +1,146 @@
+import hashlib
+import os
+import tempfile
+
+import simplejson as json
+
+from pybamboo.columnar import ColumnarTable, open_table
+from pybamboo.deadline import Deadline
+from pybamboo.exceptions import PyBambooException
+
+
+CACHE_SUFFIX = '.col'
+DEFAULT_MAX_BYTES = 1 << 30
+
+
+def signature(info):
+    """
+    Returns what identifies a version of a dataset from its get_info():
+    its number of rows, last update and a hash of its schema.
+    """
+    schema = json.dumps(info.get('schema'), sort_keys=True)
+    return {
+        'num_rows': info.get('num_rows'),
+        'updated_at': info.get('updated_at'),
+        'schema': hashlib.md5(schema).hexdigest(),
+    }
+
+
+class DatasetCache(object):
+    """
+    An on-disk cache of dataset rows in the memory-mappable columnar format
+    of pybamboo.columnar, keyed by dataset id.
+
+    Entries are validated against the dataset's get_info() and the least
+    recently used ones are evicted to keep the cache under *max_bytes*.
+    """
+
+    def __init__(self, directory, max_bytes=DEFAULT_MAX_BYTES):
+        if not os.path.isdir(directory):
+            os.makedirs(directory)
+        self.directory = directory
+        self.max_bytes = max_bytes
+
+    def path(self, key):
+        if not key or os.sep in key or key.startswith('.'):
+            raise PyBambooException('Invalid cache key: %r.' % key)
+        return os.path.join(self.directory, key + CACHE_SUFFIX)
+
+    def get(self, key, info):
+        """
+        Returns the cached MappedTable for *key* if it matches *info*,
+        None otherwise (stale and corrupt entries are removed).  The table
+        must be closed once done with.
+        """
+        path = self.path(key)
+        if not os.path.exists(path):
+            return None
+        try:
+            table = open_table(path)
+        except PyBambooException:
+            # cut short or written by another version
+            self._remove(path)
+            return None
+        if table.meta.get('signature') != signature(info):
+            table.close()
+            self._remove(path)
+            return None
+        os.utime(path, None)  # mark as recently used
+        return table
+
+    def put(self, key, info, rows):
+        """
+        Stores *rows* (row dicts typed with info['schema']) under *key* and
+        returns them as a MappedTable, to be closed once done with.
+        """
+        table = ColumnarTable.from_rows(
+            rows, info.get('schema'), {'signature': signature(info)})
+        path = self.path(key)
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+        os.close(fd)
+        try:
+            table.write(tmp_path)
+            os.rename(tmp_path, path)
+        except Exception:
+            self._remove(tmp_path)
+            raise
+        self.evict(keep=path)
+        return open_table(path)
+
+    def fetch(self, dataset, deadline=None, query=None, values=None):
+        """
+        Returns the rows of *dataset* as a MappedTable, downloading them
+        only if the cached ones are missing or out of date.  The table must
+        be closed once done with, e.g. by using it as a context manager.
+
+        With a pybamboo.query.PreparedQuery of get_data() as *query*, the
+        rows it returns with its Params bound to *values* are cached, keyed
+        by query.key().
+        """
+        deadline = Deadline.coerce(deadline)
+        info = dataset.get_info(deadline=deadline)
+        values = values or {}
+        key = dataset.id if query is None else query.key(**values)
+        table = self.get(key, info)
+        if table is None:
+            if query is None:
+                rows = dataset.get_data(deadline=deadline)
+            else:
+                rows = query.execute(deadline=deadline, **values)
+            if isinstance(rows, dict):
+                raise PyBambooException(rows.get('error', rows))
+            table = self.put(key, info, rows)
+        return table
+
+    def evict(self, keep=None):
+        """
+        Removes the least recently used entries until the cache fits in
+        max_bytes, never removing *keep*.
+        """
+        entries = []
+        total = 0
+        for name in os.listdir(self.directory):
+            if not name.endswith(CACHE_SUFFIX):
+                continue
+            path = os.path.join(self.directory, name)
+            stat = os.stat(path)
+            entries.append((stat.st_mtime, stat.st_size, path))
+            total += stat.st_size
+        entries.sort()
+        for mtime, size, path in entries:
+            if total <= self.max_bytes:
+                break
+            if path != keep:
+                self._remove(path)
+                total -= size
+
+    def clear(self):
+        for name in os.listdir(self.directory):
+            if name.endswith(CACHE_SUFFIX):
+                self._remove(os.path.join(self.directory, name))
+
+    def _remove(self, path):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
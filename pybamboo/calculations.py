@@ -0,0 +1,128 @@
+"""
+Declarative management of the calculations of a dataset: the calculations
+wanted are compared with those bamboo has, by name, formula and group, and
+only the differences are removed and added.
+"""
+import re
+
+from pybamboo.deadline import Deadline
+from pybamboo.exceptions import PyBambooException
+from pybamboo.parallel import DEFAULT_WORKERS, ordered_map
+
+
+DEFAULT_BATCH_SIZE = 50
+
+
+def calculation_key(calculation):
+    """
+    Returns the (name, formula, group) identifying *calculation*, a dict
+    with a name, a formula and an optional group (a list of columns or a
+    comma separated string, as bamboo returns it).
+    """
+    name = calculation.get('name')
+    formula = calculation.get('formula')
+    if not isinstance(name, basestring) or \
+            not isinstance(formula, basestring):
+        raise PyBambooException('name & formula must be strings.')
+    group = calculation.get('group', calculation.get('groups')) or ()
+    if isinstance(group, basestring):
+        group = group.split(',')
+    if not isinstance(group, (list, tuple)):
+        raise PyBambooException('group must be a list of strings.')
+    return name, formula.strip(), tuple(column.strip() for column in group)
+
+
+def diff(current, desired):
+    """
+    Returns the names of the calculations to remove from *current* and
+    the calculations of *desired* to add, as lists.
+
+    bamboo removes calculations by name, so when a calculation changes
+    every calculation with its name is removed and those of them still
+    desired are added again.
+    """
+    current_keys = set(calculation_key(calculation)
+                       for calculation in current)
+    desired_keys = []
+    for calculation in desired:
+        key = calculation_key(calculation)
+        if key in desired_keys:
+            raise PyBambooException('Duplicate calculation: %s.' % key[0])
+        desired_keys.append(key)
+    removed = set(name for name, formula, group in
+                  current_keys.difference(desired_keys))
+    added = [key for key in desired_keys
+             if key not in current_keys or key[0] in removed]
+    return sorted(removed), added
+
+
+def _references(formula, name):
+    return re.search(r'(?<![\w.])%s(?!\w)' % re.escape(name),
+                     formula) is not None
+
+
+def waves(added):
+    """
+    Orders the calculation keys *added* in lists that can be added
+    concurrently: a calculation whose formula uses the name of another
+    added calculation comes in a later list than it.
+    """
+    levels = {}
+
+    def level(key, seen=()):
+        if key not in levels:
+            dependencies = [other for other in added
+                            if other[0] != key[0] and other not in seen
+                            and _references(key[1], other[0])]
+            levels[key] = 1 + max([level(other, seen + (key,))
+                                   for other in dependencies] or [-1])
+        return levels[key]
+
+    ordered = [[] for i in xrange(max([level(key) for key in added] or
+                                      [-1]) + 1)]
+    for key in added:
+        ordered[levels[key]].append(key)
+    return ordered
+
+
+def sync_calculations(dataset, desired, batch_size=DEFAULT_BATCH_SIZE,
+                      workers=DEFAULT_WORKERS, dry_run=False, deadline=None):
+    """
+    Makes the calculations of *dataset* those of *desired*, a list of
+    dicts with a name, a formula and an optional group.  Calculations
+    are removed up to *workers* at once, then added in batches of
+    *batch_size*; unchanged calculations are left alone.  With *dry_run*
+    nothing is sent.
+    Returns the names of the calculations {'added': [...],
+    'removed': [...]}.
+    """
+    deadline = Deadline.coerce(deadline)
+    current = dataset.get_calculations(deadline=deadline)
+    if isinstance(current, dict):
+        raise PyBambooException(current.get('error', current))
+    removed, added = diff(current, desired)
+    if dry_run:
+        return {'added': [key[0] for key in added], 'removed': removed}
+
+    def remove(name):
+        if not dataset.remove_calculation(name, deadline=deadline):
+            raise PyBambooException('Could not remove calculation %s.'
+                                    % name)
+
+    def add(batch):
+        calculations = []
+        for name, formula, group in batch:
+            calculation = {'name': name, 'formula': formula}
+            if group:
+                calculation['group'] = ','.join(group)
+            calculations.append(calculation)
+        if not dataset.add_calculations(json=calculations,
+                                        deadline=deadline):
+            raise PyBambooException('Could not add calculations %s.' %
+                                    ', '.join(key[0] for key in batch))
+
+    list(ordered_map(remove, removed, workers))
+    for wave in waves(added):
+        list(ordered_map(add, [wave[i:i + batch_size] for i in
+                               xrange(0, len(wave), batch_size)], workers))
+    return {'added': [key[0] for key in added], 'removed': removed}
@@ -0,0 +1,293 @@
+"""
+The pybamboo command line tool: bulk import, export and merge of datasets.
+
+    pybamboo import data/*.csv                 # one new dataset per file
+    pybamboo import --dataset ID data/*.csv    # append to a dataset
+    pybamboo export ID --format json -o rows.json
+    pybamboo merge ID ID [ID ...]
+    pybamboo sync ID data.csv --key KEY        # send only the differences
+"""
+import argparse
+import csv
+import datetime
+import os
+import sys
+import time
+
+import simplejson as json
+from bson import json_util
+
+from pybamboo.connection import Connection, DEFAULT_BAMBOO_URL
+from pybamboo.dataset import Dataset
+from pybamboo.exceptions import PyBambooException
+from pybamboo.parallel import DEFAULT_WORKERS, ordered_map
+from pybamboo.utils import decode_csv_rows
+
+
+DEFAULT_BATCH_SIZE = 1000
+
+
+class Progress(object):
+    """
+    Reports the progress and throughput of a command on *stream*.
+    """
+
+    def __init__(self, label, stream=sys.stderr, clock=time.time):
+        self.label = label
+        self.stream = stream
+        self.clock = clock
+        self.start = clock()
+        self.rows = 0
+        self.items = 0
+
+    def status(self):
+        elapsed = max(self.clock() - self.start, 1e-6)
+        return '%s: %d rows, %d items in %.1fs (%.1f rows/s)' % (
+            self.label, self.rows, self.items, elapsed, self.rows / elapsed)
+
+    def update(self, rows=0, items=0):
+        self.rows += rows
+        self.items += items
+        self.stream.write('\r' + self.status())
+        self.stream.flush()
+
+    def report(self):
+        self.stream.write('\r' + self.status() + '\n')
+        self.stream.flush()
+
+
+def data_format(path, data_format=None):
+    """
+    Returns the format (csv | json) of the file at *path*.
+    """
+    data_format = data_format or os.path.splitext(path)[1][1:].lower()
+    if data_format not in Dataset.DATA_FORMATS:
+        raise PyBambooException('Cannot tell the format of %s, use '
+                                '--format.' % path)
+    return data_format
+
+
+def read_rows(path, data_format):
+    """
+    Iterates over the rows (dicts) of a CSV or JSON file.
+    """
+    if data_format == 'csv':
+        with open(path, 'rb') as f:
+            for row in decode_csv_rows(csv.DictReader(f)):
+                yield row
+    else:
+        with open(path) as f:
+            rows = json.load(f)
+        if not isinstance(rows, list):
+            raise PyBambooException('%s must contain a list of rows.' % path)
+        for row in rows:
+            yield row
+
+
+def batches(rows, batch_size):
+    """
+    Groups an iterable of *rows* in lists of at most *batch_size* rows.
+    """
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def import_files(connection, paths, dataset_id=None, file_format=None,
+                 batch_size=DEFAULT_BATCH_SIZE, workers=DEFAULT_WORKERS,
+                 schema_path=None, na_values=None, progress=None):
+    """
+    Creates one dataset per file of *paths*, or appends their rows to the
+    dataset *dataset_id* in batches of *batch_size* rows, sending up to
+    *workers* requests concurrently.  Returns the ids of the datasets.
+    """
+    if dataset_id is not None:
+        dataset = Dataset(dataset_id, connection=connection)
+
+        def append(batch):
+            if not dataset.update_data(batch):
+                raise PyBambooException('Could not append %d rows to %s.'
+                                        % (len(batch), dataset_id))
+            return len(batch)
+
+        rows = (row for path in paths
+                for row in read_rows(path, data_format(path, file_format)))
+        for count in ordered_map(append, batches(rows, batch_size), workers):
+            if progress is not None:
+                progress.update(rows=count, items=1)
+        return [dataset_id]
+
+    def create(path):
+        dataset = Dataset(path=path, data_format=data_format(path,
+                                                             file_format),
+                          schema_path=schema_path, na_values=na_values,
+                          connection=connection)
+        if not dataset.id:
+            raise PyBambooException('Could not create a dataset from %s.'
+                                    % path)
+        return dataset.id
+
+    ids = []
+    for dataset_id in ordered_map(create, paths, workers):
+        ids.append(dataset_id)
+        if progress is not None:
+            progress.update(items=1)
+    return ids
+
+
+def _csv_value(value):
+    if value is None:
+        return ''
+    if isinstance(value, datetime.datetime):
+        return value.isoformat()
+    if isinstance(value, unicode):
+        return value.encode('utf-8')
+    return value
+
+
+def export_dataset(connection, dataset_id, output, file_format='csv',
+                   select=None, query=None, batch_size=DEFAULT_BATCH_SIZE,
+                   workers=DEFAULT_WORKERS, progress=None):
+    """
+    Streams the rows of the dataset *dataset_id* to the file-like *output*
+    as CSV or JSON, fetching batches of *batch_size* rows with up to
+    *workers* concurrent requests.  Returns the number of rows written.
+    """
+    dataset = Dataset(dataset_id, connection=connection)
+    columns = select or dataset.columns
+    writer = None
+    if file_format == 'csv':
+        writer = csv.writer(output)
+        writer.writerow([_csv_value(column) for column in columns])
+    else:
+        output.write('[')
+    count = 0
+    for batch in dataset.iter_batches(select=select, query=query,
+                                      batch_size=batch_size,
+                                      workers=workers):
+        for row in batch:
+            if writer is not None:
+                writer.writerow([_csv_value(row.get(column))
+                                 for column in columns])
+            else:
+                output.write(',\n' if count else '\n')
+                output.write(json.dumps(row, default=json_util.default))
+            count += 1
+        if progress is not None:
+            progress.update(rows=len(batch), items=1)
+    if writer is None:
+        output.write('\n]\n')
+    return count
+
+
+def merge_datasets(connection, dataset_ids):
+    """
+    Merges the datasets *dataset_ids* and returns the id of the result.
+    """
+    datasets = [Dataset(dataset_id, connection=connection)
+                for dataset_id in dataset_ids]
+    result = Dataset.merge(datasets, connection=connection)
+    if not result:
+        raise PyBambooException('Could not merge %s.' %
+                                ', '.join(dataset_ids))
+    return result.id
+
+
+def parser():
+    parser = argparse.ArgumentParser(
+        prog='pybamboo', description='Bulk operations on bamboo datasets.')
+    parser.add_argument('--url', default=DEFAULT_BAMBOO_URL,
+                        help='the bamboo instance (default: %(default)s)')
+    parser.add_argument('--workers', type=int, default=DEFAULT_WORKERS,
+                        help='concurrent requests (default: %(default)s)')
+    parser.add_argument('--quiet', action='store_true',
+                        help='do not report progress')
+    commands = parser.add_subparsers(dest='command')
+
+    command = commands.add_parser(
+        'import', help='create datasets from files or append files to one')
+    command.add_argument('paths', nargs='+', metavar='FILE')
+    command.add_argument('--dataset', help='append to this dataset id')
+    command.add_argument('--format', choices=Dataset.DATA_FORMATS,
+                         help='format of the files (default: extension)')
+    command.add_argument('--batch-size', type=int,
+                         default=DEFAULT_BATCH_SIZE,
+                         help='rows per appended batch')
+    command.add_argument('--schema', help='path to a JSON SDF schema')
+    command.add_argument('--na-values', help='comma separated n/a values')
+
+    command = commands.add_parser('export', help='stream a dataset out')
+    command.add_argument('dataset')
+    command.add_argument('--format', choices=Dataset.DATA_FORMATS,
+                         default='csv')
+    command.add_argument('-o', '--output', help='file (default: stdout)')
+    command.add_argument('--select', help='comma separated columns')
+    command.add_argument('--query', help='a JSON MongoDB query')
+    command.add_argument('--batch-size', type=int,
+                         default=DEFAULT_BATCH_SIZE,
+                         help='rows per fetched batch')
+
+    command = commands.add_parser('merge', help='merge datasets row-wise')
+    command.add_argument('datasets', nargs='+', metavar='DATASET')
+
+    command = commands.add_parser(
+        'sync', help='make a dataset match a CSV file, sending differences')
+    command.add_argument('dataset')
+    command.add_argument('path', metavar='FILE')
+    command.add_argument('--key', required=True,
+                         help='the column identifying rows')
+    command.add_argument('--batch-size', type=int,
+                         default=DEFAULT_BATCH_SIZE,
+                         help='rows per fetched and added batch')
+    command.add_argument('--dry-run', action='store_true',
+                         help='only count the differences')
+    return parser
+
+
+def main(argv=None, connection=None, stdout=sys.stdout, stderr=sys.stderr):
+    args = parser().parse_args(argv)
+    if connection is None:
+        connection = Connection(args.url, pool_size=max(args.workers, 1))
+    progress = None if args.quiet else Progress(args.command, stderr)
+    try:
+        if args.command == 'import':
+            na_values = args.na_values.split(',') if args.na_values else None
+            for dataset_id in import_files(
+                    connection, args.paths, args.dataset, args.format,
+                    args.batch_size, args.workers, args.schema, na_values,
+                    progress):
+                stdout.write('%s\n' % dataset_id)
+        elif args.command == 'export':
+            select = args.select.split(',') if args.select else None
+            query = json.loads(args.query) if args.query else None
+            output = open(args.output, 'wb') if args.output else stdout
+            try:
+                export_dataset(connection, args.dataset, output, args.format,
+                               select, query, args.batch_size, args.workers,
+                               progress)
+            finally:
+                if args.output:
+                    output.close()
+        elif args.command == 'merge':
+            stdout.write('%s\n' % merge_datasets(connection, args.datasets))
+        else:
+            counts = Dataset(args.dataset, connection=connection).sync(
+                args.path, args.key, args.batch_size, args.workers,
+                args.dry_run)
+            stdout.write('%(added)d added, %(updated)d updated, '
+                         '%(deleted)d deleted\n' % counts)
+    except (PyBambooException, IOError, ValueError) as e:
+        stderr.write('pybamboo: error: %s\n' % e)
+        return 1
+    if progress is not None:
+        progress.report()
+    return 0
+
+
+if __name__ == '__main__':  # pragma: no cover
+    sys.exit(main())
@@ -0,0 +1,411 @@
+import array
+import calendar
+import datetime
+import mmap
+import os
+import struct
+
+import simplejson as json
+from bson.tz_util import utc
+
+from pybamboo.exceptions import PyBambooException
+
+try:
+    import numpy
+except ImportError:  # pragma: no cover
+    numpy = None
+
+
+MAGIC = 'PYBCOL2\n'
+ALIGNMENT = 8
+
+INTEGER = 'integer'
+NUMBER = 'number'
+DATETIME = 'datetime'
+STRING = 'string'
+SIMPLETYPES = {
+    'integer': INTEGER,
+    'float': NUMBER,
+    'datetime': DATETIME,
+}
+
+NAN = float('nan')
+INT64_RANGE = (-1 << 63, (1 << 63) - 1)
+
+
+def column_type(simpletype, values):
+    """
+    Returns the storage type (integer | number | datetime | string) of a
+    column from its bamboo *simpletype*, or from its *values* if it has
+    none.
+    """
+    if simpletype is not None:
+        return SIMPLETYPES.get(simpletype, STRING)
+    for value in values:
+        if value is None:
+            continue
+        if isinstance(value, bool) or \
+                not isinstance(value, (int, long, float)):
+            return STRING
+    return NUMBER
+
+
+def _to_number(value):
+    if value is None or isinstance(value, bool):
+        return NAN
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return NAN
+
+
+def _to_integer(value):
+    if value is None or isinstance(value, bool):
+        return None
+    for convert in (int, lambda value: int(float(value))):
+        try:
+            value = convert(value)
+        except (TypeError, ValueError, OverflowError):
+            continue
+        if INT64_RANGE[0] <= value <= INT64_RANGE[1]:
+            return value
+        return None
+    return None
+
+
+def _to_timestamp(value):
+    if isinstance(value, datetime.datetime):
+        return calendar.timegm(value.utctimetuple()) + \
+            value.microsecond / 1e6
+    return _to_number(value)
+
+
+def decode_value(kind, value):
+    """
+    Turns a double stored for a column of type *kind* back into a value.
+    """
+    if value != value:  # NaN
+        return None
+    if kind == INTEGER:
+        return int(value)
+    if kind == DATETIME:
+        return datetime.datetime.fromtimestamp(value, utc)
+    return float(value)
+
+
+class ColumnarTable(object):
+    """
+    Rows of a dataset stored column by column.
+
+    Number and datetime columns are arrays of doubles (NaN for n/a,
+    datetimes as seconds since the epoch), integer and string columns are
+    lists (None for n/a).  Integers are kept exact: they are only turned
+    into doubles by array().
+    """
+
+    def __init__(self, columns, types, data, num_rows, meta=None):
+        self.columns = list(columns)
+        self.types = dict(types)
+        self.num_rows = num_rows
+        self.meta = meta or {}
+        self._data = data
+
+    @classmethod
+    def from_rows(cls, rows, schema=None, meta=None):
+        """
+        Builds a table from an iterable of row dicts, read through once,
+        typing the columns from the bamboo *schema* ({column:
+        {'simpletype': ...}}) when given.
+        """
+        schema = schema or {}
+        columns = []
+        values = {}
+        num_rows = 0
+        for row in rows:
+            for name in row:
+                if name not in values:
+                    columns.append(name)
+                    values[name] = [None] * num_rows
+            for name in columns:
+                values[name].append(row.get(name))
+            num_rows += 1
+        types = {}
+        data = {}
+        for name in columns:
+            column = values.pop(name)
+            types[name] = column_type(
+                schema.get(name, {}).get('simpletype'), column)
+            if types[name] == INTEGER:
+                data[name] = map(_to_integer, column)
+            elif types[name] == NUMBER:
+                data[name] = array.array('d', map(_to_number, column))
+            elif types[name] == DATETIME:
+                data[name] = array.array('d', map(_to_timestamp, column))
+            else:
+                data[name] = [None if value is None else unicode(value)
+                              for value in column]
+        return cls(columns, types, data, num_rows, meta)
+
+    def __len__(self):
+        return self.num_rows
+
+    def close(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def array(self, name):
+        """
+        The doubles of a numeric or datetime column: a numpy array if
+        numpy is installed, an array.array otherwise.  Integers are
+        converted, so those above 2**53 lose precision.
+        """
+        kind = self.types[name]
+        if kind == STRING:
+            raise PyBambooException('%s is not a numeric column.' % name)
+        values = self._data[name]
+        if kind == INTEGER:
+            values = array.array('d', [NAN if value is None else value
+                                       for value in values])
+        if numpy is not None:
+            return numpy.frombuffer(values, dtype='<f8')
+        return values
+
+    def column(self, name):
+        """
+        Returns the values of column *name* as a list, n/a being None.
+        """
+        kind = self.types[name]
+        values = self._data[name]
+        if kind in (INTEGER, STRING):
+            return list(values)
+        return [decode_value(kind, value) for value in values]
+
+    def rows(self):
+        """
+        Iterates over the rows as dicts.
+        """
+        columns = [(name, self.column(name)) for name in self.columns]
+        for i in xrange(self.num_rows):
+            yield dict((name, values[i]) for name, values in columns)
+
+    def to_dataframe(self):
+        """
+        Returns this table as a pandas.DataFrame.
+        """
+        try:
+            import pandas
+        except ImportError:
+            raise PyBambooException('pandas is required to build '
+                                    'DataFrames.')
+        data = {}
+        for name in self.columns:
+            if self.types[name] in (NUMBER, INTEGER):
+                data[name] = self.array(name)
+            else:
+                data[name] = self.column(name)
+        return pandas.DataFrame(data, columns=self.columns)
+
+    def write(self, path):
+        """
+        Writes this table to *path* in the memory-mappable columnar format
+        read by MappedTable.
+        """
+        segments = []
+        specs = []
+        offset = 0
+        for name in self.columns:
+            kind = self.types[name]
+            spec = {'name': name, 'type': kind}
+            values = self._data[name]
+            if kind == STRING:
+                offsets = array.array('d')  # doubles are exact up to 2**53
+                blob = []
+                position = 0
+                for value in values:
+                    offsets.append(position)
+                    encoded = (value or u'').encode('utf-8')
+                    blob.append(encoded)
+                    position += len(encoded)
+                offsets.append(position)
+                parts = [('offsets', _pack(offsets)),
+                         ('nulls', _nulls(values)),
+                         ('blob', ''.join(blob))]
+            elif kind == INTEGER:
+                parts = [('values', _pack_integers(values)),
+                         ('nulls', _nulls(values))]
+            else:
+                parts = [('values', _pack(self._data[name]))]
+            for part, payload in parts:
+                spec[part] = [offset, len(payload)]
+                padding = -len(payload) % ALIGNMENT
+                segments.append(payload + '\x00' * padding)
+                offset += len(payload) + padding
+            specs.append(spec)
+
+        header = json.dumps({'num_rows': self.num_rows, 'columns': specs,
+                             'meta': self.meta})
+        header += ' ' * (-(len(MAGIC) + 8 + len(header)) % ALIGNMENT)
+        with open(path, 'wb') as f:
+            f.write(MAGIC)
+            f.write(struct.pack('<Q', len(header)))
+            f.write(header)
+            for segment in segments:
+                f.write(segment)
+
+
+BIG_ENDIAN = struct.pack('=d', 1.0) != struct.pack('<d', 1.0)
+
+
+def _pack(values):
+    values = array.array('d', values)
+    if BIG_ENDIAN:  # pragma: no cover
+        values.byteswap()
+    return values.tostring()
+
+
+def _pack_integers(values):
+    return struct.pack('<%dq' % len(values),
+                       *[0 if value is None else value for value in values])
+
+
+def _nulls(values):
+    return ''.join('\x01' if value is None else '\x00' for value in values)
+
+
+def _unpack(string):
+    values = array.array('d')
+    values.fromstring(string)
+    if BIG_ENDIAN:  # pragma: no cover
+        values.byteswap()
+    return values
+
+
+class MappedTable(ColumnarTable):
+    """
+    A ColumnarTable read from a file written by ColumnarTable.write().
+
+    The file is memory-mapped: columns are only decoded when accessed, into
+    copies that remain valid once the table is closed.  Close it when done,
+    or use it as a context manager.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._file = open(path, 'rb')
+        try:
+            self._map = mmap.mmap(self._file.fileno(), 0,
+                                  access=mmap.ACCESS_READ)
+        except (mmap.error, ValueError):
+            self._file.close()
+            raise PyBambooException('%s is not a columnar file.' % path)
+        try:
+            self._read_header()
+        except (struct.error, ValueError, KeyError, TypeError):
+            # cut short or corrupt
+            self.close()
+            raise PyBambooException('%s is not a columnar file.' % path)
+
+    def _read_header(self):
+        if self._map[:len(MAGIC)] != MAGIC:
+            raise ValueError('no magic number')
+        start = len(MAGIC) + 8
+        length, = struct.unpack('<Q', self._map[len(MAGIC):start])
+        header = json.loads(self._map[start:start + length])
+        self._base = start + length
+        self._specs = dict((spec['name'], spec)
+                           for spec in header['columns'])
+        for spec in header['columns']:
+            for part in ('values', 'offsets', 'nulls', 'blob'):
+                if part in spec and \
+                        self._base + sum(spec[part]) > len(self._map):
+                    raise ValueError('%s is cut short' % spec['name'])
+        ColumnarTable.__init__(
+            self, [spec['name'] for spec in header['columns']],
+            dict((spec['name'], spec['type'])
+                 for spec in header['columns']),
+            {}, int(header['num_rows']), dict(header['meta']))
+
+    @property
+    def size(self):
+        return len(self._map)
+
+    def close(self):
+        if getattr(self, '_map', None) is not None:
+            self._map.close()
+            self._map = None
+        self._file.close()
+
+    def _segment(self, name, part):
+        offset, length = self._specs[name][part]
+        return self._base + offset, length
+
+    def _doubles(self, name, part):
+        offset, length = self._segment(name, part)
+        if numpy is not None:
+            # a view on the mapping would outlive close()
+            return numpy.frombuffer(self._map, dtype='<f8',
+                                    count=length // 8, offset=offset).copy()
+        return _unpack(self._map[offset:offset + length])
+
+    def _integers(self, name):
+        offset, length = self._segment(name, 'values')
+        if numpy is not None:
+            # a view on the mapping would outlive close()
+            return numpy.frombuffer(self._map, dtype='<i8',
+                                    count=length // 8, offset=offset).copy()
+        return struct.unpack('<%dq' % (length // 8),
+                             self._map[offset:offset + length])
+
+    def _is_null(self, name):
+        offset, length = self._segment(name, 'nulls')
+        return [null == '\x01' for null in self._map[offset:offset + length]]
+
+    def array(self, name):
+        kind = self.types[name]
+        if kind == STRING:
+            raise PyBambooException('%s is not a numeric column.' % name)
+        if kind != INTEGER:
+            return self._doubles(name, 'values')
+        values = array.array('d', [
+            NAN if null else value
+            for value, null in zip(self._integers(name),
+                                   self._is_null(name))])
+        if numpy is not None:
+            return numpy.frombuffer(values, dtype='<f8')
+        return values
+
+    def column(self, name):
+        kind = self.types[name]
+        if kind == INTEGER:
+            return [None if null else int(value)
+                    for value, null in zip(self._integers(name),
+                                           self._is_null(name))]
+        if kind != STRING:
+            return [decode_value(kind, float(value))
+                    for value in self._doubles(name, 'values')]
+        offsets = [int(value) for value in self._doubles(name, 'offsets')]
+        nulls_offset, _ = self._segment(name, 'nulls')
+        blob_offset, _ = self._segment(name, 'blob')
+        values = []
+        for i in xrange(self.num_rows):
+            if self._map[nulls_offset + i] == '\x01':
+                values.append(None)
+            else:
+                values.append(self._map[blob_offset + offsets[i]:
+                                        blob_offset + offsets[i + 1]]
+                              .decode('utf-8'))
+        return values
+
+
+def open_table(path):
+    """
+    Memory-maps the columnar file at *path*.
+    """
+    if not os.path.exists(path):
+        raise PyBambooException('%s does not exist.' % path)
+    return MappedTable(path)
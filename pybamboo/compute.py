@@ -0,0 +1,220 @@
+"""
+Local, vectorised implementations of bamboo's resample and rolling
+computations on pybamboo.columnar tables.  Requires numpy.
+
+The results follow the pandas semantics used by the bamboo server:
+
+    * resample bins fixed intervals (S, T/min, H, D, with an optional
+      multiple such as 6H) on the left edge and labels them with it, and
+      bins W (weeks ending on Sunday), M (months) and A/Y (years) on the
+      calendar period labelled by its last day.  Empty bins in between are
+      kept, with n/a values (0 for count).
+    * rolling computes the weighted mean over *window* rows with the
+      periodic scipy window *win_type*; windows containing n/a are n/a.
+
+Only number and integer columns are resampled or rolled.
+"""
+import re
+
+from pybamboo.columnar import DATETIME, INTEGER, NUMBER, decode_value
+from pybamboo.exceptions import PyBambooException
+
+try:
+    import numpy
+except ImportError:  # pragma: no cover
+    numpy = None
+
+
+SECONDS = {
+    'S': 1,
+    'T': 60,
+    'MIN': 60,
+    'H': 3600,
+    'D': 86400,
+}
+CALENDAR_INTERVALS = ['W', 'M', 'A', 'Y']
+HOWS = ['mean', 'sum', 'min', 'max', 'median', 'first', 'last', 'std',
+        'count']
+WIN_TYPES = ['boxcar', 'triang', 'hamming', 'hann', 'hanning', 'blackman',
+             'bartlett']
+DAY = 86400
+
+
+def _require_numpy():
+    if numpy is None:
+        raise PyBambooException('numpy is required for local computations.')
+
+
+def _numeric_columns(table, exclude=()):
+    return [name for name in table.columns
+            if table.types[name] in (NUMBER, INTEGER)
+            and name not in exclude]
+
+
+def _bins(timestamps, interval):
+    """
+    Returns (keys, stride, label) for *interval*: integer bin keys for the
+    timestamps, the step between consecutive bins and a function turning
+    an array of keys into their labels (in seconds since the epoch).
+    """
+    match = re.match(r'^(\d*)([A-Za-z]+)$', interval)
+    if match is None:
+        raise PyBambooException('Unsupported interval: %s.' % interval)
+    multiple = int(match.group(1) or 1)
+    unit = match.group(2).upper()
+    if unit in SECONDS:
+        step = SECONDS[unit] * multiple
+        origin = numpy.floor(timestamps.min() / DAY) * DAY
+        keys = numpy.floor((timestamps - origin) / step).astype('int64')
+        return keys, 1, lambda k: origin + k * step
+    if multiple != 1 or unit not in CALENDAR_INTERVALS:
+        raise PyBambooException('Unsupported interval: %s.' % interval)
+    days = numpy.floor(timestamps / DAY).astype('int64')
+    if unit == 'W':
+        # 1970-01-01 is a Thursday, weeks end on Sunday
+        keys = days + (6 - (days + 3) % 7) % 7
+        return keys, 7, lambda k: k * float(DAY)
+    period = 'M' if unit == 'M' else 'Y'
+    keys = days.astype('datetime64[D]').astype('datetime64[%s]' % period)
+    keys = keys.astype('int64')
+
+    def label(k):
+        ends = (k + 1).astype('datetime64[%s]' % period)
+        ends = ends.astype('datetime64[D]').astype('int64') - 1
+        return ends * float(DAY)
+    return keys, 1, label
+
+
+def _aggregate(values, bins, num_bins, how, timestamps):
+    present = ~numpy.isnan(values)
+    counts = numpy.bincount(bins[present], minlength=num_bins)
+    if how == 'count':
+        return counts.astype('float64')
+    if how in ('sum', 'mean'):
+        # bincount() returns integers when no value is present
+        sums = numpy.bincount(bins[present], weights=values[present],
+                              minlength=num_bins).astype('float64')
+        with numpy.errstate(invalid='ignore', divide='ignore'):
+            result = sums if how == 'sum' else sums / counts
+        result[counts == 0] = numpy.nan
+        return result
+    result = numpy.empty(num_bins)
+    result.fill(numpy.nan)
+    # first and last follow the timestamps, not the order of the rows
+    order = numpy.lexsort((timestamps[present], bins[present]))
+    sorted_bins = bins[present][order]
+    sorted_values = values[present][order]
+    bounds = numpy.flatnonzero(numpy.diff(sorted_bins)) + 1
+    reducers = {
+        'min': numpy.min,
+        'max': numpy.max,
+        'median': numpy.median,
+        'first': lambda group: group[0],
+        'last': lambda group: group[-1],
+        'std': lambda group: group.std(ddof=1) if len(group) > 1
+        else numpy.nan,
+    }
+    starts = numpy.concatenate(([0], bounds)) if len(sorted_bins) else []
+    for start, group in zip(starts, numpy.split(sorted_values, bounds)):
+        if len(group):
+            result[sorted_bins[start]] = reducers[how](group)
+    return result
+
+
+def resample(table, date_column, interval, how='mean'):
+    """
+    Resamples the number columns of *table* on its datetime column
+    *date_column* by *interval*, aggregating with *how*.  Returns a list
+    of rows like Dataset.resample().
+    """
+    _require_numpy()
+    how = how or 'mean'
+    if how not in HOWS:
+        raise PyBambooException('how must be one of: %s.' % HOWS)
+    if table.types.get(date_column) != DATETIME:
+        raise PyBambooException('%s is not a datetime column.' % date_column)
+    timestamps = numpy.asarray(table.array(date_column), dtype='float64')
+    dated = ~numpy.isnan(timestamps)
+    if not dated.any():
+        return []
+    timestamps = timestamps[dated]
+    keys, stride, label = _bins(timestamps, interval)
+    first = keys.min()
+    bins = (keys - first) // stride
+    num_bins = int(bins.max()) + 1
+
+    labels = label(first + numpy.arange(num_bins) * stride)
+    columns = [(date_column, labels, DATETIME)]
+    for name in _numeric_columns(table, exclude=[date_column]):
+        values = numpy.asarray(table.array(name), dtype='float64')[dated]
+        if how == 'count':
+            kind = INTEGER
+        elif how in ('first', 'last', 'min', 'max'):
+            kind = table.types[name]
+        else:
+            kind = NUMBER
+        columns.append((name, _aggregate(values, bins, num_bins, how,
+                                         timestamps), kind))
+    return _rows(columns, num_bins)
+
+
+def window_weights(win_type, window):
+    """
+    Returns the periodic window *win_type* of length *window*, as
+    scipy.signal.get_window (used by pandas) computes it.
+    """
+    _require_numpy()
+    win_type = win_type or 'boxcar'
+    if win_type not in WIN_TYPES:
+        raise PyBambooException('win_type must be one of: %s.' % WIN_TYPES)
+    size = window + 1
+    if win_type == 'boxcar' or window == 1:
+        return numpy.ones(window)
+    if win_type == 'triang':
+        n = numpy.arange(1, (size + 1) // 2 + 1)
+        if size % 2 == 0:
+            half = (2 * n - 1.0) / size
+            weights = numpy.concatenate((half, half[::-1]))
+        else:
+            half = 2 * n / (size + 1.0)
+            weights = numpy.concatenate((half, half[-2::-1]))
+    else:
+        function = {
+            'hamming': numpy.hamming,
+            'hann': numpy.hanning,
+            'hanning': numpy.hanning,
+            'blackman': numpy.blackman,
+            'bartlett': numpy.bartlett,
+        }[win_type]
+        weights = function(size)
+    return weights[:-1]
+
+
+def rolling(table, window, win_type=None):
+    """
+    Computes the rolling weighted mean of the number columns of *table*
+    over *window* rows.  Returns a list of rows like Dataset.rolling().
+    """
+    _require_numpy()
+    if not isinstance(window, int) or window < 1:
+        raise PyBambooException('window must be a positive int.')
+    weights = window_weights(win_type, window)
+    total = weights.sum()
+    columns = []
+    for name in _numeric_columns(table):
+        values = numpy.asarray(table.array(name), dtype='float64')
+        result = numpy.empty(len(values))
+        result.fill(numpy.nan)
+        if len(values) >= window:
+            result[window - 1:] = numpy.convolve(
+                values, weights[::-1], 'valid') / total
+        columns.append((name, result, NUMBER))
+    return _rows(columns, table.num_rows)
+
+
+def _rows(columns, num_rows):
+    rows = [{} for i in xrange(num_rows)]
+    for name, values, kind in columns:
+        for row, value in zip(rows, values.tolist()):
+            row[name] = decode_value(kind, value)
+    return rows
@@ -1,20 +1,91 @@
+import os
+import time
+
 import requests
 
-from pybamboo.exceptions import BambooError, ErrorParsingBambooData
+from pybamboo import spill
+from pybamboo.deadline import Deadline
+from pybamboo.exceptions import BambooError, BambooServerError,\
+    DeadlineExceeded, ErrorParsingBambooData
+from pybamboo.retry import RetryPolicy
+from pybamboo.throttle import endpoint_class
 from pybamboo.utils import safe_json_loads
 
 
 DEFAULT_BAMBOO_URL = 'http://bamboo.io'
 OK_STATUS_CODES = (200, 201, 202)
+THROTTLING_STATUS_CODES = (429, 503)
+DEFAULT_CONNECT_TIMEOUT = 5
+DEFAULT_READ_TIMEOUT = 60
+DEFAULT_POOL_SIZE = 10
 
 
 class Connection(object):
     """
-    Object that defines a connection to a bamboo instance.
+    Object that defines a connection to a bamboo instance, at *url* or
+    DEFAULT_BAMBOO_URL.
+
+    *limits* is an optional dict mapping an endpoint class ('read' for GET,
+    'write' for POST, PUT and DELETE) to a pybamboo.throttle.Throttle that
+    rate limits and bounds the concurrency of the requests of that class.
+
+    *connect_timeout* and *read_timeout* (in seconds, None to wait forever)
+    bound the time spent establishing a connection and waiting for data.
+
+    *hedging* is an optional pybamboo.hedging.HedgePolicy used to send a
+    duplicate of slow GET requests and keep the first response.
+
+    *retry_policy* is the pybamboo.retry.RetryPolicy deciding which failed
+    requests are sent again (defaults to RetryPolicy()).
+
+    Requests share a pool of up to *pool_size* keep-alive connections, so
+    as many requests can be sent concurrently from different threads.
+    Connections can be pickled and used after a fork: the pool is never
+    shared between processes, each process creates its own.
+
+    With a *spill_threshold* (in bytes) responses are streamed and those
+    larger than that are spilled to a temporary file instead of memory:
+    a CSV body is then returned as a pybamboo.spill.SpilledBody and a
+    JSON list as pybamboo.spill.SpilledRows, decoded as it is iterated
+    over, once.
     """
 
-    def __init__(self, url=DEFAULT_BAMBOO_URL):
-        self._url = url
+    def __init__(self, url=None, limits=None,
+                 connect_timeout=DEFAULT_CONNECT_TIMEOUT,
+                 read_timeout=DEFAULT_READ_TIMEOUT, hedging=None,
+                 retry_policy=None, pool_size=DEFAULT_POOL_SIZE,
+                 spill_threshold=None):
+        self._url = url if url is not None else DEFAULT_BAMBOO_URL
+        self._limits = dict(limits or {})
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self.hedging = hedging
+        self.retry_policy = retry_policy if retry_policy is not None \
+            else RetryPolicy()
+        self.pool_size = pool_size
+        self.spill_threshold = spill_threshold
+        self._pid = None
+        self._session = None
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state['_pid'] = state['_session'] = None
+        return state
+
+    @property
+    def session(self):
+        """
+        The requests.Session pooling the connections of this process.
+        """
+        if self._pid != os.getpid():
+            session = requests.Session()
+            adapter = requests.adapters.HTTPAdapter(
+                pool_connections=self.pool_size, pool_maxsize=self.pool_size)
+            session.mount('http://', adapter)
+            session.mount('https://', adapter)
+            self._session = session
+            self._pid = os.getpid()
+        return self._session
 
     @property
     def url(self):
@@ -24,30 +95,152 @@ class Connection(object):
     def url(self, url):
         self._url = url
 
+    @property
+    def limits(self):
+        return self._limits
+
+    @property
+    def timeout(self):
+        return (self.connect_timeout, self.read_timeout)
+
     @property
     def version(self):
         return self.make_api_request('GET', '/version')
 
     def make_api_request(self, http_method, url, data=None,
-                         files=None, params=None):
-        http_function = {
-            'GET': requests.get,
-            'POST': requests.post,
-            'PUT': requests.put,
-            'DELETE': requests.delete,
-        }
-        response = http_function[http_method](
-            self.url + url, data=data, files=files, params=params)
-        #self._check_response(response)
-        return self._process_response(response)
+                         files=None, params=None, deadline=None,
+                         num_retries=None, safe=None, headers=None):
+        """
+        Sends a request to bamboo and returns the processed response.
+
+        Failed requests are retried according to self.retry_policy
+        (allowing *num_retries* retries if given); *safe* overrides whether
+        the request is safe to retry whatever its HTTP method.  File bodies
+        are rewound before every attempt, and a body that cannot be read
+        again is never retried.  Server errors that remain after retrying
+        raise BambooServerError.
+
+        *deadline* (a number of seconds or a pybamboo.deadline.Deadline)
+        caps the timeouts and backoff sleeps so that the call does not
+        outlive it.  *headers* are added to those of the request.
+        """
+        deadline = Deadline.coerce(deadline)
+        policy = self.retry_policy
+        if num_retries is not None:
+            policy = policy.with_max_retries(num_retries)
+        positions = _body_positions(data, files)
+        if positions is None:
+            policy = policy.with_max_retries(0)
+            positions = []
+
+        def send():
+            for body, position in positions:
+                body.seek(position)
+            return self._send(http_method, url, data, files, params,
+                              deadline, headers)
+
+        response = policy.call(send, http_method, safe=safe,
+                               deadline=deadline)
+        try:
+            if response.status_code >= 500:
+                raise BambooServerError(u'%d: %s' % (response.status_code,
+                                                     response.text))
+            return self._process_response(response)
+        finally:
+            # a streamed response holds its connection until closed
+            response.close()
+
+    def _send(self, http_method, url, data, files, params, deadline,
+              headers=None):
+        hedged = http_method == 'GET' and self.hedging is not None
+        # a hedged request only reads the body of the attempt that wins
+        stream = self.spill_threshold is not None or hedged
+        if deadline is not None:
+            deadline.check()
+        throttle = self._limits.get(endpoint_class(http_method))
+
+        def send(session):
+            http_function = {
+                'GET': session.get,
+                'POST': session.post,
+                'PUT': session.put,
+                'DELETE': session.delete,
+            }
+            timeout = self.timeout
+            if deadline is not None:
+                deadline.check()
+                timeout = deadline.cap(timeout)
+            try:
+                return http_function[http_method](
+                    self.url + url, data=data, files=files, params=params,
+                    headers=headers, timeout=timeout, stream=stream)
+            except requests.exceptions.Timeout:
+                if deadline is not None and deadline.expired:
+                    raise DeadlineExceeded('Deadline exceeded during %s %s.'
+                                           % (http_method, url))
+                raise
+
+        def throttled(session):
+            if throttle is None:
+                return send(session)
+            throttle.acquire(deadline)
+            start = time.time()
+            success = False
+            try:
+                response = send(session)
+                success = response.status_code < 500 and \
+                    response.status_code not in THROTTLING_STATUS_CODES
+            finally:
+                throttle.release(time.time() - start, success)
+            return response
+
+        if hedged:
+            # each copy of the request goes through the throttle
+            return self.hedging.execute(throttled, self.session)
+        return throttled(self.session)
 
     def _process_response(self, response):
-        if response.headers.get('content-type') == 'application/csv':
-            return response.content
-        else:  # assume json
-            return safe_json_loads(response.text, ErrorParsingBambooData)
+        is_csv = response.headers.get('content-type') == 'application/csv'
+        if self.spill_threshold is None:
+            if is_csv:
+                return response.content
+            else:  # assume json
+                return safe_json_loads(response.text, ErrorParsingBambooData)
+        body = spill.read_body(response, self.spill_threshold)
+        if is_csv:
+            return body
+        if not isinstance(body, spill.SpilledBody):
+            return safe_json_loads(body, ErrorParsingBambooData)
+        if spill.first_character(body) == '[':
+            return spill.SpilledRows(body)
+        with body:
+            return safe_json_loads(body.read(), ErrorParsingBambooData)
 
     def _check_response(self, response):
         if not response.status_code in OK_STATUS_CODES:
             raise BambooError(u'%d: %s' % (response.status_code,
                                            response.text))
+
+
+def _body_positions(data, files):
+    """
+    Returns the (file, position) pairs of the file objects in the body of
+    a request, or None if the body cannot be read again (e.g. a generator).
+    """
+    bodies = list((files or {}).values())
+    if isinstance(data, dict):
+        bodies.extend(data.values())
+    elif data is not None:
+        bodies.append(data)
+    positions = []
+    for body in bodies:
+        if isinstance(body, tuple):
+            # files given as (filename, file[, content type])
+            body = body[1]
+        if isinstance(body, basestring):
+            continue
+        if hasattr(body, 'seek') and hasattr(body, 'tell'):
+            positions.append((body, body.tell()))
+        elif hasattr(body, 'read') or hasattr(body, '__iter__'):
+            return None
+    return positions
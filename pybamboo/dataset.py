@@ -1,12 +1,35 @@
 
 import StringIO
+import math
+import time
 
+from pybamboo import arrow, calculations as _calculations, compute,\
+    journal as _journal, records as _records, schema as _schema, spill,\
+    sync, transfer as _transfer, upload as _upload
+from pybamboo.columnar import ColumnarTable
 from pybamboo.connection import Connection
-from pybamboo.decorators import require_valid, retry
-from pybamboo.exceptions import PyBambooException
+from pybamboo.deadline import Deadline
+from pybamboo.decorators import require_valid
+from pybamboo.exceptions import DeadlineExceeded, PyBambooException
+from pybamboo.parallel import DEFAULT_WORKERS, ordered_map
+from pybamboo.query import (PreparedQuery, data_params, mark_params,
+                            summary_params)
 from pybamboo.utils import safe_json_dumps
 
 
+def merge_queries(query, other):
+    """
+    Returns a MongoDB query matching both *query* and *other*.
+    """
+    if not query:
+        return other
+    if set(query).intersection(other):
+        return {'$and': [query, other]}
+    merged = dict(query)
+    merged.update(other)
+    return merged
+
+
 class Dataset(object):
     """
     Object that represents a dataset in bamboo.
@@ -29,11 +52,20 @@ class Dataset(object):
         'csv',
         'json',
     ]
+    RESULT_FORMS = [
+        'rows',
+        'columnar',
+        'dataframe',
+    ]
+    BATCH_SIZE = 10000
+    # indexes looked up per query, to keep its URL short
+    INDEX_BATCH_SIZE = 200
 
     def __init__(self, dataset_id=None, url=None,
                  path=None, content=None, data_format='csv',
                  schema_path=None, schema_content=None,
-                 na_values=None, connection=None, reset=False):
+                 na_values=None, connection=None, reset=False,
+                 infer_schema=False, deadline=None):
         """
         Create a new pybamboo.Dataset from one of the following:
             * dataset_id - the id of an existing bamboo.Dataset
@@ -44,8 +76,16 @@ class Dataset(object):
             * schema_path - path to a JSON SDF schema
             * schema_content - a JSON SDF string
 
+        With *infer_schema* and no schema, the schema and n/a values of CSV
+        path or content are inferred from its first rows (see
+        pybamboo.schema) and sent with it, sparing bamboo its own inference.
+
         One can also pass in a pybamboo.Connection object.  If this is not
         supplied one will be created automatically with the default options.
+
+        Like every other method of Dataset, this accepts a *deadline* in
+        seconds (or a pybamboo.deadline.Deadline) bounding the total time
+        spent talking to bamboo, retries and backoff sleeps included.
         """
         if dataset_id is None and url is None \
                 and path is None and content is None \
@@ -81,11 +121,31 @@ class Dataset(object):
             self._id = dataset_id
             return
 
+        if infer_schema and schema_path is None and schema_content is None:
+            if data_format != 'csv' or (path is None and content is None):
+                raise PyBambooException('Only the schema of CSV path or '
+                                        'content can be inferred.')
+            if content is not None:
+                if isinstance(content, unicode):
+                    content = content.encode('utf-8')
+                inference = _schema.infer_csv(StringIO.StringIO(content),
+                                              na_values)
+            else:
+                with open(path, 'rb') as csv_file:
+                    inference = _schema.infer_csv(csv_file, na_values)
+            schema_content = safe_json_dumps(
+                inference.sdf(),
+                PyBambooException('schema is not JSON-serializable'))
+            self.NA_VALUES = inference.all_na_values()
+            req_data.update({'na_values': safe_json_dumps(
+                self.NA_VALUES,
+                PyBambooException('na_values are not JSON-serializable'))})
+
         if url is not None:
             # TODO: check valid url?
             req_data.update({'url': url})
             self._id = self._connection.make_api_request(
-                'POST', '/datasets', req_data).get('id')
+                'POST', '/datasets', req_data, deadline=deadline).get('id')
             return
 
         # files might be overloaded by schema or path/content
@@ -105,7 +165,40 @@ class Dataset(object):
 
         self._id = self._connection.make_api_request('POST', '/datasets',
                                                      files=files,
-                                                     data=req_data).get('id')
+                                                     data=req_data,
+                                                     deadline=deadline
+                                                     ).get('id')
+
+    @classmethod
+    def from_rows(cls, rows, columns=None, schema=None, na_values=None,
+                  infer_schema=False, connection=None, deadline=None):
+        """
+        Create a new pybamboo.Dataset from *rows*, an iterable of dicts,
+        encoded to CSV as they are uploaded: neither the rows nor their CSV
+        are held in memory in full or written to disk.
+            * columns - the columns of the CSV, by default those of the
+              schema or else of the first row
+            * schema - an SDF dict or JSON string, or a dict of columns to
+              their simpletype
+            * infer_schema - without a schema, whether to infer the schema
+              and n/a values from the first rows as they are encoded
+
+        Columns missing from a row are left empty, rows with other columns
+        raise PyBambooException.  The upload is not retried: the rows are
+        consumed as they are sent.
+        """
+        if na_values is not None and \
+                not isinstance(na_values, (list, tuple, set)):
+            raise PyBambooException('N/A values must be a list.')
+        if connection is None:
+            connection = Connection()
+        response, na_values = _upload.upload_rows(
+            connection, rows, columns, schema, na_values, infer_schema,
+            deadline)
+        if not response.get('id'):
+            raise PyBambooException(response.get('error', response))
+        return cls(response['id'], na_values=na_values,
+                   connection=connection)
 
     def reset(self, **kwargs):
         """
@@ -115,15 +208,17 @@ class Dataset(object):
             raise PyBambooException('This dataset no longer exists.')
         self.__init__(reset=True, **kwargs)
 
-    def delete(self, num_retries=NUM_RETRIES):
+    def delete(self, num_retries=NUM_RETRIES, deadline=None):
         """
         Deletes the dataset from bamboo.
         """
+        deadline = Deadline.coerce(deadline)
+
         @require_valid
-        @retry(num_retries)
         def _delete(self):
             response = self._connection.make_api_request(
-                'DELETE', '/datasets/%s' % self._id)
+                'DELETE', '/datasets/%s' % self._id, deadline=deadline,
+                num_retries=num_retries)
             success = 'success' in response.keys()
             if success:
                 self._id = None
@@ -131,7 +226,7 @@ class Dataset(object):
         return _delete(self)
 
     def add_calculation(self, name=None, formula=None, groups=None,
-                        num_retries=NUM_RETRIES):
+                        num_retries=NUM_RETRIES, deadline=None):
         """
         Adds a calculation to this dataset in bamboo.
 
@@ -144,8 +239,9 @@ class Dataset(object):
         .. note ::
             http://bamboo.io/docs/basic_commands.html#calculation-formulas
         """
+        deadline = Deadline.coerce(deadline)
+
         @require_valid
-        @retry(num_retries)
         def _add_calculation(self, formula, name, groups):
             if (formula is None or name is None
                     or not isinstance(formula, basestring)
@@ -160,7 +256,8 @@ class Dataset(object):
                 data['group'] = ','.join(groups)
 
             response = self._connection.make_api_request(
-                'POST', '/datasets/%s/calculations' % self._id, data=data)
+                'POST', '/datasets/%s/calculations' % self._id, data=data,
+                deadline=deadline, num_retries=num_retries)
             return 'error' not in response.keys()
         return _add_calculation(self, formula, name, groups)
 
@@ -168,7 +265,8 @@ class Dataset(object):
                          path=None,
                          content=None,
                          json=None,
-                         num_retries=NUM_RETRIES):
+                         num_retries=NUM_RETRIES,
+                         deadline=None):
         """
         Adds a JSON-formatted list of calculations to this dataset in bamboo.
 
@@ -187,8 +285,9 @@ class Dataset(object):
             http://bamboo.io/docs/advanced_commands.html
                                   #creating-multiple-calculations-via-json
         """
+        deadline = Deadline.coerce(deadline)
+
         @require_valid
-        @retry(num_retries)
         def _add_calculations(self, path, content, json):
 
             files = {}
@@ -208,103 +307,123 @@ class Dataset(object):
             files.update({'json_file': ('data.json', data)})
 
             response = self._connection.make_api_request(
-                'POST', '/datasets/%s/calculations' % self._id, files=files)
+                'POST', '/datasets/%s/calculations' % self._id, files=files,
+                deadline=deadline, num_retries=num_retries)
             return 'error' not in response.keys()
         return _add_calculations(self, path, content, json)
 
-    def remove_calculation(self, name, num_retries=NUM_RETRIES):
+    def remove_calculation(self, name, num_retries=NUM_RETRIES,
+                           deadline=None):
         """
         Removes a calculation from this dataset in bamboo.
         """
+        deadline = Deadline.coerce(deadline)
+
         @require_valid
-        @retry(num_retries)
         def _remove_calculation(self, name):
             response = self._connection.make_api_request(
-                'DELETE', '/datasets/%s/calculations/%s' % (self._id, name))
+                'DELETE', '/datasets/%s/calculations/%s' % (self._id, name),
+                deadline=deadline, num_retries=num_retries)
             return 'success' in response.keys()
         return _remove_calculation(self, name)
 
     @require_valid
-    def get_calculations(self):
+    def get_calculations(self, deadline=None):
         """
         Returns a list of the calculations with their name, formula and group.
         """
-        return self._connection.make_api_request(
-            'GET', '/datasets/%s/calculations' % self._id)
+        return spill.as_list(self._connection.make_api_request(
+            'GET', '/datasets/%s/calculations' % self._id, deadline=deadline))
+
+    @require_valid
+    def sync_calculations(self, desired,
+                          batch_size=_calculations.DEFAULT_BATCH_SIZE,
+                          workers=DEFAULT_WORKERS, dry_run=False,
+                          deadline=None):
+        """
+        Makes the calculations of this dataset those of *desired*, a list
+        of dicts with a name, a formula and an optional group (a list of
+        columns).  Only the calculations whose name, formula or group
+        changed are removed and added again, concurrently and in batches
+        (see pybamboo.calculations).  With *dry_run* nothing is sent.
+        Returns the names of the calculations {'added': [...],
+        'removed': [...]}.
+        """
+        return _calculations.sync_calculations(self, desired, batch_size,
+                                               workers, dry_run, deadline)
 
     @require_valid
-    def get_aggregate_datasets(self):
+    def get_aggregate_datasets(self, deadline=None):
         """
         Returns the aggregate datasets for this dataset in a dictionary
         of the form: {group: dataset, ...}.
         """
         response = self._connection.make_api_request(
-            'GET', '/datasets/%s/aggregations' % self._id)
+            'GET', '/datasets/%s/aggregations' % self._id, deadline=deadline)
         return dict([(group, Dataset(dataset_id, connection=self._connection))
                      for group, dataset_id in response.iteritems()])
 
     @require_valid
-    def get_aggregations(self):
-        return self.get_aggregate_datasets()
+    def get_aggregations(self, deadline=None):
+        return self.get_aggregate_datasets(deadline=deadline)
 
     def get_summary(self, select='all', groups=None, query=None,
                     order_by=None, limit=0, callback=None,
-                    num_retries=NUM_RETRIES):
+                    num_retries=NUM_RETRIES, deadline=None):
         """
         Returns the summary information for this dataset.
         """
+        deadline = Deadline.coerce(deadline)
+
         @require_valid
-        @retry(num_retries)
         def _get_summary(self, select, groups, query, order_by,
                          limit, callback):
-            params = {}
-            # TODO: check input params
-            if select != 'all':
-                if not isinstance(select, list):
-                    raise PyBambooException(
-                        'select must be a list of strings.')
-                select = dict([(sel, 1) for sel in select])
-                params['select'] = safe_json_dumps(
-                    select,
-                    PyBambooException('select is not JSON-serializable.'))
-            else:
-                params['select'] = select
-            if groups is not None:
-                if not isinstance(groups, list):
-                    raise PyBambooException(
-                        'groups must be a list of strings.')
-                params['group'] = ','.join(groups)
-            if query is not None:
-                if not isinstance(query, dict):
-                    raise PyBambooException('query must be a dict.')
-                params['query'] = safe_json_dumps(
-                    query,
-                    PyBambooException('query is not JSON-serializable.'))
-            if order_by:
-                if not isinstance(order_by, basestring):
-                    raise PyBambooException('order_by must be a string.')
-                params['order_by'] = order_by
-            if limit:
-                if not isinstance(limit, int):
-                    raise PyBambooException('limit must be an int.')
-                params['limit'] = safe_json_dumps(
-                    limit,
-                    PyBambooException('limit is not JSON-serializable.'))
-            if callback:
-                if not isinstance(callback, basestring):
-                    raise PyBambooException('callback must be a string.')
-                params['callback'] = callback
+            params = summary_params(select, groups, query, order_by, limit,
+                                    callback)
             return self._connection.make_api_request(
-                'GET', '/datasets/%s/summary' % self._id, params=params)
+                'GET', '/datasets/%s/summary' % self._id, params=params,
+                deadline=deadline, num_retries=num_retries)
         return _get_summary(self, select, groups, query, order_by,
                             limit, callback)
 
-    def get_info(self, callback=None, num_retries=NUM_RETRIES):
+    @require_valid
+    def prepare(self, select=None, query=None, order_by=None, limit=0,
+                distinct=None, format=None, count=False, index=False):
+        """
+        Returns a pybamboo.query.PreparedQuery of get_data() with these
+        arguments, validated and encoded once.  Values in *query* can be
+        pybamboo.query.Param placeholders, bound on each execution:
+
+            prepared = dataset.prepare(query={'food_type': Param('food')})
+            prepared.execute(food='lunch')
+        """
+        names = []
+        params = data_params(select, mark_params(query, names), order_by,
+                             limit, distinct, format, None, count, index,
+                             self.DATA_FORMATS)
+        return PreparedQuery(self, '/datasets/%s' % self._id, params, names)
+
+    @require_valid
+    def prepare_summary(self, select='all', groups=None, query=None,
+                        order_by=None, limit=0):
+        """
+        Returns a pybamboo.query.PreparedQuery of get_summary() with these
+        arguments, see prepare().
+        """
+        names = []
+        params = summary_params(select, groups, mark_params(query, names),
+                                order_by, limit)
+        return PreparedQuery(self, '/datasets/%s/summary' % self._id, params,
+                             names)
+
+    def get_info(self, callback=None, num_retries=NUM_RETRIES,
+                 deadline=None):
         """
         Returns the general information for this dataset.
         """
+        deadline = Deadline.coerce(deadline)
+
         @require_valid
-        @retry(num_retries)
         def _get_info(self, callback):
             params = {}
             if callback:
@@ -312,17 +431,19 @@ class Dataset(object):
                     raise PyBambooException('callback must be a string.')
                 params['callback'] = callback
             return self._connection.make_api_request(
-                'GET', '/datasets/%s/info' % self._id, params=params)
+                'GET', '/datasets/%s/info' % self._id, params=params,
+                deadline=deadline, num_retries=num_retries)
         return _get_info(self, callback)
 
     def set_info(self, attribution=None, description=None,
                  label=None, license=None,
-                 num_retries=NUM_RETRIES):
+                 num_retries=NUM_RETRIES, deadline=None):
         """
         Set metadata on the dataset
         """
+        deadline = Deadline.coerce(deadline)
+
         @require_valid
-        @retry(num_retries)
         def _set_info(self, attribution, description, label, license):
             params = {}
             if attribution is not None:
@@ -342,71 +463,256 @@ class Dataset(object):
                     raise PyBambooException('license must be a string.')
                 params['license'] = license
             return self._connection.make_api_request(
-                'PUT', '/datasets/%s/info' % self._id, data=params)
+                'PUT', '/datasets/%s/info' % self._id, data=params,
+                deadline=deadline, num_retries=num_retries)
         return _set_info(self, attribution, description, label, license)
 
     def get_data(self, select=None, query=None, order_by=None, limit=0,
                  distinct=None, format=None, callback=None, count=False,
                  index=False,
-                 num_retries=NUM_RETRIES):
+                 num_retries=NUM_RETRIES, deadline=None, records=False):
         """
         Returns the rows in this dataset filtered by the given
         select and query.
+
+        With *records*, rows are returned as compact, typed records of a
+        class generated from the schema (see pybamboo.records) instead
+        of dicts.
         """
+        deadline = Deadline.coerce(deadline)
+        if records and (format not in (None, 'json') or distinct or count
+                        or callback):
+            raise PyBambooException('records are only available for JSON '
+                                    'rows.')
+
         @require_valid
         def _get_data(self, select, query, order_by, limit, distinct,
                       format, callback, count, index):
-            params = {}
-            if select:
-                if not isinstance(select, list):
-                    raise PyBambooException(
-                        'select must be a list of strings.')
-                select = dict([(sel, 1) for sel in select])
-                params['select'] = safe_json_dumps(
-                    select,
-                    PyBambooException('select is not JSON-serializable.'))
-            if query:
-                if not isinstance(query, dict):
-                    raise PyBambooException('query must be a dict.')
-                params['query'] = safe_json_dumps(
-                    query,
-                    PyBambooException('query is not JSON-serializable.'))
-            if order_by:
-                if not isinstance(order_by, basestring):
-                    raise PyBambooException('order_by must be a string.')
-                params['order_by'] = order_by
-            if format:
-                if not isinstance(format, basestring):
-                    raise PyBambooException('format must be a string.')
-                if format not in self.DATA_FORMATS:
-                    raise PyBambooException('format must be one of: %s.' %
-                                            self.DATA_FORMATS)
-                params['format'] = format
-            if distinct:
-                if not isinstance(distinct, basestring):
-                    raise PyBambooException('distinct must be a string.')
-                params['distinct'] = distinct
-            if callback:
-                if not isinstance(callback, basestring):
-                    raise PyBambooException('callback must be a string.')
-                params['callback'] = callback
-            if limit:
-                if not isinstance(limit, int):
-                    raise PyBambooException('limit must be an int.')
-                params['limit'] = safe_json_dumps(
-                    limit,
-                    PyBambooException('limit is not JSON-serializable.'))
-            if count:
-                params['count'] = bool(count)
-            if index:
-                params['index'] = bool(index)
+            params = data_params(select, query, order_by, limit, distinct,
+                                 format, callback, count, index,
+                                 self.DATA_FORMATS)
             return self._connection.make_api_request(
-                'GET', '/datasets/%s' % self._id, params=params)
-        return _get_data(self, select, query, order_by, limit, distinct,
+                'GET', '/datasets/%s' % self._id, params=params,
+                deadline=deadline, num_retries=num_retries)
+        rows = _get_data(self, select, query, order_by, limit, distinct,
                          format, callback, count, index)
+        if records:
+            return self._decode_records(rows, select, index, deadline)
+        return rows
+
+    def _decode_records(self, rows, columns, index, deadline):
+        if isinstance(rows, dict) and 'error' in rows:
+            raise PyBambooException(rows['error'])
+        schema = self.get_info(deadline=deadline)['schema']
+        if isinstance(rows, dict):
+            return _records.record_class(schema, columns, index).decode(rows)
+        return _records.decode_rows(rows, schema, columns, index)
+
+    @require_valid
+    def get_columnar(self, cache=None, deadline=None):
+        """
+        Returns the rows of this dataset as a pybamboo.columnar.ColumnarTable
+        typed from its schema.
+
+        With a pybamboo.cache.DatasetCache as *cache*, the rows are
+        memory-mapped from the cache and only downloaded when the cached
+        copy no longer matches get_info().  Close the table once done
+        with it, or use it as a context manager.
+        """
+        if cache is not None:
+            return cache.fetch(self, deadline=deadline)
+        deadline = Deadline.coerce(deadline)
+        info = self.get_info(deadline=deadline)
+        return ColumnarTable.from_rows(self.get_data(deadline=deadline),
+                                       info.get('schema'))
+
+    @require_valid
+    def iter_batches(self, select=None, query=None, partitions=None,
+                     batch_size=None, partition_by=None,
+                     workers=DEFAULT_WORKERS, index=False, deadline=None):
+        """
+        Yields the rows of this dataset matching *query*, one batch (list
+        of rows) per partition, in order.  Up to *workers* partitions are
+        fetched concurrently.
+
+        The rows are partitioned by:
+            * partitions - an explicit list of disjoint query dicts
+            * partition_by - a column, one partition per distinct value
+            * batch_size - ranges of *batch_size* values of the index
+            * partitions - otherwise, a number of index ranges
+                           (defaults to *workers*)
+        """
+        deadline = Deadline.coerce(deadline)
+        queries = self._partition_queries(query, partitions, batch_size,
+                                          partition_by, deadline)
+
+        def fetch(partition_query):
+            rows = self.get_data(select=select, query=partition_query,
+                                 index=index, deadline=deadline)
+            if isinstance(rows, dict):
+                raise PyBambooException(rows.get('error', rows))
+            return spill.as_list(rows)
+
+        for rows in ordered_map(fetch, queries, workers):
+            yield rows
+
+    def _partition_queries(self, query, partitions, batch_size,
+                           partition_by, deadline):
+        if query is not None and not isinstance(query, dict):
+            raise PyBambooException('query must be a dict.')
+        if isinstance(partitions, list):
+            parts = partitions
+        elif partition_by is not None:
+            if not isinstance(partition_by, basestring):
+                raise PyBambooException('partition_by must be a string.')
+            values = spill.as_list(self.get_data(
+                distinct=partition_by, query=query, deadline=deadline))
+            parts = [{partition_by: value} for value in values]
+        else:
+            num_rows = self.get_info(deadline=deadline)['num_rows']
+            if batch_size is None:
+                batch_size = int(math.ceil(
+                    num_rows / float(partitions or DEFAULT_WORKERS)))
+            bounds = range(0, num_rows, max(1, batch_size)) or [0]
+            parts = [{'index': {'$gte': lower}} for lower in bounds]
+            for part, upper in zip(parts, bounds[1:]):
+                part['index']['$lt'] = upper
+        return [merge_queries(query, part) for part in parts]
+
+    def get_data_parallel(self, select=None, query=None, partitions=None,
+                          batch_size=None, partition_by=None,
+                          workers=DEFAULT_WORKERS, index=False,
+                          result='rows', deadline=None):
+        """
+        Returns the rows of this dataset matching *query*, fetched as
+        disjoint partitions on up to *workers* concurrent connections (see
+        iter_batches) and reassembled in order.
+
+        *result* is one of:
+            * rows - a list of row dicts, like get_data()
+            * columnar - a pybamboo.columnar.ColumnarTable
+            * dataframe - a pandas.DataFrame
+        """
+        if result not in self.RESULT_FORMS:
+            raise PyBambooException('result must be one of: %s.' %
+                                    self.RESULT_FORMS)
+        deadline = Deadline.coerce(deadline)
+        rows = []
+        for batch in self.iter_batches(select, query, partitions,
+                                       batch_size, partition_by, workers,
+                                       index, deadline):
+            rows.extend(batch)
+        if result == 'rows':
+            return rows
+        table = ColumnarTable.from_rows(
+            rows, self.get_info(deadline=deadline).get('schema'))
+        if result == 'columnar':
+            return table
+        return table.to_dataframe()
+
+    @require_valid
+    def follow(self, select=None, query=None, start=None,
+               batch_size=BATCH_SIZE, min_interval=1, max_interval=30,
+               backoff=2, batches=False, index=False, deadline=None,
+               sleep=time.sleep):
+        """
+        Yields the rows appended to this dataset (matching *query*) as
+        they arrive, one by one or, with *batches*, in lists of at most
+        *batch_size* rows.  Rows are followed from the index *start*, by
+        default the one after the last row: only new rows are yielded.
+
+        Each poll asks for the rows after the last index seen, which is
+        an empty answer when nothing changed.  Polls are *min_interval*
+        seconds apart, growing by *backoff* up to *max_interval* while
+        no rows arrive; full batches are followed by another poll at
+        once.  Following stops when the *deadline* passes.
+        """
+        deadline = Deadline.coerce(deadline)
+        if start is None:
+            # not the number of rows, which deleted rows make smaller
+            last = spill.as_list(self.get_data(
+                order_by='-index', limit=1, index=True, deadline=deadline))
+            if isinstance(last, dict):
+                raise PyBambooException(last.get('error', last))
+            start = last[0]['index'] + 1 if last else 0
+        interval = min_interval
+        while True:
+            try:
+                rows = self.get_data(
+                    select=select, query=merge_queries(
+                        query, {'index': {'$gte': start}}),
+                    order_by='index', limit=batch_size, index=True,
+                    deadline=deadline)
+            except DeadlineExceeded:
+                return
+            if isinstance(rows, dict):
+                raise PyBambooException(rows.get('error', rows))
+            # the rows are changed and iterated over more than once
+            rows = spill.as_list(rows)
+            if not rows:
+                delay = interval
+                interval = min(max_interval, interval * backoff)
+            else:
+                start = max(row['index'] for row in rows) + 1
+                if not index:
+                    for row in rows:
+                        del row['index']
+                if batches:
+                    yield rows
+                else:
+                    for row in rows:
+                        yield row
+                if len(rows) >= batch_size:
+                    continue
+                delay = interval = min_interval
+            if deadline is not None:
+                if deadline.expired:
+                    return
+                delay = min(delay, deadline.remaining())
+            sleep(delay)
+
+    @require_valid
+    def to_arrow(self, select=None, query=None, batch_size=BATCH_SIZE,
+                 workers=DEFAULT_WORKERS, index=False, deadline=None):
+        """
+        Returns the rows of this dataset as a pyarrow.Table typed from its
+        schema, built from record batches of *batch_size* rows fetched by
+        up to *workers* concurrent requests (see iter_batches).
+        """
+        deadline = Deadline.coerce(deadline)
+        schema = self._arrow_schema(select, index, deadline)
+        return arrow.to_table(
+            self.iter_batches(select, query, batch_size=batch_size,
+                              workers=workers, index=index,
+                              deadline=deadline),
+            schema)
+
+    @require_valid
+    def export_parquet(self, path, select=None, query=None,
+                       batch_size=BATCH_SIZE, workers=DEFAULT_WORKERS,
+                       index=False, compression=arrow.DEFAULT_COMPRESSION,
+                       deadline=None):
+        """
+        Writes the rows of this dataset to the Parquet file *path*, one
+        row group per batch of *batch_size* rows, so that at most
+        *workers* batches are held in memory at once.
+        Returns the number of rows written.
+        """
+        deadline = Deadline.coerce(deadline)
+        schema = self._arrow_schema(select, index, deadline)
+        return arrow.write_parquet(
+            path, self.iter_batches(select, query, batch_size=batch_size,
+                                    workers=workers, index=index,
+                                    deadline=deadline),
+            schema, compression)
+
+    def _arrow_schema(self, select, index, deadline):
+        info = self.get_info(deadline=deadline)
+        return arrow.arrow_schema(info['schema'], select, index)
 
     def resample(self, date_column=None, interval=None, how=None,
-                 query=None, format=None):
+                 query=None, format=None, deadline=None, local=False,
+                 table=None):
         """
         Returns the rows in this dataset resampled by a date column.
 
@@ -424,6 +730,12 @@ class Dataset(object):
             query: (Optional) A MongoDB query to restrict the dataset,
                       to only data matching the query will be resampled.
             format: (Optional) format of the resampled data (CSV/JSON).
+            local: (Optional) compute the result locally with numpy
+                      (see pybamboo.compute for the supported intervals
+                      and hows) instead of on the server.
+            table: (Optional) a pybamboo.columnar.ColumnarTable of this
+                      dataset (e.g. from get_columnar) to compute on
+                      locally instead of downloading the rows.
 
         """
         @require_valid
@@ -458,11 +770,17 @@ class Dataset(object):
                     query,
                     PyBambooException('query is not JSON-serializable.'))
 
+            if local or table is not None:
+                return compute.resample(
+                    self._local_table(table, query, format, deadline),
+                    date_column, interval, how)
             return self._connection.make_api_request(
-                'GET', '/datasets/%s/resample' % self._id, params=params)
+                'GET', '/datasets/%s/resample' % self._id, params=params,
+                deadline=deadline)
         return _resample(self, date_column, interval, how, query, format)
 
-    def rolling(self, win_type=None, window=None, format=None):
+    def rolling(self, win_type=None, window=None, format=None,
+                deadline=None, local=False, table=None):
         """
             To compute moving or rolling statistics / moments
 
@@ -472,6 +790,10 @@ class Dataset(object):
             http://pandas.pydata.org/pandas-docs/dev
                 /computation.html#moving-rolling-statistics-moments
             Window types are passed as the win_type parameter.
+
+            With *local* (or a pybamboo.columnar.ColumnarTable of this
+            dataset as *table*) the rolling mean is computed locally with
+            numpy for the window types of pybamboo.compute.
         """
 
         @require_valid
@@ -491,36 +813,139 @@ class Dataset(object):
                     raise PyBambooException('format must be a string.')
                 params['format'] = format
 
+            if local or table is not None:
+                return compute.rolling(
+                    self._local_table(table, None, format, deadline),
+                    window, win_type)
             return self._connection.make_api_request(
-                'GET', '/datasets/%s/rolling' % self._id, params=params)
+                'GET', '/datasets/%s/rolling' % self._id, params=params,
+                deadline=deadline)
         return _rolling(self, win_type, window, format)
 
+    def _local_table(self, table, query, format, deadline):
+        if format and format != 'json':
+            raise PyBambooException('local computations only return JSON.')
+        if table is not None:
+            if query:
+                raise PyBambooException('query cannot be applied to a '
+                                        'local table.')
+            return table
+        deadline = Deadline.coerce(deadline)
+        info = self.get_info(deadline=deadline)
+        return ColumnarTable.from_rows(
+            self.get_data(query=query, deadline=deadline),
+            info.get('schema'))
+
     @require_valid
-    def update_data(self, rows):
+    def update_data(self, rows, deadline=None, chunk_size=None,
+                    num_retries=None):
         """
         Updates this dataset with the rows given in {column: value} format.
         Any unspecified columns will result in n/a values.
+
+        *rows* is a list or any other iterable of rows, e.g. a generator.
+        The rows of an iterable (or of a list, given a *chunk_size*) are
+        validated and encoded as they are consumed and sent in chunks of
+        *chunk_size* (defaults to BATCH_SIZE) rows, so that memory use does
+        not grow with the number of rows.  Sending stops at the first
+        chunk bamboo refuses, and an invalid row is only detected once the
+        chunks before it have been sent.  A chunk is only sent again if it
+        could not reach bamboo, since bamboo appends the rows of every
+        chunk it receives; *num_retries* bounds those retries.
+        Returns whether or not every row was accepted.
         """
-        if not isinstance(rows, list):
+        if isinstance(rows, (dict, basestring)) or \
+                not hasattr(rows, '__iter__'):
             raise PyBambooException(
                 'rows must be a list of dictionaries')
-        if len(rows) == 0:
+        encoded = self._encode_rows(rows)
+        if isinstance(rows, list) and chunk_size is None:
+            if len(rows) == 0:
+                raise PyBambooException(
+                    'rows must contain at least one row dictionary')
+            # a list is validated before anything is sent
+            encoded = list(encoded)
+            chunk_size = len(rows)
+        deadline = Deadline.coerce(deadline)
+        sent = False
+        for chunk in self._json_lists(encoded,
+                                      chunk_size or self.BATCH_SIZE):
+            response = self._connection.make_api_request(
+                'PUT', '/datasets/%s' % self._id, data={'update': chunk},
+                deadline=deadline, num_retries=num_retries, safe=False)
+            if 'id' not in response.keys():
+                return False
+            sent = True
+        if not sent:
             raise PyBambooException(
                 'rows must contain at least one row dictionary')
+        return True
+
+    def _encode_rows(self, rows):
         for row in rows:
             if not isinstance(row, dict):
                 raise PyBambooException(
                     'rows must be a list of dictionaries')
-        data = {
-            'update': safe_json_dumps(rows, PyBambooException(
+            yield safe_json_dumps(row, PyBambooException(
                 'rows is not JSON-serializable'))
-        }
-        response = self._connection.make_api_request(
-            'PUT', '/datasets/%s' % self._id, data=data)
-        return 'id' in response.keys()
+
+    def _json_lists(self, encoded_rows, chunk_size):
+        """
+        Joins the JSON *encoded_rows* in JSON lists of *chunk_size* rows.
+        """
+        chunk = []
+        for row in encoded_rows:
+            chunk.append(row)
+            if len(chunk) >= chunk_size:
+                yield '[%s]' % ', '.join(chunk)
+                chunk = []
+        if chunk:
+            yield '[%s]' % ', '.join(chunk)
+
+    @require_valid
+    def copy_to(self, connection, batch_size=BATCH_SIZE,
+                workers=DEFAULT_WORKERS,
+                buffered_batches=_transfer.BUFFERED_BATCHES, deadline=None):
+        """
+        Copies this dataset, with its schema, info and calculations, to
+        the bamboo of *connection* and returns the copy.  The rows are
+        streamed from one to the other, downloaded in batches of
+        *batch_size* rows at most *buffered_batches* ahead of the upload,
+        without being written to disk (see pybamboo.transfer).
+        """
+        return _transfer.copy_dataset(self, connection, batch_size, workers,
+                                      buffered_batches, deadline)
+
+    @require_valid
+    def bulk_update(self, rows, journal, key=_journal.ROW_KEY,
+                    chunk_size=1000, deadline=None):
+        """
+        Appends *rows* in chunks of *chunk_size* rows recorded in the local
+        file *journal*, giving each row a unique key in the column *key*.
+        After a crash, calling this again with the same rows, in the same
+        order, and the same journal resumes from the first chunk bamboo
+        did not acknowledge without appending any row twice (see
+        pybamboo.journal).
+        Returns the number of rows sent.
+        """
+        return _journal.bulk_update(self, rows, journal, key, chunk_size,
+                                    deadline)
+
+    @require_valid
+    def sync(self, path, key, batch_size=BATCH_SIZE,
+             workers=DEFAULT_WORKERS, dry_run=False, deadline=None):
+        """
+        Makes this dataset match the local CSV file *path*, rows being
+        identified by their *key* column.  Unlike reset(), only new,
+        changed and removed rows are sent, with up to *workers* requests
+        at once.  With *dry_run* nothing is sent.
+        Returns the number of rows {'added': n, 'updated': n, 'deleted': n}.
+        """
+        return sync.sync_file(self, path, key, batch_size, workers, dry_run,
+                              deadline)
 
     @classmethod
-    def merge(cls, datasets, connection=None):
+    def merge(cls, datasets, connection=None, deadline=None):
         """
         Create a new dataset that is a row-wise merge of those in *datasets*.
         Returns the new merged dataset.
@@ -540,7 +965,7 @@ class Dataset(object):
             checked_datasets,
             PyBambooException('datasets is not JSON-serializable.'))}
         result = connection.make_api_request(
-            'POST', '/datasets/merge', data=data)
+            'POST', '/datasets/merge', data=data, deadline=deadline)
 
         if 'id' in result.keys():
             return Dataset(result['id'], connection=connection)
@@ -549,7 +974,8 @@ class Dataset(object):
         return False
 
     @classmethod
-    def join(cls, left_dataset, right_dataset, on, connection=None):
+    def join(cls, left_dataset, right_dataset, on, connection=None,
+             deadline=None):
         """
         Create a new dataset that is the result of a join, where this
         left_dataset is the lefthand side and *right_dataset* is the
@@ -571,19 +997,19 @@ class Dataset(object):
             'on': on,
         }
         result = connection.make_api_request(
-            'POST', '/datasets/join', data=data)
+            'POST', '/datasets/join', data=data, deadline=deadline)
 
         if 'id' in result.keys():
             return Dataset(result['id'], connection=connection)
         return False
 
-    def count(self, field, method='count'):
+    def count(self, field, method='count', deadline=None):
         """ Number of rows/submissions for a given field.
 
         For measure fields method is one of:
         '25%', '50%', '75%', 'count' (default), 'max', 'mean', 'min', 'std' """
 
-        value = self.get_summary().get(field).get('summary')
+        value = self.get_summary(deadline=deadline).get(field).get('summary')
         if not isinstance(value, dict):
             raise PyBambooException('summary not available.')
         if method in value:
@@ -592,7 +1018,7 @@ class Dataset(object):
             return sum((int(relval) for relval in value.values()))
 
     @require_valid
-    def row(self, action=None, index=None, payload=None):
+    def row(self, action=None, index=None, payload=None, deadline=None):
         data = None
         if not action in ('show', 'delete', 'edit'):
             raise PyBambooException('Row action must be show|edit|delete.')
@@ -605,19 +1031,92 @@ class Dataset(object):
                        'delete': 'DELETE',
                        'edit': 'PUT'}.get(action)
         return self._connection.make_api_request(
-            http_action, '/datasets/%s/row/%d' % (self._id, index), data=data)
+            http_action, '/datasets/%s/row/%d' % (self._id, index), data=data,
+            deadline=deadline)
+
+    @require_valid
+    def delete_row(self, index, deadline=None):
+        return self.row(action='delete', index=index, deadline=deadline)
+
+    @require_valid
+    def get_row(self, index, deadline=None, records=False):
+        deadline = Deadline.coerce(deadline)
+        row = self.row(action='show', index=index, deadline=deadline)
+        if records:
+            return self._decode_records(row, None, False, deadline)
+        return row
+
+    @require_valid
+    def update_row(self, index, data, deadline=None):
+        return self.row(action='edit', index=index, payload=data,
+                        deadline=deadline)
+
+    def _check_indexes(self, indexes):
+        indexes = list(indexes)
+        if not all(isinstance(index, int) for index in indexes):
+            raise PyBambooException('indexes must be ints.')
+        return indexes
 
     @require_valid
-    def delete_row(self, index):
-        return self.row(action='delete', index=index)
+    def get_rows(self, indexes, select=None, batch_size=INDEX_BATCH_SIZE,
+                 workers=DEFAULT_WORKERS, deadline=None, records=False):
+        """
+        Returns the rows at *indexes* as a dict {index: row}, None for
+        the indexes without a row.  The rows are read with queries on
+        their index, in batches of *batch_size* indexes sent up to
+        *workers* at once, rather than one request per row.
+        """
+        deadline = Deadline.coerce(deadline)
+        indexes = sorted(set(self._check_indexes(indexes)))
+
+        def fetch(batch):
+            rows = self.get_data(select=select,
+                                 query={'index': {'$in': batch}},
+                                 index=True, deadline=deadline)
+            if isinstance(rows, dict):
+                raise PyBambooException(rows.get('error', rows))
+            return rows
+
+        result = dict.fromkeys(indexes)
+        batches = [indexes[i:i + batch_size]
+                   for i in xrange(0, len(indexes), batch_size)]
+        for rows in ordered_map(fetch, batches, workers):
+            for row in rows:
+                result[row.pop('index')] = row
+        if records:
+            found = [index for index in indexes if result[index] is not None]
+            decoded = self._decode_records([result[index] for index in found],
+                                           select, False, deadline)
+            result.update(zip(found, decoded))
+        return result
 
     @require_valid
-    def get_row(self, index):
-        return self.row(action='show', index=index)
+    def delete_rows(self, indexes, workers=DEFAULT_WORKERS, deadline=None):
+        """
+        Deletes the rows at *indexes*, up to *workers* at once.  Returns
+        the response of bamboo for each row as a dict {index: response}.
+        """
+        deadline = Deadline.coerce(deadline)
+        indexes = self._check_indexes(indexes)
+        return dict(zip(indexes, ordered_map(
+            lambda index: self.delete_row(index, deadline=deadline),
+            indexes, workers)))
 
     @require_valid
-    def update_row(self, index, data):
-        return self.row(action='edit', index=index, payload=data)
+    def update_rows(self, rows, workers=DEFAULT_WORKERS, deadline=None):
+        """
+        Updates the rows given as a dict {index: data}, up to *workers* at
+        once.  Returns the response of bamboo for each row as a dict
+        {index: response}.
+        """
+        deadline = Deadline.coerce(deadline)
+        if not isinstance(rows, dict):
+            raise PyBambooException('rows must be a dict {index: data}.')
+        indexes = self._check_indexes(rows)
+        return dict(zip(indexes, ordered_map(
+            lambda index: self.update_row(index, rows[index],
+                                          deadline=deadline),
+            indexes, workers)))
 
     @property
     def id(self):
@@ -0,0 +1,52 @@
+import time
+
+from pybamboo.exceptions import DeadlineExceeded
+
+
+class Deadline(object):
+    """
+    An absolute point in time by which a call (including all of its
+    retries and backoff sleeps) must complete.
+    """
+
+    def __init__(self, seconds, clock=time.time):
+        self._clock = clock
+        self.expires_at = clock() + seconds
+
+    @classmethod
+    def coerce(cls, deadline):
+        """
+        Returns a Deadline from *deadline*, which is either None, a
+        number of seconds from now or a Deadline (returned as-is).
+        """
+        if deadline is None or isinstance(deadline, Deadline):
+            return deadline
+        return cls(deadline)
+
+    def remaining(self):
+        """
+        The number of seconds left before the deadline (never negative).
+        """
+        return max(0.0, self.expires_at - self._clock())
+
+    @property
+    def expired(self):
+        return self.remaining() <= 0
+
+    def check(self):
+        """
+        Raises DeadlineExceeded if the deadline has passed.
+        """
+        if self.expired:
+            raise DeadlineExceeded('Deadline exceeded.')
+
+    def cap(self, timeout):
+        """
+        Returns *timeout* (a number or a (connect, read) tuple) limited
+        to the time remaining before the deadline.
+        """
+        remaining = self.remaining()
+        if isinstance(timeout, tuple):
+            return tuple(remaining if t is None else min(t, remaining)
+                         for t in timeout)
+        return remaining if timeout is None else min(timeout, remaining)
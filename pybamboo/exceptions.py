@@ -15,9 +15,24 @@ class BambooError(PyBambooException):
     pass
 
 
+class BambooServerError(BambooError):
+    """
+    Receiving this error means that bamboo kept answering
+    with a server error (5xx) after retrying.
+    """
+    pass
+
+
 class ErrorParsingBambooData(PyBambooException, ValueError):
     """
     Signifies an error in parsing the response text
     (JSON) from bamboo.
     """
     pass
+
+
+class DeadlineExceeded(PyBambooException):
+    """
+    Signifies that a call did not complete before its deadline.
+    """
+    pass
@@ -0,0 +1,1009 @@
+"""
+An in-process fake bamboo server, for fast tests and benchmarks that run
+without a network:
+
+    server = FakeBambooServer().start()
+    dataset = Dataset(path='data.csv', connection=Connection(server.url))
+    ...
+    server.stop()
+
+It implements the endpoints pybamboo uses (datasets, info, summary,
+calculations, aggregations, merge, join, rows, resample and rolling)
+with deterministic behaviour: uploads, updates and calculations are
+processed before the request returns, datasets are 'ready' at once and a
+new calculation is reported 'pending' by the first listing of the
+calculations only.  Formulas are Python expressions over the columns,
+optionally wrapped in one of AGGREGATIONS.
+
+The tests run against it when TEST_BAMBOO_URL is 'fake'.
+"""
+import BaseHTTPServer
+import SocketServer
+import StringIO
+import ast
+import cgi
+import csv
+import datetime
+import itertools
+import operator
+import re
+import socket
+import sys
+import threading
+import time
+import urlparse
+
+import simplejson as json
+from bson import json_util
+from bson.tz_util import utc
+
+from pybamboo import compute
+from pybamboo.columnar import ColumnarTable
+from pybamboo.exceptions import PyBambooException
+from pybamboo.utils import parse_datetime
+
+
+VERSION = {
+    'version': '0.5.8',
+    'description': 'fake bamboo server',
+    'branch': 'fake',
+    'commit': 'fake',
+    'version_major': 0.5,
+    'version_minor': 8,
+}
+AGGREGATIONS = ['max', 'mean', 'min', 'median', 'newest', 'sum', 'ratio',
+                'count']
+NULL = 'null'
+INFO_FIELDS = ['attribution', 'description', 'label', 'license']
+BINARY_OPERATORS = {
+    ast.Add: operator.add,
+    ast.Sub: operator.sub,
+    ast.Mult: operator.mul,
+    ast.Div: operator.truediv,
+    ast.Mod: operator.mod,
+    ast.Pow: operator.pow,
+}
+UNARY_OPERATORS = {
+    ast.USub: operator.neg,
+    ast.UAdd: operator.pos,
+    ast.Not: operator.not_,
+}
+COMPARISONS = {
+    ast.Eq: operator.eq,
+    ast.NotEq: operator.ne,
+    ast.Lt: operator.lt,
+    ast.LtE: operator.le,
+    ast.Gt: operator.gt,
+    ast.GtE: operator.ge,
+}
+QUERY_OPERATORS = {
+    '$gt': operator.gt,
+    '$gte': operator.ge,
+    '$lt': operator.lt,
+    '$lte': operator.le,
+    '$ne': operator.ne,
+    '$in': lambda value, values: value in values,
+    '$nin': lambda value, values: value not in values,
+    '$exists': lambda value, exists: (value is not None) == exists,
+}
+
+
+class FakeError(Exception):
+    """
+    A request bamboo would refuse; answered with a 400 and the message.
+    """
+    pass
+
+
+def _is_number(value):
+    return isinstance(value, (int, long, float)) and \
+        not isinstance(value, bool)
+
+
+def _to_datetime(value):
+    if isinstance(value, datetime.datetime):
+        return value if value.tzinfo is not None \
+            else value.replace(tzinfo=utc)
+    if isinstance(value, basestring):
+        parsed = parse_datetime(value.strip())
+        if parsed is not None:
+            return parsed.replace(tzinfo=utc)
+    raise ValueError(value)
+
+
+def _to_float(value):
+    if isinstance(value, bool):
+        raise ValueError(value)
+    return float(value)
+
+
+def _missing(value, na_values):
+    return value is None or value == NULL or \
+        (isinstance(value, basestring) and
+         (not value.strip() or value in na_values))
+
+
+def infer_simpletype(values):
+    """
+    Returns the simpletype (float | datetime | string | boolean) of a
+    column of *values*, n/a values being None.
+    """
+    values = [value for value in values if value is not None]
+    for simpletype, convert in (('float', _to_float),
+                                ('datetime', _to_datetime)):
+        try:
+            for value in values:
+                convert(value)
+        except (TypeError, ValueError):
+            continue
+        return simpletype
+    if values and all(isinstance(value, bool) for value in values):
+        return 'boolean'
+    return 'string'
+
+
+def convert(value, simpletype):
+    """
+    Returns *value* as a value of a column of *simpletype*, None if it
+    does not convert.
+    """
+    if value is None:
+        return None
+    try:
+        if simpletype == 'float':
+            return _to_float(value)
+        if simpletype == 'integer':
+            number = _to_float(value)
+            return int(number) if number.is_integer() else None
+        if simpletype == 'datetime':
+            return _to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if simpletype == 'string' and not isinstance(value, basestring):
+        return unicode(value)
+    return value
+
+
+def column_schema(name, simpletype, values):
+    schema = {
+        'label': name,
+        'simpletype': simpletype,
+        'olap_type': 'dimension' if simpletype in ('string', 'boolean')
+        else 'measure',
+    }
+    if schema['olap_type'] == 'dimension':
+        schema['cardinality'] = len(set(value for value in values
+                                        if value is not None))
+    return schema
+
+
+def _percentile(values, fraction):
+    position = (len(values) - 1) * fraction
+    lower = int(position)
+    upper = min(lower + 1, len(values) - 1)
+    return values[lower] + (values[upper] - values[lower]) * \
+        (position - lower)
+
+
+def describe(values):
+    """
+    Returns the summary of a measure column like pandas' describe().
+    """
+    values = sorted(value for value in values if value is not None)
+    if not values:
+        return {'count': 0}
+    count = len(values)
+    mean = sum(values) / count
+    summary = {
+        'count': count,
+        'mean': mean,
+        'min': values[0],
+        'max': values[-1],
+        '25%': _percentile(values, 0.25),
+        '50%': _percentile(values, 0.5),
+        '75%': _percentile(values, 0.75),
+    }
+    if count > 1:
+        summary['std'] = (sum((value - mean) ** 2 for value in values) /
+                          (count - 1)) ** 0.5
+    return summary
+
+
+def matches(row, query):
+    """
+    Returns whether *row* matches the MongoDB *query*.
+    """
+    for key, condition in query.iteritems():
+        if key == '$and':
+            if not all(matches(row, part) for part in condition):
+                return False
+        elif key == '$or':
+            if not any(matches(row, part) for part in condition):
+                return False
+        elif key == '$nor':
+            if any(matches(row, part) for part in condition):
+                return False
+        elif isinstance(condition, dict) and \
+                any(op.startswith('$') for op in condition):
+            value = row.get(key)
+            for op, operand in condition.iteritems():
+                if op not in QUERY_OPERATORS:
+                    raise FakeError('Unsupported query operator: %s' % op)
+                if value is None and op not in ('$ne', '$nin', '$exists'):
+                    return False
+                if not QUERY_OPERATORS[op](value, operand):
+                    return False
+        elif row.get(key) != condition:
+            return False
+    return True
+
+
+class Formula(object):
+    """
+    A parsed calculation formula: an expression over the columns of a
+    dataset, aggregated if it is a call to one of AGGREGATIONS.
+    """
+
+    def __init__(self, formula, columns):
+        try:
+            node = ast.parse(formula.strip(), mode='eval').body
+        except SyntaxError:
+            raise FakeError('Parse error in formula: %s' % formula)
+        self.aggregation = None
+        self.arguments = [node]
+        if isinstance(node, ast.Call) and isinstance(node.func, ast.Name) \
+                and node.func.id in AGGREGATIONS:
+            self.aggregation = node.func.id
+            self.arguments = node.args
+        for argument in self.arguments:
+            self._check(argument, columns)
+
+    def _check(self, node, columns):
+        if isinstance(node, ast.Name):
+            if node.id not in columns and \
+                    node.id not in ('True', 'False', 'None'):
+                raise FakeError('Missing column: %s' % node.id)
+        elif isinstance(node, ast.BinOp):
+            if type(node.op) not in BINARY_OPERATORS:
+                raise FakeError('Unsupported operator.')
+            self._check(node.left, columns)
+            self._check(node.right, columns)
+        elif isinstance(node, ast.UnaryOp):
+            self._check(node.operand, columns)
+        elif isinstance(node, ast.BoolOp):
+            for value in node.values:
+                self._check(value, columns)
+        elif isinstance(node, ast.Compare):
+            for child in [node.left] + node.comparators:
+                self._check(child, columns)
+        elif not isinstance(node, (ast.Num, ast.Str)):
+            raise FakeError('Unsupported expression in formula.')
+
+    def _evaluate(self, node, row):
+        if isinstance(node, ast.Num):
+            return node.n
+        if isinstance(node, ast.Str):
+            return node.s
+        if isinstance(node, ast.Name):
+            return {'True': True, 'False': False, 'None': None}.get(
+                node.id, row.get(node.id))
+        if isinstance(node, ast.BoolOp):
+            values = [self._evaluate(value, row) for value in node.values]
+            return all(values) if isinstance(node.op, ast.And) \
+                else any(values)
+        if isinstance(node, ast.Compare):
+            left = self._evaluate(node.left, row)
+            for op, comparator in zip(node.ops, node.comparators):
+                right = self._evaluate(comparator, row)
+                if type(op) not in COMPARISONS or \
+                        not COMPARISONS[type(op)](left, right):
+                    return False
+                left = right
+            return True
+        if isinstance(node, ast.UnaryOp):
+            operand = self._evaluate(node.operand, row)
+            if operand is None:
+                return None
+            return UNARY_OPERATORS[type(node.op)](operand)
+        left = self._evaluate(node.left, row)
+        right = self._evaluate(node.right, row)
+        if left is None or right is None:
+            return None
+        try:
+            return BINARY_OPERATORS[type(node.op)](left, right)
+        except (TypeError, ZeroDivisionError, OverflowError):
+            return None
+
+    def evaluate(self, row):
+        return self._evaluate(self.arguments[0], row)
+
+    def aggregate(self, rows):
+        columns = [[self._evaluate(argument, row) for row in rows]
+                   for argument in self.arguments]
+        if self.aggregation == 'count':
+            if not columns:
+                return float(len(rows))
+            return float(len([value for value in columns[0]
+                              if value is not None]))
+        if self.aggregation == 'ratio':
+            numerator = sum(value for value in columns[0] if value)
+            denominator = sum(value for value in columns[1] if value)
+            return numerator / float(denominator) if denominator else None
+        if self.aggregation == 'newest':
+            pairs = [(date, value) for date, value in zip(*columns)
+                     if date is not None]
+            return max(pairs, key=operator.itemgetter(0))[1] \
+                if pairs else None
+        values = [value for value in columns[0] if value is not None]
+        if not values:
+            return None
+        if self.aggregation == 'sum':
+            return sum(values)
+        if self.aggregation == 'mean':
+            return sum(values) / float(len(values))
+        if self.aggregation == 'median':
+            return _percentile(sorted(values), 0.5)
+        return {'min': min, 'max': max}[self.aggregation](values)
+
+
+class FakeDataset(object):
+    """
+    The rows, schema, info and calculations of a dataset of the fake
+    server.  Deleted rows are kept as None so that indexes do not move.
+    """
+
+    def __init__(self, dataset_id, clock):
+        self.id = dataset_id
+        self.clock = clock
+        self.rows = []
+        self.schema = {}
+        self.info = dict.fromkeys(INFO_FIELDS, '')
+        self.state = 'ready'
+        self.calculations = []
+        self.aggregations = {}
+        self.created_at = self.updated_at = self._now()
+
+    def _now(self):
+        return datetime.datetime.utcfromtimestamp(
+            self.clock()).strftime('%Y-%m-%dT%H:%M:%S.%f')
+
+    def touch(self):
+        self.updated_at = self._now()
+
+    @property
+    def live_rows(self):
+        return [(index, row) for index, row in enumerate(self.rows)
+                if row is not None]
+
+    def load(self, rows, schema=None, na_values=()):
+        """
+        Replaces the rows of this dataset with *rows*, typed from *schema*
+        (an SDF dict) or inferred.
+        """
+        rows = [dict((key, None if _missing(value, na_values) else value)
+                     for key, value in row.iteritems()) for row in rows]
+        self.schema = {}
+        columns = []
+        for row in rows:
+            for column in row:
+                if column not in columns:
+                    columns.append(column)
+        for column in (schema or {}):
+            if column not in columns:
+                columns.append(column)
+        for column in columns:
+            values = [row.get(column) for row in rows]
+            simpletype = (schema or {}).get(column, {}).get('simpletype') \
+                or infer_simpletype(values)
+            values = [convert(value, simpletype) for value in values]
+            for row, value in zip(rows, values):
+                row[column] = value
+            self.schema[column] = column_schema(column, simpletype, values)
+        self.rows = rows
+        self.touch()
+
+    def append(self, rows):
+        for row in rows:
+            typed = {}
+            for column, value in row.iteritems():
+                if _missing(value, ()):
+                    value = None
+                if column not in self.schema:
+                    self.schema[column] = column_schema(
+                        column, infer_simpletype([value]), [value])
+                typed[column] = convert(value,
+                                        self.schema[column]['simpletype'])
+            self.rows.append(typed)
+        self.touch()
+
+    def output(self, row, select=None, index=None):
+        """
+        Returns *row* as bamboo serves it: missing strings read 'null'.
+        """
+        columns = select if select is not None else self.schema
+        result = {}
+        for column in columns:
+            if column not in self.schema:
+                continue
+            value = row.get(column)
+            if value is None and \
+                    self.schema[column]['simpletype'] == 'string':
+                value = NULL
+            result[column] = value
+        if index is not None:
+            result['index'] = index
+        return result
+
+
+class FakeBamboo(object):
+    """
+    The state of the fake server and the handling of its requests,
+    independently of HTTP (see FakeBambooServer).
+    """
+
+    ROUTES = [
+        ('GET', r'^/version$', 'version'),
+        ('POST', r'^/datasets$', 'create'),
+        ('POST', r'^/datasets/merge$', 'merge'),
+        ('POST', r'^/datasets/join$', 'join'),
+        ('GET', r'^/datasets/([^/]+)$', 'show'),
+        ('PUT', r'^/datasets/([^/]+)$', 'update'),
+        ('DELETE', r'^/datasets/([^/]+)$', 'delete'),
+        ('GET', r'^/datasets/([^/]+)/info$', 'show_info'),
+        ('PUT', r'^/datasets/([^/]+)/info$', 'set_info'),
+        ('GET', r'^/datasets/([^/]+)/summary$', 'summary'),
+        ('GET', r'^/datasets/([^/]+)/calculations$', 'calculations'),
+        ('POST', r'^/datasets/([^/]+)/calculations$', 'add_calculations'),
+        ('DELETE', r'^/datasets/([^/]+)/calculations/([^/]+)$',
+         'remove_calculation'),
+        ('GET', r'^/datasets/([^/]+)/aggregations$', 'aggregations'),
+        ('GET', r'^/datasets/([^/]+)/resample$', 'resample'),
+        ('GET', r'^/datasets/([^/]+)/rolling$', 'rolling'),
+        ('GET', r'^/datasets/([^/]+)/row/(\d+)$', 'show_row'),
+        ('PUT', r'^/datasets/([^/]+)/row/(\d+)$', 'update_row'),
+        ('DELETE', r'^/datasets/([^/]+)/row/(\d+)$', 'delete_row'),
+    ]
+
+    def __init__(self, clock=time.time):
+        self.clock = clock
+        self.datasets = {}
+        self._ids = itertools.count(1)
+        self._lock = threading.RLock()
+
+    def handle(self, method, path, params=None, form=None, files=None):
+        """
+        Handles a request and returns (status code, content type, body).
+        """
+        with self._lock:
+            for route_method, pattern, name in self.ROUTES:
+                match = re.match(pattern, path)
+                if match is None or route_method != method:
+                    continue
+                try:
+                    result = getattr(self, name)(
+                        params or {}, form or {}, files or {},
+                        *match.groups())
+                except FakeError as e:
+                    return 400, 'application/json', json.dumps(
+                        {'error': unicode(e)})
+                except Exception as e:
+                    return 500, 'text/plain', 'Internal error: %r' % e
+                if isinstance(result, tuple):
+                    return 200, 'application/csv', result[1]
+                return 200, 'application/json', json.dumps(
+                    result, default=json_util.default)
+            return 404, 'application/json', json.dumps(
+                {'error': 'Unknown request: %s %s' % (method, path)})
+
+    def _dataset(self, dataset_id):
+        dataset = self.datasets.get(dataset_id)
+        if dataset is None:
+            raise FakeError('id not found')
+        return dataset
+
+    def _new_dataset(self):
+        dataset_id = '%032x' % next(self._ids)
+        dataset = FakeDataset(dataset_id, self.clock)
+        self.datasets[dataset_id] = dataset
+        return dataset
+
+    def _json(self, value, name):
+        try:
+            return json.loads(value, object_hook=json_util.object_hook)
+        except ValueError:
+            raise FakeError('%s is not valid JSON.' % name)
+
+    def version(self, params, form, files):
+        return VERSION
+
+    def create(self, params, form, files):
+        if form.get('dataset_id'):
+            dataset = self._dataset(form['dataset_id'])
+        else:
+            dataset = self._new_dataset()
+        na_values = self._json(form['na_values'], 'na_values') \
+            if form.get('na_values') else ()
+        schema = self._json(files['schema'], 'schema') \
+            if 'schema' in files else None
+        if 'csv_file' in files:
+            rows = list(csv.DictReader(StringIO.StringIO(files['csv_file'])))
+            rows = [dict((key.decode('utf-8'), value.decode('utf-8'))
+                         for key, value in row.iteritems()
+                         if key is not None and value is not None)
+                    for row in rows]
+        elif 'json_file' in files:
+            rows = self._json(files['json_file'], 'json_file')
+        elif form.get('url', '').startswith('file://'):
+            with open(form['url'][len('file://'):], 'rb') as f:
+                rows = list(csv.DictReader(f))
+        else:
+            # remote URLs cannot be fetched offline
+            rows = []
+            dataset.state = 'failed' if form.get('url') else 'ready'
+        dataset.load(rows, schema, na_values)
+        self._recalculate(dataset)
+        return {'id': dataset.id}
+
+    def merge(self, params, form, files):
+        datasets = [self._dataset(dataset_id) for dataset_id in
+                    self._json(form.get('dataset_ids', '[]'), 'dataset_ids')]
+        if len(datasets) < 2:
+            raise FakeError('merge requires 2 datasets')
+        schema = {}
+        rows = []
+        for dataset in datasets:
+            schema.update(dataset.schema)
+            rows.extend(dict(row) for index, row in dataset.live_rows)
+        merged = self._new_dataset()
+        merged.load(rows, schema)
+        return {'id': merged.id}
+
+    def join(self, params, form, files):
+        left = self._dataset(form.get('dataset_id'))
+        right = self._dataset(form.get('other_dataset_id'))
+        on = form.get('on')
+        if on not in left.schema or on not in right.schema:
+            raise FakeError('on is not a column of both datasets')
+        lookup = {}
+        for index, row in right.live_rows:
+            if row.get(on) in lookup:
+                raise FakeError('on is not unique in the right dataset')
+            lookup[row.get(on)] = row
+        rows = []
+        for index, row in left.live_rows:
+            joined = dict(row)
+            for column, value in lookup.get(row.get(on), {}).iteritems():
+                joined.setdefault(column, value)
+            rows.append(joined)
+        schema = dict(right.schema)
+        schema.update(left.schema)
+        dataset = self._new_dataset()
+        dataset.load(rows, schema)
+        return {'id': dataset.id}
+
+    def _select(self, dataset, params):
+        rows = dataset.live_rows
+        if params.get('query'):
+            query = self._json(params['query'], 'query')
+            if not isinstance(query, dict):
+                raise FakeError('query must be a dict')
+            # bamboo also queries the position of the rows, as 'index'
+            rows = [(index, row) for index, row in rows
+                    if matches(dict(row, index=index), query)]
+        return rows
+
+    def show(self, params, form, files, dataset_id):
+        dataset = self._dataset(dataset_id)
+        rows = self._select(dataset, params)
+        if params.get('order_by'):
+            column = params['order_by'].lstrip('-')
+            rows.sort(key=lambda (index, row): index if column == 'index'
+                      else row.get(column),
+                      reverse=params['order_by'].startswith('-'))
+        if params.get('limit'):
+            rows = rows[:int(params['limit'])]
+        if params.get('count') in ('True', 'true', '1'):
+            return len(rows)
+        if params.get('distinct'):
+            return sorted(set(row.get(params['distinct'])
+                              for index, row in rows))
+        select = None
+        if params.get('select'):
+            select = sorted(self._json(params['select'], 'select'))
+        with_index = params.get('index') in ('True', 'true', '1')
+        rows = [dataset.output(row, select, index if with_index else None)
+                for index, row in rows]
+        if params.get('format') == 'csv':
+            return 'csv', self._csv(rows)
+        return rows
+
+    def _csv(self, rows):
+        columns = sorted(set(column for row in rows for column in row))
+        output = StringIO.StringIO()
+        writer = csv.writer(output)
+        writer.writerow(columns)
+        for row in rows:
+            values = []
+            for column in columns:
+                value = row.get(column)
+                if isinstance(value, datetime.datetime):
+                    value = value.isoformat()
+                elif isinstance(value, unicode):
+                    value = value.encode('utf-8')
+                values.append('' if value is None else value)
+            writer.writerow(values)
+        return output.getvalue()
+
+    def update(self, params, form, files, dataset_id):
+        dataset = self._dataset(dataset_id)
+        rows = self._json(form.get('update', ''), 'update')
+        if isinstance(rows, dict):
+            rows = [rows]
+        dataset.append(rows)
+        self._recalculate(dataset)
+        return {'id': dataset.id}
+
+    def delete(self, params, form, files, dataset_id):
+        self._dataset(dataset_id)
+        del self.datasets[dataset_id]
+        return {'success': 'deleted dataset: %s' % dataset_id,
+                'id': dataset_id}
+
+    def show_info(self, params, form, files, dataset_id):
+        dataset = self._dataset(dataset_id)
+        info = dict(dataset.info)
+        info.update({
+            'id': dataset.id,
+            'created_at': dataset.created_at,
+            'updated_at': dataset.updated_at,
+            'num_columns': len(dataset.schema),
+            'num_rows': len(dataset.live_rows),
+            'schema': dataset.schema,
+            'state': dataset.state,
+        })
+        return info
+
+    def set_info(self, params, form, files, dataset_id):
+        dataset = self._dataset(dataset_id)
+        for field in INFO_FIELDS:
+            if field in form:
+                dataset.info[field] = form[field]
+        dataset.touch()
+        return {'id': dataset.id}
+
+    def _summarize(self, dataset, rows, columns):
+        summary = {}
+        for column in columns:
+            values = [row.get(column) for row in rows]
+            if dataset.schema[column]['simpletype'] in ('integer', 'float'):
+                summary[column] = {'summary': describe(values)}
+                continue
+            counts = {}
+            for value in values:
+                if isinstance(value, datetime.datetime):
+                    value = value.isoformat()
+                value = NULL if value is None else unicode(value)
+                counts[value] = counts.get(value, 0) + 1
+            summary[column] = {'summary': counts}
+        return summary
+
+    def summary(self, params, form, files, dataset_id):
+        dataset = self._dataset(dataset_id)
+        rows = [row for index, row in self._select(dataset, params)]
+        select = params.get('select', 'all')
+        if select == 'all':
+            columns = sorted(dataset.schema)
+        else:
+            columns = [column for column in
+                       sorted(self._json(select, 'select'))
+                       if column in dataset.schema]
+        if not params.get('group'):
+            return self._summarize(dataset, rows, columns)
+        groups = params['group'].split(',')
+        for group in groups:
+            if group not in dataset.schema:
+                raise FakeError('group %s is not a column' % group)
+        grouped = {}
+        for row in rows:
+            key = ','.join(unicode(row.get(group)) for group in groups)
+            grouped.setdefault(key, []).append(row)
+        columns = [column for column in columns if column not in groups]
+        return {params['group']: dict(
+            (key, self._summarize(dataset, group_rows, columns))
+            for key, group_rows in grouped.iteritems())}
+
+    def calculations(self, params, form, files, dataset_id):
+        dataset = self._dataset(dataset_id)
+        result = []
+        for calculation in dataset.calculations:
+            result.append(dict((key, calculation[key]) for key in
+                               ('name', 'formula', 'group', 'state')))
+            calculation['state'] = 'ready'
+        return result
+
+    def add_calculations(self, params, form, files, dataset_id):
+        dataset = self._dataset(dataset_id)
+        if 'json_file' in files:
+            calculations = self._json(files['json_file'], 'json_file')
+            if not isinstance(calculations, list):
+                raise FakeError('json_file must contain a list')
+        else:
+            calculations = [form]
+        added = []
+        for calculation in calculations:
+            name = calculation.get('name')
+            formula = calculation.get('formula')
+            group = calculation.get('group') or None
+            if isinstance(group, list):
+                group = ','.join(group)
+            if not name or not isinstance(formula, basestring):
+                raise FakeError('name and formula are required')
+            parsed = Formula(formula, dataset.schema)
+            if any(existing['name'] == name and existing['group'] == group
+                   for existing in dataset.calculations + added):
+                raise FakeError('calculation %s already exists' % name)
+            if parsed.aggregation is None and (
+                    group is not None or name in dataset.schema):
+                raise FakeError('%s is already a column' % name
+                                if group is None else
+                                'only aggregations can be grouped')
+            for column in (group or '').split(','):
+                if column and column not in dataset.schema:
+                    raise FakeError('group %s is not a column' % column)
+            added.append({'name': name, 'formula': formula, 'group': group,
+                          'state': 'pending', 'parsed': parsed})
+        dataset.calculations.extend(added)
+        self._recalculate(dataset)
+        return {'success': 'created calculation(s)', 'id': dataset.id}
+
+    def remove_calculation(self, params, form, files, dataset_id, name):
+        dataset = self._dataset(dataset_id)
+        removed = [calculation for calculation in dataset.calculations
+                   if calculation['name'] == name]
+        if not removed:
+            raise FakeError('calculation %s not found' % name)
+        dataset.calculations = [calculation for calculation in
+                                dataset.calculations
+                                if calculation['name'] != name]
+        if any(calculation['parsed'].aggregation is None
+               for calculation in removed):
+            dataset.schema.pop(name, None)
+            for row in dataset.rows:
+                if row is not None:
+                    row.pop(name, None)
+        self._recalculate(dataset)
+        return {'success': 'deleted calculation: %s' % name,
+                'id': dataset.id}
+
+    def _recalculate(self, dataset):
+        groups = {}
+        for calculation in dataset.calculations:
+            parsed = calculation['parsed']
+            if parsed.aggregation is not None:
+                groups.setdefault(calculation['group'] or '', []).append(
+                    calculation)
+                continue
+            values = []
+            for row in dataset.rows:
+                if row is not None:
+                    row[calculation['name']] = parsed.evaluate(row)
+                    values.append(row[calculation['name']])
+            simpletype = 'float' if all(
+                _is_number(value) for value in values
+                if value is not None) else infer_simpletype(values)
+            dataset.schema[calculation['name']] = column_schema(
+                calculation['name'], simpletype, values)
+        rows = [row for index, row in dataset.live_rows]
+        for group, calculations in groups.iteritems():
+            columns = group.split(',') if group else []
+            grouped = {}
+            for row in rows:
+                key = tuple(row.get(column) for column in columns)
+                grouped.setdefault(key, []).append(row)
+            aggregated = []
+            for key, group_rows in sorted(grouped.items()):
+                row = dict(zip(columns, key))
+                for calculation in calculations:
+                    row[calculation['name']] = \
+                        calculation['parsed'].aggregate(group_rows)
+                aggregated.append(row)
+            schema = dict((column, dataset.schema[column])
+                          for column in columns)
+            dataset_id = dataset.aggregations.get(group)
+            if dataset_id not in self.datasets:
+                dataset_id = self._new_dataset().id
+                dataset.aggregations[group] = dataset_id
+            self.datasets[dataset_id].load(aggregated, schema)
+        dataset.touch()
+
+    def aggregations(self, params, form, files, dataset_id):
+        dataset = self._dataset(dataset_id)
+        return dict((group, aggregated_id) for group, aggregated_id
+                    in dataset.aggregations.iteritems()
+                    if aggregated_id in self.datasets)
+
+    def _table(self, dataset, params):
+        rows = [row for index, row in self._select(dataset, params)]
+        return ColumnarTable.from_rows(rows, dataset.schema)
+
+    def resample(self, params, form, files, dataset_id):
+        dataset = self._dataset(dataset_id)
+        try:
+            return compute.resample(self._table(dataset, params),
+                                    params.get('date_column'),
+                                    params.get('interval'),
+                                    params.get('how'))
+        except PyBambooException as e:
+            raise FakeError(unicode(e))
+
+    def rolling(self, params, form, files, dataset_id):
+        dataset = self._dataset(dataset_id)
+        try:
+            return compute.rolling(self._table(dataset, {}),
+                                   int(params.get('window', 0)),
+                                   params.get('win_type'))
+        except (PyBambooException, ValueError) as e:
+            raise FakeError(unicode(e))
+
+    def _row(self, dataset_id, index):
+        dataset = self._dataset(dataset_id)
+        index = int(index)
+        if index >= len(dataset.rows) or dataset.rows[index] is None:
+            raise FakeError('row %d not found' % index)
+        return dataset, index
+
+    def show_row(self, params, form, files, dataset_id, index):
+        dataset, index = self._row(dataset_id, index)
+        return dataset.output(dataset.rows[index])
+
+    def update_row(self, params, form, files, dataset_id, index):
+        dataset, index = self._row(dataset_id, index)
+        data = self._json(form.get('data', ''), 'data')
+        if not isinstance(data, dict):
+            raise FakeError('data must be a dict')
+        row = dataset.rows[index]
+        for column, value in data.iteritems():
+            if column in dataset.schema:
+                row[column] = None if _missing(value, ()) else convert(
+                    value, dataset.schema[column]['simpletype'])
+        self._recalculate(dataset)
+        return {'success': 'updated row: %d' % index, 'id': dataset.id}
+
+    def delete_row(self, params, form, files, dataset_id, index):
+        dataset, index = self._row(dataset_id, index)
+        dataset.rows[index] = None
+        self._recalculate(dataset)
+        return {'success': 'deleted row: %d' % index, 'id': dataset.id}
+
+
+class _Handler(BaseHTTPServer.BaseHTTPRequestHandler):
+
+    protocol_version = 'HTTP/1.1'
+
+    def _read_chunked(self):
+        chunks = []
+        while True:
+            line = self.rfile.readline()
+            if not line:
+                raise socket.error('The request body was cut short.')
+            size = int(line.split(';')[0], 16)
+            if not size:
+                # skip the trailer
+                while self.rfile.readline().strip():
+                    pass
+                return ''.join(chunks)
+            chunks.append(self.rfile.read(size))
+            self.rfile.readline()
+
+    def _handle(self, method):
+        url = urlparse.urlparse(self.path)
+        params = dict((key, values[-1]) for key, values in
+                      urlparse.parse_qs(url.query).iteritems())
+        form = {}
+        files = {}
+        body = ''
+        if 'chunked' in self.headers.get('transfer-encoding', ''):
+            body = self._read_chunked()
+        elif self.headers.get('content-length'):
+            body = self.rfile.read(int(self.headers['content-length']))
+        if body:
+            fields = cgi.FieldStorage(
+                fp=StringIO.StringIO(body),
+                headers={'content-type': self.headers.get('content-type'),
+                         'content-length': str(len(body))},
+                environ={'REQUEST_METHOD': 'POST',
+                         'CONTENT_TYPE': self.headers.get('content-type')})
+            for field in fields.list or []:
+                if field.filename is not None:
+                    files[field.name] = field.value
+                else:
+                    form[field.name] = field.value.decode('utf-8')
+        status, content_type, body = self.server.bamboo.handle(
+            method, url.path, params, form, files)
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        self._handle('GET')
+
+    def do_POST(self):
+        self._handle('POST')
+
+    def do_PUT(self):
+        self._handle('PUT')
+
+    def do_DELETE(self):
+        self._handle('DELETE')
+
+    def log_message(self, format, *args):
+        pass
+
+
+class _HTTPServer(SocketServer.ThreadingMixIn, BaseHTTPServer.HTTPServer):
+    daemon_threads = True
+
+    def __init__(self, *args):
+        BaseHTTPServer.HTTPServer.__init__(self, *args)
+        self.requests = set()
+
+    def process_request(self, request, client_address):
+        self.requests.add(request)
+        SocketServer.ThreadingMixIn.process_request(self, request,
+                                                    client_address)
+
+    def shutdown_request(self, request):
+        self.requests.discard(request)
+        BaseHTTPServer.HTTPServer.shutdown_request(self, request)
+
+    def handle_error(self, request, client_address):
+        if not isinstance(sys.exc_info()[1], socket.error):  # disconnects
+            BaseHTTPServer.HTTPServer.handle_error(self, request,
+                                                   client_address)
+
+    def close_requests(self, timeout=1):
+        # ends the keep-alive connections their handlers are waiting on
+        for request in list(self.requests):
+            try:
+                request.shutdown(socket.SHUT_RDWR)
+            except socket.error:
+                pass
+        expires_at = time.time() + timeout
+        while self.requests and time.time() < expires_at:
+            time.sleep(0.01)
+
+
+class FakeBambooServer(object):
+    """
+    Serves a FakeBamboo over HTTP on *host*:*port* (by default a free
+    port of localhost) from a background thread.
+    """
+
+    def __init__(self, host='127.0.0.1', port=0, bamboo=None):
+        self.bamboo = bamboo if bamboo is not None else FakeBamboo()
+        self._server = _HTTPServer((host, port), _Handler)
+        self._server.bamboo = self.bamboo
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self._server.server_address
+        return 'http://%s:%d' % (host, port)
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._server.serve_forever,
+                                            args=(0.05,), name='fake-bamboo')
+            self._thread.daemon = True
+            self._thread.start()
+        return self
+
+    def stop(self):
+        if self._thread is not None:
+            self._server.shutdown()
+            self._server.close_requests()
+            self._thread.join()
+            self._thread = None
+        self._server.server_close()
@@ -0,0 +1,180 @@
+import Queue
+import collections
+import threading
+import time
+
+from pybamboo.exceptions import PyBambooException
+from pybamboo.utils import PicklableLocks
+
+
+class LatencyTracker(PicklableLocks):
+    """
+    Keeps the last *window* latencies and computes percentiles over them.
+    """
+
+    def __init__(self, window=100):
+        self._samples = collections.deque(maxlen=window)
+        PicklableLocks.__init__(self)
+
+    def __len__(self):
+        return len(self._samples)
+
+    def record(self, latency):
+        with self._lock:
+            self._samples.append(latency)
+
+    def percentile(self, percentile):
+        """
+        Returns the *percentile* (0-100) of the recorded latencies, or None
+        if nothing was recorded yet.
+        """
+        with self._lock:
+            samples = sorted(self._samples)
+        if not samples:
+            return None
+        rank = int(round(percentile / 100.0 * (len(samples) - 1)))
+        return samples[min(len(samples) - 1, max(0, rank))]
+
+
+class HedgeBudget(PicklableLocks):
+    """
+    Caps the extra load created by hedging: every request earns *ratio*
+    tokens (up to *burst*) and every hedge spends one, so at most *ratio*
+    hedges are sent per request in the long run.
+    """
+
+    def __init__(self, ratio=0.1, burst=10):
+        if ratio < 0:
+            raise PyBambooException('ratio must be 0 or greater.')
+        self.ratio = ratio
+        self.burst = burst
+        self._tokens = 0.0
+        PicklableLocks.__init__(self)
+
+    def deposit(self):
+        with self._lock:
+            self._tokens = min(self.burst, self._tokens + self.ratio)
+
+    def withdraw(self):
+        with self._lock:
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return True
+            return False
+
+
+class _Attempt(threading.Thread):
+    """
+    One copy of a hedged request, sent from the shared *session*.
+    """
+
+    def __init__(self, send, session, results):
+        threading.Thread.__init__(self)
+        self.daemon = True
+        self._send = send
+        self._session = session
+        self._results = results
+        self._cancelled = False
+        self.response = None
+        self.error = None
+
+    def run(self):
+        try:
+            self.response = self._send(self._session)
+        except Exception as e:
+            self.error = e
+        if self._cancelled:
+            self._close()
+        else:
+            self._results.put(self)
+
+    def cancel(self):
+        """
+        Drops this attempt: its response is discarded unread and its
+        connection closed (best effort, a request in progress still
+        completes).
+        """
+        self._cancelled = True
+        self._close()
+
+    def _close(self):
+        if self.response is None:
+            return
+        # the body is left unread, so the connection cannot be reused
+        connection = getattr(getattr(self.response, 'raw', None),
+                             '_connection', None)
+        if connection is not None:
+            connection.close()
+        self.response.close()
+
+
+class HedgePolicy(object):
+    """
+    Hedging for idempotent reads.
+
+    If a request got no response after the *percentile* of the recent
+    latencies (clamped to [*min_delay*, *max_delay*]), a duplicate request
+    is sent; the first response wins and the other request is cancelled.
+    The requests are expected to be streamed, so that only the body of
+    the winning response is downloaded.
+    Hedging only starts after *min_samples* latencies were recorded and
+    is limited by *budget* (a HedgeBudget).
+    """
+
+    def __init__(self, percentile=95, min_delay=0.01, max_delay=None,
+                 min_samples=20, window=100, budget=None):
+        self.percentile = percentile
+        self.min_delay = min_delay
+        self.max_delay = max_delay
+        self.min_samples = min_samples
+        self.tracker = LatencyTracker(window)
+        self.budget = budget if budget is not None else HedgeBudget()
+        self.hedges_sent = 0
+
+    def delay(self):
+        """
+        Returns how long to wait before hedging, or None not to hedge.
+        """
+        if len(self.tracker) < self.min_samples:
+            return None
+        delay = max(self.min_delay, self.tracker.percentile(self.percentile))
+        if self.max_delay is not None:
+            delay = min(self.max_delay, delay)
+        return delay
+
+    def execute(self, send, session):
+        """
+        Calls *send* (a function taking a requests session and returning a
+        response) with *session*, hedging it if it is slow, and returns
+        the winning response.
+        """
+        results = Queue.Queue()
+        start = time.time()
+        attempts = [_Attempt(send, session, results)]
+        attempts[0].start()
+        self.budget.deposit()
+
+        delay = self.delay()
+        try:
+            winner = results.get(timeout=delay) if delay is not None \
+                else results.get()
+        except Queue.Empty:
+            if self.budget.withdraw():
+                self.hedges_sent += 1
+                attempts.append(_Attempt(send, session, results))
+                attempts[-1].start()
+            winner = results.get()
+
+        pending = len(attempts) - 1
+        while winner.error is not None and pending:
+            winner = results.get()
+            pending -= 1
+        for attempt in attempts:
+            if attempt is not winner:
+                attempt.cancel()
+
+        if winner.error is not None:
+            raise winner.error
+        # the latency of the request, not of the attempt that won it
+        self.tracker.record(time.time() - start)
+        return winner.response
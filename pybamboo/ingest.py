@@ -0,0 +1,101 @@
+"""
+Appending rows to a dataset from a pool of processes, so that parsing,
+validating and encoding the rows uses every core instead of the one a
+thread holding the GIL runs on:
+
+    def parse(row):
+        return {'amount': float(row['amount']), 'day': row['day']}
+
+    ingest.ingest_file(dataset, 'submissions.csv', parse, processes=4)
+
+Each process has its own copy of the dataset, sending its chunks of rows
+through its own connection pool.  *parse* must be a module level function
+so that it can be pickled.  Chunks are sent concurrently, so the rows may
+be appended in a different order than they are read.
+"""
+import collections
+import csv
+import multiprocessing
+
+from pybamboo.deadline import Deadline
+from pybamboo.exceptions import PyBambooException
+from pybamboo.utils import decode_csv_rows
+
+
+DEFAULT_CHUNK_SIZE = 1000
+# chunks waiting per process, bounding the rows held in memory
+QUEUED_CHUNKS = 2
+
+# the dataset and parse function of a pool process
+_worker = {}
+
+
+def _init_worker(dataset, parse):
+    _worker['dataset'] = dataset
+    _worker['parse'] = parse
+
+
+def _append(chunk, deadline):
+    parse = _worker['parse']
+    if parse is not None:
+        chunk = [row for row in map(parse, chunk) if row is not None]
+    if not chunk:
+        return 0
+    if not _worker['dataset'].update_data(chunk, deadline=deadline):
+        raise PyBambooException('Could not append %d rows.' % len(chunk))
+    return len(chunk)
+
+
+def chunks(rows, chunk_size):
+    """
+    Groups an iterable of *rows* in lists of at most *chunk_size* rows.
+    """
+    chunk = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) >= chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def ingest(dataset, rows, parse=None, chunk_size=DEFAULT_CHUNK_SIZE,
+           processes=None, deadline=None):
+    """
+    Appends *rows* to *dataset* in chunks of *chunk_size* rows, each one
+    parsed by *parse* (a function returning the row dict to append, or
+    None to skip the row), validated, encoded and sent in one of
+    *processes* processes (defaults to the number of cores).
+    Returns the number of rows appended.
+    """
+    deadline = Deadline.coerce(deadline)
+    processes = processes or multiprocessing.cpu_count()
+    pool = multiprocessing.Pool(processes, _init_worker, (dataset, parse))
+    pending = collections.deque()
+    appended = 0
+    try:
+        for chunk in chunks(rows, chunk_size):
+            if len(pending) >= processes * QUEUED_CHUNKS:
+                appended += pending.popleft().get()
+            pending.append(pool.apply_async(_append, (chunk, deadline)))
+        while pending:
+            appended += pending.popleft().get()
+    except BaseException:
+        pool.terminate()
+        raise
+    else:
+        pool.close()
+    finally:
+        pool.join()
+    return appended
+
+
+def ingest_file(dataset, path, parse=None, chunk_size=DEFAULT_CHUNK_SIZE,
+                processes=None, deadline=None):
+    """
+    Appends the rows of the CSV file *path* to *dataset*, see ingest().
+    """
+    with open(path, 'rb') as f:
+        return ingest(dataset, decode_csv_rows(csv.DictReader(f)), parse,
+                      chunk_size, processes, deadline)
@@ -0,0 +1,248 @@
+"""
+Bulk appends resumable after a crash, recorded in a local journal.
+
+The rows are sent in numbered chunks.  Before a chunk is sent, and again
+once bamboo has acknowledged it, an entry is appended to the journal and
+synced to disk.  Appending the same rows with the same journal after a
+crash skips the acknowledged chunks and resumes from the first one that
+was not.
+
+Every row is given a key, made of an id generated for the upload and
+the number of the row, in the column *key*.  A chunk that was sent but
+not acknowledged, or whose request failed in transit, may or may not
+have landed: its rows whose keys are already in the dataset are not sent
+again, so replaying it appends no duplicates.  The rows must therefore
+be given in the same order every time.
+
+The journal is locked while in use, so that two processes cannot run the
+same upload at once.
+"""
+import errno
+import fcntl
+import itertools
+import os
+import uuid
+
+import requests
+import simplejson as json
+
+from pybamboo.deadline import Deadline
+from pybamboo.exceptions import BambooServerError, PyBambooException
+from pybamboo.ingest import chunks
+
+
+ROW_KEY = 'row_key'
+# keys looked up per query, to keep its URL short
+KEYS_PER_QUERY = 100
+# times a chunk whose request failed in transit is sent again
+MAX_RESENDS = 3
+# errors after which a chunk may or may not have landed
+TRANSPORT_ERRORS = (requests.exceptions.ConnectionError,
+                    requests.exceptions.Timeout, BambooServerError)
+
+
+class Journal(object):
+    """
+    The journal of a bulk append: a file of one JSON entry per line, each
+    synced to disk as it is written.  The last line may have been cut
+    short by a crash, in which case it is dropped.  The file is locked
+    until the journal is closed.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.header = None
+        self.sent = set()
+        self.acked = set()
+        self.done = False
+        created = not os.path.exists(path)
+        self._file = open(path, 'a+b')
+        try:
+            fcntl.flock(self._file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except IOError as e:
+            self._file.close()
+            if e.errno not in (errno.EAGAIN, errno.EACCES):
+                raise
+            raise PyBambooException('The journal %s is in use by another '
+                                    'upload.' % path)
+        self._read()
+        if created:
+            _sync_directory(path)
+
+    def _read(self):
+        self._file.seek(0)
+        end = 0
+        for line in self._file:
+            if not line.endswith('\n'):
+                break
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                break
+            end += len(line)
+            self._apply(entry)
+        self._file.seek(end)
+        self._file.truncate()
+
+    def _apply(self, entry):
+        if 'upload' in entry:
+            self.header = entry
+        elif 'done' in entry:
+            self.done = True
+        elif entry.get('acked'):
+            self.acked.add(entry['chunk'])
+        else:
+            self.sent.add(entry['chunk'])
+
+    def write(self, entry):
+        """
+        Appends *entry* to the journal and syncs it to disk.
+        """
+        self._file.write(json.dumps(entry) + '\n')
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self._apply(entry)
+
+    def begin(self, dataset_id, chunk_size, key):
+        """
+        Starts a new upload, or checks that the journal is that of the
+        same upload when resuming one.
+        """
+        header = {'dataset_id': dataset_id, 'chunk_size': chunk_size,
+                  'key': key}
+        if self.header is None:
+            header['upload'] = uuid.uuid4().hex
+            self.write(header)
+            return
+        for name, value in header.iteritems():
+            if self.header.get(name) != value:
+                raise PyBambooException(
+                    'The journal %s is that of an upload with %s %r, not '
+                    '%r.' % (self.path, name, self.header.get(name), value))
+
+    @property
+    def upload(self):
+        return self.header['upload']
+
+    def resume_chunk(self):
+        """
+        Returns the number of the first chunk not acknowledged.
+        """
+        return next(number for number in itertools.count()
+                    if number not in self.acked)
+
+    def close(self):
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def _sync_directory(path):
+    # make the creation of the journal itself durable
+    directory = os.open(os.path.dirname(os.path.abspath(path)), os.O_RDONLY)
+    try:
+        os.fsync(directory)
+    finally:
+        os.close(directory)
+
+
+def _keyed_rows(rows, key, upload, first):
+    keyed = []
+    for number, row in enumerate(rows, first):
+        if not isinstance(row, dict):
+            raise PyBambooException('rows must be a list of dictionaries')
+        if key in row:
+            raise PyBambooException('The rows already have a %s column.'
+                                    % key)
+        row = dict(row)
+        row[key] = '%s-%d' % (upload, number)
+        keyed.append(row)
+    return keyed
+
+
+def _check_key_kept(dataset, key, deadline):
+    info = dataset.get_info(deadline=deadline)
+    if isinstance(info, dict) and key not in info.get('schema', {}):
+        raise PyBambooException(
+            'bamboo did not keep the %s column of %s: replayed rows could '
+            'not be told apart.' % (key, dataset.id))
+
+
+def _present_keys(dataset, key, keys, deadline):
+    present = set()
+    for start in xrange(0, len(keys), KEYS_PER_QUERY):
+        rows = dataset.get_data(
+            query={key: {'$in': keys[start:start + KEYS_PER_QUERY]}},
+            select=[key], deadline=deadline)
+        if isinstance(rows, dict):
+            raise PyBambooException(rows.get('error', rows))
+        present.update(row[key] for row in rows)
+    return present
+
+
+def _missing_rows(dataset, key, chunk, deadline):
+    present = _present_keys(dataset, key, [row[key] for row in chunk],
+                            deadline)
+    return [row for row in chunk if row[key] not in present]
+
+
+def _send_chunk(dataset, key, chunk, deadline):
+    """
+    Sends *chunk* without retrying it blindly: after a transport error
+    only its rows that did not land are sent again, up to MAX_RESENDS
+    times.  Returns whether or not bamboo accepted them.
+    """
+    for resend in itertools.count():
+        try:
+            return dataset.update_data(chunk, deadline=deadline,
+                                       num_retries=0)
+        except TRANSPORT_ERRORS:
+            if resend >= MAX_RESENDS:
+                raise
+        chunk = _missing_rows(dataset, key, chunk, deadline)
+        if not chunk:
+            return True
+
+
+def bulk_update(dataset, rows, path, key=ROW_KEY, chunk_size=1000,
+                deadline=None):
+    """
+    Appends *rows* to *dataset* in chunks of *chunk_size* rows, recorded
+    in the journal at *path*, resuming the upload that journal records if
+    there is one.  Returns the number of rows sent.
+
+    Raises PyBambooException once the first chunk is acknowledged if the
+    dataset did not keep the *key* column, without which resuming could
+    append rows twice.
+    """
+    deadline = Deadline.coerce(deadline)
+    sent = 0
+    checked = False
+    with Journal(path) as journal:
+        journal.begin(dataset.id, chunk_size, key)
+        if journal.done:
+            return sent
+        start = journal.resume_chunk()
+        rows = itertools.islice(rows, start * chunk_size, None)
+        for number, chunk in enumerate(chunks(rows, chunk_size), start):
+            chunk = _keyed_rows(chunk, key, journal.upload,
+                                number * chunk_size)
+            if number in journal.sent:
+                # the chunk may have landed before the crash
+                chunk = _missing_rows(dataset, key, chunk, deadline)
+            else:
+                journal.write({'chunk': number, 'rows': len(chunk)})
+            if chunk and not _send_chunk(dataset, key, chunk, deadline):
+                raise PyBambooException('bamboo refused chunk %d of %s.' %
+                                        (number, path))
+            journal.write({'chunk': number, 'acked': True})
+            sent += len(chunk)
+            if chunk and not checked:
+                _check_key_kept(dataset, key, deadline)
+                checked = True
+        journal.write({'done': True})
+    return sent
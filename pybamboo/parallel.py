@@ -0,0 +1,31 @@
+import collections
+from multiprocessing.pool import ThreadPool
+
+
+DEFAULT_WORKERS = 4
+
+
+def ordered_map(func, items, workers=DEFAULT_WORKERS):
+    """
+    Yields func(item) for every item of *items*, in order, computing up to
+    *workers* results concurrently.
+
+    Unlike ThreadPool.imap, at most *workers* results are held at once, so
+    a slow consumer does not make results pile up in memory.
+    """
+    if workers <= 1:
+        for item in items:
+            yield func(item)
+        return
+    pool = ThreadPool(workers)
+    pending = collections.deque()
+    try:
+        for item in items:
+            pending.append(pool.apply_async(func, (item,)))
+            if len(pending) >= workers:
+                yield pending.popleft().get()
+        while pending:
+            yield pending.popleft().get()
+    finally:
+        pool.terminate()
+        pool.join()
@@ -0,0 +1,201 @@
+"""
+Validation and encoding of the parameters of dataset reads, and prepared
+queries that do it once for requests sent many times:
+
+    by_food = dataset.prepare(select=['amount'],
+                              query={'food_type': Param('food')})
+    by_food.execute(food='lunch')
+    by_food.execute(food='dinner')
+"""
+import hashlib
+import re
+
+import simplejson as json
+
+from pybamboo.exceptions import PyBambooException
+from pybamboo.utils import safe_json_dumps
+
+
+PLACEHOLDER = '__pybamboo_param_%d__'
+RESERVED_NAMES = ['deadline', 'num_retries']
+PLACEHOLDER_RE = re.compile(r'"__pybamboo_param_(\d+)__"')
+
+
+class Param(object):
+    """
+    A named placeholder in the query of a prepared query, bound to a value
+    on each execution.
+    """
+
+    def __init__(self, name):
+        if not isinstance(name, basestring):
+            raise PyBambooException('Param name must be a string.')
+        if name in RESERVED_NAMES:
+            raise PyBambooException('Param name cannot be one of: %s.' %
+                                    RESERVED_NAMES)
+        self.name = name
+
+    def __repr__(self):
+        return 'Param(%r)' % self.name
+
+
+def _encode_select(select):
+    if not isinstance(select, list):
+        raise PyBambooException('select must be a list of strings.')
+    return safe_json_dumps(
+        dict([(sel, 1) for sel in select]),
+        PyBambooException('select is not JSON-serializable.'))
+
+
+def _encode_query(query):
+    if not isinstance(query, dict):
+        raise PyBambooException('query must be a dict.')
+    return safe_json_dumps(
+        query, PyBambooException('query is not JSON-serializable.'))
+
+
+def _check_string(name, value):
+    if not isinstance(value, basestring):
+        raise PyBambooException('%s must be a string.' % name)
+    return value
+
+
+def _encode_limit(limit):
+    if not isinstance(limit, int):
+        raise PyBambooException('limit must be an int.')
+    return safe_json_dumps(
+        limit, PyBambooException('limit is not JSON-serializable.'))
+
+
+def data_params(select=None, query=None, order_by=None, limit=0,
+                distinct=None, format=None, callback=None, count=False,
+                index=False, formats=('csv', 'json')):
+    """
+    Returns the request parameters of Dataset.get_data().
+    """
+    params = {}
+    if select:
+        params['select'] = _encode_select(select)
+    if query:
+        params['query'] = _encode_query(query)
+    if order_by:
+        params['order_by'] = _check_string('order_by', order_by)
+    if format:
+        _check_string('format', format)
+        if format not in formats:
+            raise PyBambooException('format must be one of: %s.' %
+                                    list(formats))
+        params['format'] = format
+    if distinct:
+        params['distinct'] = _check_string('distinct', distinct)
+    if callback:
+        params['callback'] = _check_string('callback', callback)
+    if limit:
+        params['limit'] = _encode_limit(limit)
+    if count:
+        params['count'] = bool(count)
+    if index:
+        params['index'] = bool(index)
+    return params
+
+
+def summary_params(select='all', groups=None, query=None, order_by=None,
+                   limit=0, callback=None):
+    """
+    Returns the request parameters of Dataset.get_summary().
+    """
+    params = {}
+    params['select'] = select if select == 'all' else _encode_select(select)
+    if groups is not None:
+        if not isinstance(groups, list):
+            raise PyBambooException('groups must be a list of strings.')
+        params['group'] = ','.join(groups)
+    if query is not None:
+        params['query'] = _encode_query(query)
+    if order_by:
+        params['order_by'] = _check_string('order_by', order_by)
+    if limit:
+        params['limit'] = _encode_limit(limit)
+    if callback:
+        params['callback'] = _check_string('callback', callback)
+    return params
+
+
+def mark_params(query, names):
+    """
+    Returns a copy of *query* where each Param is replaced by a JSON
+    placeholder, appending the names of the Params to *names*.
+    """
+    if isinstance(query, Param):
+        names.append(query.name)
+        return PLACEHOLDER % (len(names) - 1)
+    if isinstance(query, dict):
+        return dict((key, mark_params(value, names))
+                    for key, value in query.iteritems())
+    if isinstance(query, (list, tuple)):
+        return [mark_params(value, names) for value in query]
+    return query
+
+
+class PreparedQuery(object):
+    """
+    A read of a dataset whose parameters are validated and encoded once.
+
+    The Params of its query are bound on each execution by splicing the
+    JSON of their values into the encoded query.
+    """
+
+    def __init__(self, dataset, path, params, names=()):
+        self.dataset = dataset
+        self.path = path
+        self.params = params
+        self.names = frozenset(names)
+        self._slots = list(names)
+        self._chunks = None
+        if self._slots:
+            self._chunks = PLACEHOLDER_RE.split(params['query'])
+
+    def bind(self, **values):
+        """
+        Returns the request parameters with the Params bound to *values*.
+        """
+        if set(values) != self.names:
+            raise PyBambooException(
+                'Expected values for %s, got %s.' % (
+                    sorted(self.names), sorted(values)))
+        if self._chunks is None:
+            return self.params
+        encoded = {}
+        for name, value in values.iteritems():
+            encoded[name] = safe_json_dumps(value, PyBambooException(
+                '%s is not JSON-serializable.' % name))
+        query = []
+        for position, chunk in enumerate(self._chunks):
+            if position % 2:
+                chunk = encoded[self._slots[int(chunk)]]
+            query.append(chunk)
+        params = dict(self.params)
+        params['query'] = ''.join(query)
+        return params
+
+    def key(self, **values):
+        """
+        Returns a key identifying this query on this dataset with
+        *values*, usable as a cache key.
+        """
+        params = json.dumps(self.bind(**values), sort_keys=True)
+        return '%s-%s' % (self.dataset.id,
+                          hashlib.md5(self.path + params).hexdigest())
+
+    def execute(self, deadline=None, num_retries=None, **values):
+        """
+        Sends this query with its Params bound to *values*.
+        """
+        return self.dataset._connection.make_api_request(
+            'GET', self.path, params=self.bind(**values), deadline=deadline,
+            num_retries=num_retries)
+
+    __call__ = execute
+
+    def __repr__(self):
+        return 'PreparedQuery(%r, %r)' % (self.path, self.params)
@@ -0,0 +1,179 @@
+"""
+Compact, typed rows: a tuple-backed record class generated from a
+dataset's schema.
+
+A record stores its values in a tuple, in the order of the class's
+_fields, instead of a dict per row, and converts them to the column's
+type on decoding (integer and float columns to int and float, datetime
+columns to UTC datetimes).  Values are read by attribute, by column
+name or by position:
+
+    Row = record_class(dataset.get_info()['schema'])
+    row = Row.decode({'amount': '9', 'food_type': 'lunch'})
+    row.amount, row['food_type'], row[0]
+"""
+import datetime
+import keyword
+import operator
+import re
+
+from bson.tz_util import utc
+
+from pybamboo.exceptions import PyBambooException
+
+
+MAX_SHARED_VALUES = 10000
+EPOCH = datetime.datetime(1970, 1, 1, tzinfo=utc)
+
+
+def _intern(name):
+    try:
+        return intern(str(name))
+    except UnicodeEncodeError:
+        return name
+
+
+def _to_datetime(value):
+    if isinstance(value, datetime.datetime):
+        return value if value.tzinfo is not None \
+            else value.replace(tzinfo=utc)
+    if isinstance(value, (int, long, float)) and \
+            not isinstance(value, bool):
+        return EPOCH + datetime.timedelta(milliseconds=value)
+    raise ValueError(value)
+
+
+def converter(simpletype):
+    """
+    Returns the function converting a value of a column of *simpletype*,
+    returning None for n/a values and values that do not convert.
+    """
+    convert = {
+        'integer': int,
+        'float': float,
+        'datetime': _to_datetime,
+    }.get(simpletype)
+    shared = {}
+
+    def share(value):
+        # strings repeat a lot in a column, keep one copy of each
+        if not isinstance(value, basestring) or \
+                len(shared) >= MAX_SHARED_VALUES:
+            return value
+        return shared.setdefault(value, value)
+
+    def safe_convert(value):
+        if value is None:
+            return None
+        if convert is None:
+            return share(value)
+        try:
+            value = convert(value)
+        except (TypeError, ValueError, OverflowError):
+            return None
+        if value != value:  # NaN
+            return None
+        return value
+    return safe_convert
+
+
+class Record(tuple):
+    """
+    Base class of the record classes returned by record_class().
+    """
+
+    __slots__ = ()
+    _fields = ()
+    _positions = {}
+    _converters = ()
+
+    @classmethod
+    def decode(cls, row):
+        """
+        Returns the record of the row dict *row*, with typed values.
+        """
+        return tuple.__new__(cls, [convert(row.get(name))
+                                   for name, convert in
+                                   zip(cls._fields, cls._converters)])
+
+    def __new__(cls, *values):
+        if len(values) != len(cls._fields):
+            raise TypeError('%s takes %d values (%d given)' % (
+                cls.__name__, len(cls._fields), len(values)))
+        return tuple.__new__(cls, values)
+
+    def __getitem__(self, key):
+        if isinstance(key, basestring):
+            try:
+                key = self._positions[key]
+            except KeyError:
+                raise KeyError(key)
+        return tuple.__getitem__(self, key)
+
+    def get(self, name, default=None):
+        position = self._positions.get(name)
+        if position is None:
+            return default
+        return tuple.__getitem__(self, position)
+
+    def keys(self):
+        return list(self._fields)
+
+    def as_dict(self):
+        return dict(zip(self._fields, self))
+
+    def __repr__(self):
+        return '%s(%s)' % (self.__class__.__name__, ', '.join(
+            '%s=%r' % (name, value)
+            for name, value in zip(self._fields, self)))
+
+
+def _attribute(name):
+    attribute = re.sub(r'\W', '_', name)
+    if not attribute or attribute[0].isdigit() or attribute[0] == '_' \
+            or keyword.iskeyword(attribute) or attribute in vars(Record):
+        return None
+    return _intern(attribute)
+
+
+def record_class(schema, columns=None, index=False, name='Record'):
+    """
+    Returns a Record class for the *columns* (default: all, sorted) of
+    the bamboo *schema* ({column: {'simpletype': ...}}), with an integer
+    'index' field first if *index*.
+
+    Columns whose name is not a valid attribute are only readable by
+    name, e.g. record['1st column'].  Fields named like the tuple methods
+    (index, count) hide them.
+    """
+    if not isinstance(schema, dict):
+        raise PyBambooException('schema must be a dict.')
+    fields = list(columns) if columns is not None else sorted(schema)
+    simpletypes = [schema.get(field, {}).get('simpletype')
+                   for field in fields]
+    if index and 'index' not in fields:
+        fields.insert(0, 'index')
+        simpletypes.insert(0, 'integer')
+    fields = tuple(_intern(field) for field in fields)
+    attributes = {
+        '__slots__': (),
+        '_fields': fields,
+        '_positions': dict((field, position)
+                           for position, field in enumerate(fields)),
+        '_converters': tuple(converter(simpletype)
+                             for simpletype in simpletypes),
+    }
+    for position, field in enumerate(fields):
+        attribute = _attribute(field)
+        if attribute is not None and attribute not in attributes:
+            attributes[attribute] = property(operator.itemgetter(position))
+    return type(str(name), (Record,), attributes)
+
+
+def decode_rows(rows, schema, columns=None, index=False):
+    """
+    Returns the row dicts *rows* as records of a class generated from
+    *schema* (see record_class).
+    """
+    cls = record_class(schema, columns, index)
+    return [cls.decode(row) for row in rows]
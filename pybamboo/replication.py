@@ -0,0 +1,190 @@
+"""
+A connection to a primary bamboo server and its read replicas, balancing
+reads on latency and failing over between them.
+"""
+import threading
+import time
+
+import requests
+
+from pybamboo.connection import Connection
+from pybamboo.deadline import Deadline
+from pybamboo.exceptions import BambooServerError, PyBambooException
+
+
+DEFAULT_CHECK_INTERVAL = 5
+DEFAULT_CHECK_TIMEOUT = 2
+DEFAULT_SMOOTHING = 0.3
+DEFAULT_EJECT_AFTER = 3
+DEFAULT_READMIT_AFTER = 2
+FAILOVER_ERRORS = (requests.exceptions.RequestException, BambooServerError)
+
+
+class Node(object):
+    """
+    The health of one bamboo server: an exponentially weighted moving
+    average of its latency and its consecutive failures and successes.
+
+    A node is ejected after *eject_after* consecutive failures and
+    re-admitted after *readmit_after* consecutive successes.
+    """
+
+    def __init__(self, connection, smoothing=DEFAULT_SMOOTHING,
+                 eject_after=DEFAULT_EJECT_AFTER,
+                 readmit_after=DEFAULT_READMIT_AFTER):
+        self.connection = connection
+        self.smoothing = smoothing
+        self.eject_after = eject_after
+        self.readmit_after = readmit_after
+        self.latency = None
+        self.healthy = True
+        self.failures = 0
+        self.successes = 0
+        self._lock = threading.Lock()
+
+    @property
+    def url(self):
+        return self.connection.url
+
+    def record(self, latency=None, success=True):
+        with self._lock:
+            if success:
+                self.failures = 0
+                self.successes += 1
+                if self.latency is None:
+                    self.latency = latency
+                elif latency is not None:
+                    self.latency += self.smoothing * (latency - self.latency)
+                if not self.healthy and self.successes >= self.readmit_after:
+                    self.healthy = True
+            else:
+                self.successes = 0
+                self.failures += 1
+                if self.failures >= self.eject_after:
+                    self.healthy = False
+
+    def __repr__(self):
+        return 'Node(%r, latency=%r, healthy=%r)' % (self.url, self.latency,
+                                                     self.healthy)
+
+
+class ReplicatedConnection(object):
+    """
+    A connection to a *primary* bamboo server and its *replicas* (URLs or
+    Connections), usable in place of a Connection.
+
+    Writes go to the primary.  Reads go to the healthy server with the
+    lowest recent latency and fail over to the next one on connection
+    errors, timeouts and server errors.  A background thread checks
+    /version on every server each *check_interval* seconds to eject
+    failing servers and re-admit them once they answer again (see Node).
+
+    Replicas may lag behind the primary: a read following a write can
+    miss it.
+    """
+
+    def __init__(self, primary, replicas=(),
+                 check_interval=DEFAULT_CHECK_INTERVAL,
+                 check_timeout=DEFAULT_CHECK_TIMEOUT,
+                 smoothing=DEFAULT_SMOOTHING,
+                 eject_after=DEFAULT_EJECT_AFTER,
+                 readmit_after=DEFAULT_READMIT_AFTER, start=True,
+                 clock=time.time, **connection_kwargs):
+        def node(server):
+            if not isinstance(server, Connection):
+                server = Connection(server, **connection_kwargs)
+            return Node(server, smoothing, eject_after, readmit_after)
+        self.primary = node(primary)
+        self.nodes = [self.primary] + [node(replica) for replica in replicas]
+        self.check_interval = check_interval
+        self.check_timeout = check_timeout
+        self.clock = clock
+        self._stopped = threading.Event()
+        self._checker = None
+        if start:
+            self.start()
+
+    @property
+    def url(self):
+        return self.primary.url
+
+    @property
+    def version(self):
+        return self.make_api_request('GET', '/version')
+
+    def start(self):
+        """
+        Starts the background health checks.
+        """
+        if self._checker is not None:
+            return
+        self._stopped.clear()
+        self._checker = threading.Thread(target=self._check_forever,
+                                         name='pybamboo-health-check')
+        self._checker.daemon = True
+        self._checker.start()
+
+    def close(self):
+        """
+        Stops the background health checks.
+        """
+        self._stopped.set()
+        if self._checker is not None:
+            self._checker.join()
+            self._checker = None
+
+    def _check_forever(self):
+        while not self._stopped.wait(self.check_interval):
+            self.check()
+
+    def check(self):
+        """
+        Checks /version on every server once.
+        """
+        for node in self.nodes:
+            start = self.clock()
+            try:
+                node.connection.make_api_request(
+                    'GET', '/version', deadline=self.check_timeout,
+                    num_retries=0)
+            except (PyBambooException,) + FAILOVER_ERRORS:
+                node.record(success=False)
+            else:
+                node.record(self.clock() - start)
+
+    def read_nodes(self):
+        """
+        Returns the servers to read from, best first: healthy ones by
+        increasing latency (unmeasured ones first), then ejected ones as a
+        last resort.
+        """
+        return sorted(self.nodes, key=lambda node: (
+            not node.healthy, node.latency is not None, node.latency))
+
+    def make_api_request(self, http_method, url, data=None, files=None,
+                         params=None, **kwargs):
+        kwargs.update(data=data, files=files, params=params)
+        if http_method != 'GET':
+            return self._send(self.primary, http_method, url, kwargs)
+        # one deadline for the whole failover
+        kwargs['deadline'] = Deadline.coerce(kwargs.get('deadline'))
+        nodes = self.read_nodes()
+        for node in nodes[:-1]:
+            try:
+                # fail over rather than retry, the last node retries
+                return self._send(node, http_method, url,
+                                  dict(kwargs, num_retries=0))
+            except FAILOVER_ERRORS:
+                continue
+        return self._send(nodes[-1], http_method, url, kwargs)
+
+    def _send(self, node, http_method, url, kwargs):
+        start = self.clock()
+        try:
+            result = node.connection.make_api_request(http_method, url,
+                                                      **kwargs)
+        except FAILOVER_ERRORS:
+            node.record(success=False)
+            raise
+        node.record(self.clock() - start)
+        return result
@@ -0,0 +1,166 @@
+import random
+import sys
+import time
+
+import requests
+
+from pybamboo.exceptions import PyBambooException
+from pybamboo.utils import PicklableLocks
+
+
+RETRYABLE_STATUS_CODES = (408, 429, 500, 502, 503, 504)
+IDEMPOTENT_METHODS = ('GET', 'PUT', 'DELETE')
+
+# outcomes of RetryPolicy.classify()
+SUCCESS = 'success'
+RETRYABLE = 'retryable'
+FATAL = 'fatal'
+
+
+class RetryBudget(PicklableLocks):
+    """
+    Limits retries to a *ratio* of requests so that retries cannot
+    amplify an outage: every request earns *ratio* tokens (up to *burst*)
+    and every retry spends one.  The budget starts full.
+    """
+
+    def __init__(self, ratio=0.2, burst=10):
+        if ratio < 0:
+            raise PyBambooException('ratio must be 0 or greater.')
+        self.ratio = ratio
+        self.burst = burst
+        self._tokens = float(burst)
+        PicklableLocks.__init__(self)
+
+    def deposit(self):
+        with self._lock:
+            self._tokens = min(self.burst, self._tokens + self.ratio)
+
+    def withdraw(self):
+        with self._lock:
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return True
+            return False
+
+
+# shared by every RetryPolicy that is not given its own budget
+DEFAULT_RETRY_BUDGET = RetryBudget()
+
+
+class RetryPolicy(object):
+    """
+    Decides whether and when a failed request is sent again.
+
+    Transport errors and the *retry_status_codes* are retried up to
+    *max_retries* times, only for idempotent HTTP methods or for calls
+    explicitly marked as safe, with exponential backoff (*base_delay* *
+    *multiplier* ** attempt, capped at *max_delay*) and full jitter.
+    Every retry is paid for from *budget*.
+    """
+
+    def __init__(self, max_retries=3, base_delay=0.5, max_delay=30,
+                 multiplier=2, budget=None,
+                 retry_status_codes=RETRYABLE_STATUS_CODES,
+                 idempotent_methods=IDEMPOTENT_METHODS, sleep=time.sleep):
+        if max_retries < 0:
+            raise PyBambooException('max_retries must be 0 or greater.')
+        self.max_retries = int(max_retries)
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.multiplier = multiplier
+        self.budget = budget if budget is not None else DEFAULT_RETRY_BUDGET
+        self.retry_status_codes = retry_status_codes
+        self.idempotent_methods = idempotent_methods
+        self._sleep = sleep
+
+    def with_max_retries(self, max_retries):
+        """
+        Returns a copy of this policy allowing *max_retries* retries.
+        """
+        return RetryPolicy(max_retries, self.base_delay, self.max_delay,
+                           self.multiplier, self.budget,
+                           self.retry_status_codes, self.idempotent_methods,
+                           self._sleep)
+
+    def classify(self, response=None, error=None):
+        """
+        Returns SUCCESS, RETRYABLE or FATAL for the *response* or the
+        transport *error* of a request.
+        """
+        if error is not None:
+            if isinstance(error, (requests.exceptions.ConnectionError,
+                                  requests.exceptions.Timeout)):
+                return RETRYABLE
+            return FATAL
+        if response.status_code in self.retry_status_codes:
+            return RETRYABLE
+        if response.status_code >= 500:
+            return FATAL
+        return SUCCESS
+
+    def is_safe(self, http_method, error=None, safe=None):
+        """
+        Whether or not a request can be sent again.  A request that could
+        not even connect never reached bamboo and is always safe; otherwise
+        *safe* (when not None) overrides the idempotency of *http_method*.
+        """
+        if isinstance(error, requests.exceptions.ConnectTimeout):
+            return True
+        if safe is not None:
+            return safe
+        return http_method.upper() in self.idempotent_methods
+
+    def backoff(self, attempt, response=None):
+        """
+        Returns the delay before retry number *attempt* (starting at 0),
+        honouring the Retry-After header of *response* if any.
+        """
+        delay = random.uniform(
+            0, min(self.max_delay,
+                   self.base_delay * self.multiplier ** attempt))
+        if response is not None:
+            try:
+                delay = max(delay, float(response.headers['retry-after']))
+            except (KeyError, TypeError, ValueError):
+                pass
+        return delay
+
+    def call(self, send, http_method, safe=None, deadline=None):
+        """
+        Calls *send* (which sends a request and returns its response)
+        until it succeeds, cannot be retried or runs out of retries, and
+        returns the last response or raises the last transport error.
+
+        *safe* marks the request as safe (True) or unsafe (False) to retry
+        whatever its HTTP method, e.g. a PUT that appends rows, and
+        *deadline* (a pybamboo.deadline.Deadline) bounds the backoff sleeps.
+        """
+        self.budget.deposit()
+        attempt = 0
+        while True:
+            response = error = None
+            try:
+                response = send()
+            except Exception:
+                exc_info = sys.exc_info()
+                error = exc_info[1]
+
+            if self.classify(response, error) != RETRYABLE \
+                    or attempt >= self.max_retries \
+                    or not self.is_safe(http_method, error, safe):
+                break
+            delay = self.backoff(attempt, response)
+            if deadline is not None and deadline.remaining() <= delay:
+                break
+            if not self.budget.withdraw():
+                break
+            if response is not None:
+                # release the connection of a streamed response
+                response.close()
+            self._sleep(delay)
+            attempt += 1
+
+        if error is not None:
+            raise exc_info[0], exc_info[1], exc_info[2]
+        return response
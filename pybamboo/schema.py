@@ -0,0 +1,186 @@
+"""
+Client-side inference of the SDF schema of CSV data, sent along with an
+upload so that bamboo does not have to infer it over the whole file.
+
+Only a sample of the rows is looked at, read one row at a time: the
+inferred simpletypes hold for the sample, values further on that do not
+convert are n/a.
+"""
+import csv
+import datetime
+import itertools
+import re
+
+from pybamboo.exceptions import PyBambooException
+from pybamboo.utils import DATETIME_FORMATS, safe_json_loads
+
+
+SAMPLE_SIZE = 10000
+# values taken for n/a values when they appear in columns of another type
+NA_CANDIDATES = ['-', '.', '?', 'N/A', 'NA', 'NULL', 'NaN', 'None', 'n/a',
+                 'na', 'nan', 'null', 'none']
+BOOLEANS = ['false', 'true']
+NUMERIC_SIMPLETYPES = ['integer', 'float']
+INTEGER_RE = re.compile(r'^[+-]?\d+$')
+FLOAT_RE = re.compile(r'^[+-]?(\d+\.?\d*|\.\d+)([eE][+-]?\d+)?$')
+
+
+def sdf(schema):
+    """
+    Returns the SDF of *schema*: an SDF dict or JSON string, or a dict of
+    columns to their simpletype.
+    """
+    if isinstance(schema, basestring):
+        schema = safe_json_loads(schema, PyBambooException(
+            'schema is not valid JSON.'))
+    if not isinstance(schema, dict):
+        raise PyBambooException('schema must be a dict.')
+    result = {}
+    for column, description in schema.iteritems():
+        if isinstance(description, basestring):
+            description = {'simpletype': description}
+        if not isinstance(description, dict) or \
+                'simpletype' not in description:
+            raise PyBambooException('Invalid schema for column %s.' %
+                                    column)
+        description = dict(description)
+        description.setdefault('label', column)
+        description.setdefault(
+            'olap_type', 'measure' if description['simpletype'] in
+            NUMERIC_SIMPLETYPES else 'dimension')
+        result[column] = description
+    return result
+
+
+class ColumnInference(object):
+    """
+    The possible simpletypes of a column, narrowed as values are observed.
+    """
+
+    def __init__(self, name, na_values):
+        self.name = name
+        self.na_values = na_values
+        self.count = 0
+        self.missing = 0
+        self.na_candidates = set()
+        self.types = set(['integer', 'float', 'boolean'])
+        self.date_formats = list(DATETIME_FORMATS)
+
+    def observe(self, value):
+        value = value.strip()
+        if not value or value in self.na_values:
+            self.missing += 1
+            return
+        if value in NA_CANDIDATES:
+            self.missing += 1
+            self.na_candidates.add(value)
+            return
+        self.count += 1
+        if 'integer' in self.types and not INTEGER_RE.match(value):
+            self.types.discard('integer')
+        if 'float' in self.types and not FLOAT_RE.match(value):
+            self.types.discard('float')
+        if 'boolean' in self.types and value.lower() not in BOOLEANS:
+            self.types.discard('boolean')
+        if self.date_formats:
+            self.date_formats = [date_format for date_format in
+                                 self.date_formats
+                                 if _is_date(value, date_format)]
+
+    @property
+    def is_dates(self):
+        """
+        Whether all the values of this column are dates in one of the
+        formats bamboo parses.
+        """
+        return bool(self.count and self.date_formats)
+
+    @property
+    def simpletype(self):
+        if not self.count:
+            return 'string'
+        if 'integer' in self.types:
+            # pandas reads integer columns with n/a values as floats
+            return 'float' if self.missing else 'integer'
+        if 'float' in self.types:
+            return 'float'
+        if self.is_dates:
+            return 'datetime'
+        if 'boolean' in self.types:
+            return 'boolean'
+        return 'string'
+
+    @property
+    def detected_na_values(self):
+        """
+        The candidate n/a values found in this column, if it is not one of
+        strings (where they may well be values).
+        """
+        if self.simpletype == 'string':
+            return set()
+        return self.na_candidates
+
+
+def _is_date(value, date_format):
+    try:
+        datetime.datetime.strptime(value, date_format)
+    except ValueError:
+        return False
+    return True
+
+
+class SchemaInference(object):
+    """
+    Infers the SDF schema and the n/a values of the rows of a CSV file
+    from the values observed, a row at a time.
+    """
+
+    def __init__(self, columns, na_values=None):
+        self.na_values = list(na_values or [])
+        self.columns = [ColumnInference(column, set(self.na_values))
+                        for column in columns]
+        self.rows = 0
+
+    def observe(self, values):
+        """
+        Observes the string *values* of a row, in the order of the columns.
+        """
+        self.rows += 1
+        for column, value in itertools.izip(self.columns, values):
+            column.observe(value)
+
+    def all_na_values(self):
+        """
+        Returns the given n/a values and those detected in the columns.
+        n/a values apply to every column, so a value found in a column of
+        strings is not taken for one.
+        """
+        detected = set()
+        strings = set()
+        for column in self.columns:
+            detected.update(column.detected_na_values)
+            if column.simpletype == 'string':
+                strings.update(column.na_candidates)
+        return self.na_values + sorted(detected - strings -
+                                       set(self.na_values))
+
+    def sdf(self):
+        """
+        Returns the SDF schema of the columns, as a dict.
+        """
+        return sdf(dict((column.name, column.simpletype)
+                        for column in self.columns))
+
+
+def infer_csv(csv_file, na_values=None, sample_size=SAMPLE_SIZE):
+    """
+    Returns the SchemaInference of the first *sample_size* rows of the
+    UTF-8 CSV in the file-like *csv_file*, read a row at a time.
+    """
+    reader = csv.reader(csv_file)
+    header = next(reader, [])
+    inference = SchemaInference([column.decode('utf-8')
+                                 for column in header], na_values)
+    for values in itertools.islice(reader, sample_size):
+        inference.observe(values)
+    return inference
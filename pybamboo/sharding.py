@@ -0,0 +1,313 @@
+"""
+Datasets spread over several bamboo servers.
+
+A ShardedConnection is used like a Connection: it routes the requests of
+a dataset to the server holding it, found by consistent hashing of the
+dataset id unless the dataset was placed elsewhere.  As bamboo assigns
+dataset ids, new datasets are placed on the least loaded server and
+their placement is recorded.  Datasets whose placement is not recorded
+and that are not on their hash ring server are looked for on every
+server.
+"""
+import bisect
+import collections
+import contextlib
+import hashlib
+import re
+import threading
+
+import simplejson as json
+
+from pybamboo.connection import Connection
+from pybamboo.exceptions import PyBambooException
+from pybamboo.parallel import DEFAULT_WORKERS, ordered_map
+from pybamboo.query import summary_params
+
+
+DEFAULT_REPLICAS = 100
+DATASET_URL_RE = re.compile(r'^/datasets/([^/]+)(/.*)?$')
+CROSS_DATASET_IDS = ['merge', 'join']
+DESCRIBE_KEYS = ['count', 'mean', 'std', 'min', 'max', '25%', '50%', '75%']
+
+
+def _hash(key):
+    return int(hashlib.md5(key.encode('utf-8')).hexdigest()[:16], 16)
+
+
+class HashRing(object):
+    """
+    A consistent hash ring of *nodes*, each placed *replicas* times, so
+    that adding or removing a node only moves the keys of that node.
+    """
+
+    def __init__(self, nodes, replicas=DEFAULT_REPLICAS):
+        if not nodes:
+            raise PyBambooException('A hash ring needs at least one node.')
+        points = sorted((_hash(u'%s#%d' % (node, replica)), node)
+                        for node in nodes for replica in xrange(replicas))
+        self._hashes = [point for point, node in points]
+        self._nodes = [node for point, node in points]
+
+    def node(self, key):
+        position = bisect.bisect(self._hashes, _hash(key))
+        return self._nodes[position % len(self._nodes)]
+
+
+def merge_summaries(summaries):
+    """
+    Merges the results of get_summary() on several datasets, as if they
+    were the summary of their rows together: counts of categorical
+    columns are added, the count, mean, std, min and max of numeric
+    columns are combined.  Quartiles cannot be combined and are left out.
+    """
+    summaries = [summary for summary in summaries if summary]
+    if not summaries:
+        return {}
+    if 'summary' in summaries[0]:
+        merged = dict(summaries[0])
+        merged['summary'] = _merge_column([summary['summary']
+                                           for summary in summaries])
+        return merged
+    merged = {}
+    for key in _union_keys(summaries):
+        merged[key] = merge_summaries([summary[key] for summary in summaries
+                                       if isinstance(summary.get(key), dict)])
+    return merged
+
+
+def _union_keys(dicts):
+    keys = collections.OrderedDict()
+    for d in dicts:
+        for key in d:
+            keys[key] = None
+    return keys.keys()
+
+
+def _is_describe(summary):
+    return 'count' in summary and 'mean' in summary and \
+        set(summary).issubset(DESCRIBE_KEYS)
+
+
+def _merge_column(summaries):
+    if not all(_is_describe(summary) for summary in summaries):
+        counts = {}
+        for summary in summaries:
+            for value, count in summary.iteritems():
+                counts[value] = counts.get(value, 0) + int(count)
+        return counts
+    parts = [(float(summary['count']), float(summary['mean']),
+              float(summary.get('std') or 0)) for summary in summaries
+             if float(summary['count'])]
+    count = sum(n for n, mean, std in parts)
+    if not count:
+        return {'count': 0}
+    mean = sum(n * m for n, m, std in parts) / count
+    merged = {'count': count, 'mean': mean}
+    if count > 1:
+        squares = sum((n - 1) * std ** 2 + n * (m - mean) ** 2
+                      for n, m, std in parts)
+        merged['std'] = (squares / (count - 1)) ** 0.5
+    for key, function in (('min', min), ('max', max)):
+        values = [float(summary[key]) for summary in summaries
+                  if summary.get(key) is not None]
+        if values:
+            merged[key] = function(values)
+    return merged
+
+
+class ShardedConnection(object):
+    """
+    A connection to several bamboo servers, the shards, holding disjoint
+    sets of datasets.  It can be passed to Dataset like a Connection.
+
+    *shards* is a list of bamboo URLs or Connections.  *placements* maps
+    the ids of datasets placed on a shard other than their hash ring shard
+    (i.e. created through a ShardedConnection) to that shard's URL; pass a
+    persistent mapping (e.g. a shelve) to keep them between processes.
+    Without one, the shard of a dataset placed by another process is
+    found by asking each shard for it (see locate()).
+
+    Merges and joins are only possible between datasets on the same
+    shard, see colocate().
+    """
+
+    def __init__(self, shards, placements=None, replicas=DEFAULT_REPLICAS,
+                 **connection_kwargs):
+        self.shards = collections.OrderedDict()
+        for shard in shards:
+            if not isinstance(shard, Connection):
+                shard = Connection(shard, **connection_kwargs)
+            self.shards[shard.url] = shard
+        self.ring = HashRing(list(self.shards), replicas)
+        self.placements = placements if placements is not None else {}
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._load = collections.Counter(dict.fromkeys(self.shards, 0))
+        for url in self.placements.values():
+            if url in self._load:
+                self._load[url] += 1
+
+    @property
+    def version(self):
+        return self.make_api_request('GET', '/version')
+
+    def shard_url(self, dataset_id):
+        """
+        Returns the URL of the shard holding the dataset *dataset_id*.
+        """
+        url = self.placements.get(str(dataset_id))
+        if url is None or url not in self.shards:
+            url = self.ring.node(dataset_id)
+        return url
+
+    def connection_for(self, dataset_id):
+        return self.shards[self.shard_url(dataset_id)]
+
+    def locate(self, dataset_id, deadline=None):
+        """
+        Returns the URL of the shard holding the dataset *dataset_id*,
+        asking the shards for its info, hash ring shard first, if its
+        placement is not recorded.  The shard found is recorded as its
+        placement.  Returns None if no shard has it.
+        """
+        url = self.placements.get(str(dataset_id))
+        if url in self.shards:
+            return url
+        ring_url = self.ring.node(dataset_id)
+        for url in [ring_url] + [url for url in self.shards
+                                 if url != ring_url]:
+            info = self.shards[url].make_api_request(
+                'GET', '/datasets/%s/info' % dataset_id, deadline=deadline)
+            if isinstance(info, dict) and 'error' not in info:
+                self.place(dataset_id, url)
+                return url
+        return None
+
+    def place(self, dataset_id, url):
+        with self._lock:
+            previous = self.placements.get(str(dataset_id))
+            if previous == url:
+                return
+            if previous in self._load:
+                self._load[previous] -= 1
+            self.placements[str(dataset_id)] = url
+            self._load[url] += 1
+
+    def _forget(self, url):
+        match = DATASET_URL_RE.match(url)
+        if match is None or match.group(2) is not None:
+            return
+        with self._lock:
+            shard_url = self.placements.pop(str(match.group(1)), None)
+            if shard_url in self._load:
+                self._load[shard_url] -= 1
+
+    @contextlib.contextmanager
+    def colocate(self, dataset_id):
+        """
+        Creates the datasets created in this thread within the block on
+        the shard of *dataset_id*, so that they can be merged or joined
+        with it:
+
+            with sharded.colocate(left.id):
+                right = Dataset(path='right.csv', connection=sharded)
+        """
+        previous = getattr(self._local, 'url', None)
+        self._local.url = self.shard_url(dataset_id)
+        try:
+            yield
+        finally:
+            self._local.url = previous
+
+    def _new_dataset_url(self):
+        url = getattr(self._local, 'url', None)
+        if url is not None:
+            return url
+        with self._lock:
+            return min(self.shards, key=lambda url: self._load[url])
+
+    def _colocated_url(self, dataset_ids):
+        urls = set(self.locate(dataset_id) or self.shard_url(dataset_id)
+                   for dataset_id in dataset_ids)
+        if len(urls) != 1:
+            raise PyBambooException(
+                'Datasets %s are on different shards (%s), create them '
+                'with ShardedConnection.colocate().' % (
+                    ', '.join(dataset_ids), ', '.join(sorted(urls))))
+        return urls.pop()
+
+    def _route(self, http_method, url, data):
+        """
+        Returns the shard URL of a request and whether the dataset it
+        creates should be placed there.
+        """
+        # streamed bodies (see pybamboo.upload) are not dicts
+        data = data if isinstance(data, dict) else {}
+        if url == '/datasets' and http_method == 'POST':
+            if data.get('dataset_id'):  # reset
+                return self.shard_url(data['dataset_id']), False
+            return self._new_dataset_url(), True
+        if url == '/datasets/merge':
+            return self._colocated_url(json.loads(data['dataset_ids'])), True
+        if url == '/datasets/join':
+            return self._colocated_url([data['dataset_id'],
+                                        data['other_dataset_id']]), True
+        match = DATASET_URL_RE.match(url)
+        if match is not None and match.group(1) not in CROSS_DATASET_IDS:
+            return self.shard_url(match.group(1)), False
+        return self.shards.keys()[0], False
+
+    def _unplaced_dataset_id(self, url):
+        match = DATASET_URL_RE.match(url)
+        if match is None or match.group(1) in CROSS_DATASET_IDS or \
+                match.group(1) in self.placements:
+            return None
+        return match.group(1)
+
+    def make_api_request(self, http_method, url, data=None, files=None,
+                         params=None, **kwargs):
+        shard_url, creates = self._route(http_method, url, data)
+
+        def send(shard_url):
+            return self.shards[shard_url].make_api_request(
+                http_method, url, data=data, files=files, params=params,
+                **kwargs)
+        result = send(shard_url)
+        dataset_id = self._unplaced_dataset_id(url)
+        if isinstance(result, dict) and 'error' in result and \
+                not creates and dataset_id is not None:
+            # the dataset may have been placed by another process
+            located = self.locate(dataset_id, kwargs.get('deadline'))
+            if located is not None and located != shard_url:
+                shard_url = located
+                result = send(shard_url)
+        if not isinstance(result, dict):
+            return result
+        if creates and result.get('id'):
+            self.place(result['id'], shard_url)
+        elif http_method == 'DELETE' and 'success' in result:
+            self._forget(url)
+        elif url.endswith('/aggregations'):
+            # aggregated datasets live with the dataset they aggregate
+            for dataset_id in result.values():
+                if dataset_id not in self.placements:
+                    self.place(dataset_id, shard_url)
+        return result
+
+    def get_summary(self, dataset_ids, select='all', groups=None,
+                    query=None, workers=DEFAULT_WORKERS, deadline=None):
+        """
+        Returns the summary of the rows of the datasets *dataset_ids*
+        together, fetching their summaries from their shards concurrently
+        and merging them (see merge_summaries).
+        """
+        params = summary_params(select, groups, query)
+
+        def fetch(dataset_id):
+            summary = self.make_api_request(
+                'GET', '/datasets/%s/summary' % dataset_id, params=params,
+                deadline=deadline)
+            if isinstance(summary, dict) and 'error' in summary:
+                raise PyBambooException(summary['error'])
+            return summary
+        return merge_summaries(ordered_map(fetch, dataset_ids, workers))
@@ -0,0 +1,196 @@
+"""
+Response bodies too large to be held in memory, spilled to a temporary
+file as they are downloaded.
+
+A Connection with a *spill_threshold* streams its responses: bodies up to
+that many bytes are processed as usual, larger ones are written to a
+temporary file and returned as a SpilledBody (CSV) or SpilledRows (a JSON
+list, decoded one row at a time).
+"""
+import mmap
+import os
+import tempfile
+
+import simplejson as json
+from bson import json_util
+
+from pybamboo.exceptions import ErrorParsingBambooData, PyBambooException
+
+
+DEFAULT_CHUNK_SIZE = 64 * 1024
+WHITESPACE = ' \t\n\r'
+
+
+def read_body(response, threshold, chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Reads the body of the streamed *response*: a string if it is at most
+    *threshold* bytes long, a SpilledBody otherwise.
+    """
+    chunks = []
+    size = 0
+    spilled = None
+    for chunk in response.iter_content(chunk_size):
+        if spilled is not None:
+            spilled.write(chunk)
+            continue
+        chunks.append(chunk)
+        size += len(chunk)
+        if size > threshold:
+            spilled = tempfile.TemporaryFile()
+            spilled.write(''.join(chunks))
+            chunks = None
+    if spilled is None:
+        return ''.join(chunks)
+    spilled.flush()
+    spilled.seek(0)
+    return SpilledBody(spilled)
+
+
+class SpilledBody(object):
+    """
+    A response body in a temporary file, readable like a file or as a
+    read-only memory map (buffer).  The file is removed when closed.
+    """
+
+    def __init__(self, file):
+        self.file = file
+        self._buffer = None
+
+    @property
+    def size(self):
+        return os.fstat(self.file.fileno()).st_size
+
+    def __len__(self):
+        return self.size
+
+    @property
+    def buffer(self):
+        """
+        The body as a read-only mmap.mmap, sliceable like a string.
+        """
+        if self._buffer is None:
+            self._buffer = mmap.mmap(self.file.fileno(), 0,
+                                     access=mmap.ACCESS_READ)
+        return self._buffer
+
+    def read(self, size=-1):
+        return self.file.read(size)
+
+    def readline(self, size=-1):
+        return self.file.readline(size)
+
+    def __iter__(self):
+        return iter(self.file)
+
+    def seek(self, offset, whence=os.SEEK_SET):
+        self.file.seek(offset, whence)
+
+    def tell(self):
+        return self.file.tell()
+
+    def close(self):
+        if self._buffer is not None:
+            self._buffer.close()
+            self._buffer = None
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def first_character(body):
+    """
+    Returns the first non-whitespace character of the file-like *body*
+    and leaves its position on that character.
+    """
+    body.seek(0)
+    while True:
+        chunk = body.read(DEFAULT_CHUNK_SIZE)
+        if not chunk:
+            return ''
+        stripped = chunk.lstrip(WHITESPACE)
+        if stripped:
+            body.seek(-len(stripped), os.SEEK_CUR)
+            return stripped[0]
+
+
+def iter_json_list(body, chunk_size=DEFAULT_CHUNK_SIZE,
+                   object_hook=json_util.object_hook):
+    """
+    Yields the items of the JSON list in the file-like *body*, decoding
+    *chunk_size* bytes at a time.
+    """
+    decoder = json.JSONDecoder(object_hook=object_hook)
+    if first_character(body) != '[':
+        raise ErrorParsingBambooData('The body is not a JSON list.')
+    data = body.read(chunk_size)
+    position = 1
+    eof = False
+    while True:
+        while position < len(data) and data[position] in WHITESPACE + ',':
+            position += 1
+        if position < len(data):
+            if data[position] == ']':
+                return
+            try:
+                item, end = decoder.raw_decode(data, position)
+            except json.JSONDecodeError:
+                end = len(data)
+            # an item is only complete once followed by a comma or the end
+            # of the list: '4.' may be the beginning of '4.5'
+            following = end
+            while following < len(data) and data[following] in WHITESPACE:
+                following += 1
+            if following < len(data) and data[following] in ',]':
+                yield item
+                position = end
+                continue
+        if eof:
+            raise ErrorParsingBambooData(
+                'The body is not a valid JSON list.')
+        chunk = body.read(chunk_size)
+        eof = not chunk
+        data = data[position:] + chunk
+        position = 0
+
+
+class SpilledRows(object):
+    """
+    The rows of a JSON response spilled to disk, decoded as they are
+    iterated over.  They can only be iterated over once, after which the
+    temporary file is removed: use as_list() to keep them.
+    """
+
+    def __init__(self, body):
+        self.body = body
+        self._iterated = False
+
+    def __iter__(self):
+        if self._iterated:
+            raise PyBambooException('Spilled rows can only be iterated '
+                                    'over once.')
+        self._iterated = True
+        return self._rows()
+
+    def _rows(self):
+        try:
+            for row in iter_json_list(self.body):
+                yield row
+        finally:
+            self.close()
+
+    def close(self):
+        self.body.close()
+
+
+def as_list(rows):
+    """
+    Returns *rows* as a list, reading them through if they are
+    SpilledRows; any other value is returned as is.
+    """
+    if isinstance(rows, SpilledRows):
+        return list(rows)
+    return rows
@@ -0,0 +1,169 @@
+"""
+Incremental synchronisation of a dataset with a local CSV file.
+
+Rows are matched on a key column and compared through a hash of their
+values, normalised with the dataset's schema so that the strings of the
+CSV file compare equal to the typed values bamboo returns.  Only the
+differences are sent: new rows through update_data() in batches, changed
+rows through update_row() and removed rows through delete_row().
+"""
+import csv
+import datetime
+import hashlib
+
+import simplejson as json
+
+from pybamboo.deadline import Deadline
+from pybamboo.exceptions import PyBambooException
+from pybamboo.parallel import DEFAULT_WORKERS, ordered_map
+from pybamboo.utils import decode_csv_rows, parse_datetime
+
+
+ADD = 'add'
+UPDATE = 'update'
+DELETE = 'delete'
+# how bamboo serves missing strings
+NULL = 'null'
+
+
+def canonical(value, simpletype=None, na_values=()):
+    """
+    Returns a string representation of *value* that is the same for a CSV
+    string and the value bamboo parsed from it, given the column's
+    *simpletype*; n/a values are None.
+    """
+    if value is None:
+        return None
+    if isinstance(value, basestring):
+        value = value.strip()
+        if not value or value == NULL or value in na_values:
+            return None
+        if simpletype in ('integer', 'float'):
+            try:
+                return repr(float(value))
+            except ValueError:
+                return value
+        if simpletype == 'datetime':
+            parsed = parse_datetime(value)
+            return parsed.isoformat() if parsed is not None else value
+        return value
+    if isinstance(value, datetime.datetime):
+        if value.tzinfo is not None:
+            value = (value - value.utcoffset()).replace(tzinfo=None)
+        return value.isoformat()
+    if isinstance(value, (int, long, float)):
+        if value != value:  # NaN
+            return None
+        return repr(float(value))
+    return unicode(value)
+
+
+def row_hash(row, columns, schema, na_values=()):
+    """
+    Returns the digest of the canonical values of *columns* in *row*.
+    """
+    values = [canonical(row.get(column),
+                        schema.get(column, {}).get('simpletype'), na_values)
+              for column in columns]
+    return hashlib.md5(json.dumps(values)).digest()
+
+
+def changes(remote_rows, local_rows, columns, key, schema, na_values=(),
+            batch_size=1000):
+    """
+    Yields the changes turning *remote_rows* (rows with their 'index')
+    into *local_rows*, comparing the *columns* of rows with the same *key*:
+        * (ADD, [row, ...]) - batches of at most *batch_size* new rows
+        * (UPDATE, (index, row)) - a changed row
+        * (DELETE, index) - a row missing from *local_rows*
+
+    *remote_rows* is consumed first; *local_rows* is streamed.
+    """
+    simpletype = schema.get(key, {}).get('simpletype')
+    remote = {}
+    for row in remote_rows:
+        row_key = canonical(row.get(key), simpletype, na_values)
+        if row_key in remote:
+            raise PyBambooException('Duplicate key in the dataset: %s.'
+                                    % row_key)
+        remote[row_key] = (row['index'],
+                           row_hash(row, columns, schema, na_values))
+    seen = set()
+    added = []
+    for row in local_rows:
+        row_key = canonical(row.get(key), simpletype, na_values)
+        if row_key is None:
+            raise PyBambooException('Row without a key: %s.' % row)
+        if row_key in seen:
+            raise PyBambooException('Duplicate key in the file: %s.'
+                                    % row_key)
+        seen.add(row_key)
+        if row_key not in remote:
+            added.append(row)
+            if len(added) >= batch_size:
+                yield ADD, added
+                added = []
+            continue
+        index, digest = remote[row_key]
+        if row_hash(row, columns, schema, na_values) != digest:
+            yield UPDATE, (index, row)
+    if added:
+        yield ADD, added
+    for row_key, (index, digest) in remote.iteritems():
+        if row_key not in seen:
+            yield DELETE, index
+
+
+def sync_rows(dataset, local_rows, columns, key, batch_size=1000,
+              workers=DEFAULT_WORKERS, dry_run=False, deadline=None):
+    """
+    Applies the changes turning *dataset* into *local_rows* (row dicts
+    with the given *columns*), sending up to *workers* requests at once.
+    Returns the number of rows {'added': n, 'updated': n, 'deleted': n}.
+    """
+    if key not in columns:
+        raise PyBambooException('The key %s is not a column.' % key)
+    deadline = Deadline.coerce(deadline)
+    schema = dataset.get_info(deadline=deadline)['schema']
+    remote_rows = (row for batch in dataset.iter_batches(
+        select=list(columns), batch_size=batch_size, workers=workers,
+        index=True, deadline=deadline) for row in batch)
+
+    def apply(change):
+        action, payload = change
+        if action == ADD:
+            if not dry_run and not dataset.update_data(payload,
+                                                       deadline=deadline):
+                raise PyBambooException('Could not add %d rows.'
+                                        % len(payload))
+            return action, len(payload)
+        if not dry_run:
+            if action == UPDATE:
+                response = dataset.update_row(payload[0], payload[1],
+                                              deadline=deadline)
+            else:
+                response = dataset.delete_row(payload, deadline=deadline)
+            if isinstance(response, dict) and 'error' in response:
+                raise PyBambooException(response['error'])
+        return action, 1
+
+    counts = {ADD: 0, UPDATE: 0, DELETE: 0}
+    for action, count in ordered_map(
+            apply, changes(remote_rows, local_rows, columns, key, schema,
+                           dataset.NA_VALUES, batch_size), workers):
+        counts[action] += count
+    return {'added': counts[ADD], 'updated': counts[UPDATE],
+            'deleted': counts[DELETE]}
+
+
+def sync_file(dataset, path, key, batch_size=1000, workers=DEFAULT_WORKERS,
+              dry_run=False, deadline=None):
+    """
+    Synchronises *dataset* with the CSV file *path*, see sync_rows().
+    """
+    with open(path, 'rb') as f:
+        reader = csv.DictReader(f)
+        columns = [column.decode('utf-8')
+                   for column in reader.fieldnames or []]
+        return sync_rows(dataset, decode_csv_rows(reader), columns, key,
+                         batch_size, workers, dry_run, deadline)
@@ -0,0 +1,67 @@
+import datetime
+import os
+import shutil
+import tempfile
+import unittest
+
+from bson.tz_util import utc
+
+from pybamboo import arrow
+from pybamboo.dataset import Dataset
+from pybamboo.tests.test_base import StubConnection, TestBase
+
+
+@unittest.skipIf(arrow.pyarrow is None, 'pyarrow is not installed')
+class TestArrow(TestBase):
+
+    SCHEMA = {
+        'amount': {'simpletype': 'float'},
+        'count': {'simpletype': 'integer'},
+        'food_type': {'simpletype': 'string'},
+        'submit_date': {'simpletype': 'datetime'},
+    }
+
+    def setUp(self):
+        TestBase.setUp(self)
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_arrow_schema(self):
+        schema = arrow.arrow_schema(self.SCHEMA, index=True)
+        self.assertEqual(schema.names,
+                         ['index', 'amount', 'count', 'food_type',
+                          'submit_date'])
+        self.assertEqual(str(schema.types[-1]), 'timestamp[ms, tz=UTC]')
+        schema = arrow.arrow_schema(self.SCHEMA, ['food_type'])
+        self.assertEqual(schema.names, ['food_type'])
+
+    def test_record_batch(self):
+        schema = arrow.arrow_schema(self.SCHEMA)
+        rows = [
+            {'amount': 1.5, 'count': 2.0, 'food_type': 'lunch',
+             'submit_date': datetime.datetime(2012, 1, 2, tzinfo=utc)},
+            {'amount': 'n/a', 'count': None, 'food_type': 3},
+        ]
+        batch = arrow.record_batch(rows, schema)
+        self.assertEqual(batch.num_rows, 2)
+        data = batch.to_pydict()
+        self.assertEqual(data['amount'], [1.5, None])
+        self.assertEqual(data['count'], [2, None])
+        self.assertEqual(data['food_type'], [u'lunch', u'3'])
+        self.assertEqual(data['submit_date'][0].year, 2012)
+        self.assertEqual(data['submit_date'][1], None)
+
+    def test_dataset_export(self):
+        stub = StubConnection()
+        dataset = Dataset('abc', connection=stub)
+        table = dataset.to_arrow(batch_size=3, index=True)
+        self.assertEqual(table.num_rows, 10)
+        self.assertEqual(table.column(0).to_pylist(), range(10))
+        path = os.path.join(self.directory, 'export.parquet')
+        self.assertEqual(dataset.export_parquet(path, batch_size=4), 10)
+        parquet = arrow.pyarrow.parquet.ParquetFile(path)
+        self.assertEqual(parquet.metadata.num_row_groups, 3)
+        self.assertEqual(parquet.read().column('amount').to_pylist(),
+                         [float(i) for i in range(10)])
@@ -1,14 +1,93 @@
+import atexit
 import os
+import threading
 import time
 import unittest
 
+import simplejson as json
+
+from pybamboo import connection
 from pybamboo.connection import Connection, DEFAULT_BAMBOO_URL
+from pybamboo.fake import FakeBambooServer
+
+
+# TEST_BAMBOO_URL=fake runs the tests against an in-process fake server
+FAKE_SERVER = None
+if os.environ.get('TEST_BAMBOO_URL') == 'fake':
+    FAKE_SERVER = FakeBambooServer().start()
+    atexit.register(FAKE_SERVER.stop)
+    DEFAULT_BAMBOO_URL = connection.DEFAULT_BAMBOO_URL = FAKE_SERVER.url
+    os.environ['TEST_BAMBOO_URL'] = FAKE_SERVER.url
+
+
+class RecordingConnection(Connection):
+    """
+    A Connection recording its requests in *requests* as (http_method,
+    url, arguments) and calling *on_request* (if set) with the method and
+    URL of each before it is sent.
+    """
+
+    def __init__(self, url, **kwargs):
+        Connection.__init__(self, url, **kwargs)
+        self.requests = []
+        self.on_request = None
+
+    def make_api_request(self, http_method, url, data=None, files=None,
+                         params=None, **kwargs):
+        arguments = dict(kwargs, data=data, files=files, params=params)
+        self.requests.append((http_method, url, arguments))
+        if self.on_request is not None:
+            self.on_request(http_method, url)
+        return Connection.make_api_request(
+            self, http_method, url, data=data, files=files, params=params,
+            **kwargs)
+
+
+class StubConnection(object):
+    """
+    Answers /info, distinct and index range queries for a dataset of 10
+    rows without a bamboo server.
+    """
+
+    ROWS = [{'index': i, 'amount': float(i),
+             'food_type': 'lunch' if i % 2 else 'dinner'}
+            for i in range(10)]
+
+    def __init__(self):
+        self.queries = []
+        self.lock = threading.Lock()
+
+    def make_api_request(self, http_method, url, data=None, files=None,
+                         params=None, **kwargs):
+        if url.endswith('/info'):
+            return {'num_rows': len(self.ROWS),
+                    'schema': {'amount': {'simpletype': 'float'}}}
+        params = params or {}
+        if 'distinct' in params:
+            return sorted(set(row[params['distinct']]
+                              for row in self.ROWS))
+        query = json.loads(params['query'])
+        with self.lock:
+            self.queries.append(query)
+        return [row for row in self.ROWS if self._match(row, query)]
+
+    def _match(self, row, query):
+        for key, value in query.items():
+            if isinstance(value, dict):
+                if row[key] < value.get('$gte', row[key]) or \
+                        row[key] >= value.get('$lt', row[key] + 1):
+                    return False
+            elif row[key] != value:
+                return False
+        return True
 
 
 class TestBase(unittest.TestCase):
 
     class MockResponse(object):
-        pass
+
+        def close(self):
+            pass
 
     CSV_FILE = os.getcwd() + '/tests/fixtures/good_eats.csv'
     JSON_FILE = os.getcwd() + '/tests/fixtures/good_eats.json'
@@ -34,7 +113,7 @@ class TestBase(unittest.TestCase):
     def setUp(self):
         self.bamboo_url = self.TEST_BAMBOO_URL
         self.connection = Connection(self.bamboo_url)
-        self.default_connection = Connection(DEFAULT_BAMBOO_URL)
+        self.default_connection = Connection(self.DEFAULT_BAMBOO_URL)
 
         # these two datasets (if created) will automatically
         # get deleted by the test harness
@@ -50,6 +129,21 @@ class TestBase(unittest.TestCase):
     def tearDown(self):
         self._delete_datasets()
 
+    def start_fake_server(self):
+        """
+        Starts a FakeBambooServer, stopped once this test is done.
+        """
+        server = FakeBambooServer().start()
+        self.addCleanup(server.stop)
+        return server
+
+    def fake_connection(self, **kwargs):
+        """
+        Returns a RecordingConnection to a FakeBambooServer of its own,
+        stopped once this test is done.
+        """
+        return RecordingConnection(self.start_fake_server().url, **kwargs)
+
     def _cleanup(self, dataset):
         self.wait(3)  # give some time
         self.datasets_to_delete.append(dataset)
@@ -77,4 +171,5 @@ class TestBase(unittest.TestCase):
             self.assertTrue(k in d_keys)
 
     def wait(self, seconds=5):
-        time.sleep(seconds)
+        if FAKE_SERVER is None:  # the fake server never lags
+            time.sleep(seconds)
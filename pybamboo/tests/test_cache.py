@@ -0,0 +1,152 @@
+import datetime
+import os
+import shutil
+import tempfile
+
+from bson.tz_util import utc
+
+from pybamboo.cache import DatasetCache, signature
+from pybamboo.columnar import ColumnarTable, open_table
+from pybamboo.exceptions import PyBambooException
+from pybamboo.tests.test_base import TestBase
+
+
+class TestCache(TestBase):
+
+    SCHEMA = {
+        'amount': {'simpletype': 'float'},
+        'rating': {'simpletype': 'string'},
+        'submit_date': {'simpletype': 'datetime'},
+    }
+    ROWS = [
+        {'amount': 2.5, 'rating': u'delectible',
+         'submit_date': datetime.datetime(2012, 1, 2, tzinfo=utc)},
+        {'amount': None, 'rating': None, 'submit_date': None},
+        {'amount': 3, 'rating': u'g\xe9nial',
+         'submit_date': datetime.datetime(2012, 1, 3, 12, tzinfo=utc)},
+    ]
+
+    class FakeDataset(object):
+
+        def __init__(self, id, info, rows):
+            self.id = id
+            self.info = info
+            self.rows = rows
+            self.downloads = 0
+
+        def get_info(self, deadline=None):
+            return self.info
+
+        def get_data(self, deadline=None):
+            self.downloads += 1
+            return self.rows
+
+    def setUp(self):
+        TestBase.setUp(self)
+        self.directory = tempfile.mkdtemp()
+        self.info = {'num_rows': 3, 'updated_at': '2012-01-04',
+                     'schema': self.SCHEMA}
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_columnar_roundtrip(self):
+        table = ColumnarTable.from_rows(self.ROWS, self.SCHEMA)
+        path = os.path.join(self.directory, 'table.col')
+        table.write(path)
+        mapped = open_table(path)
+        self.addCleanup(mapped.close)
+        self.assertEqual(mapped.num_rows, 3)
+        self.assertEqual(sorted(mapped.columns), sorted(self.SCHEMA.keys()))
+        self.assertEqual(list(mapped.rows()), self.ROWS)
+        self.assertEqual(list(mapped.rows()), list(table.rows()))
+        self.assertEqual(list(mapped.array('amount'))[0], 2.5)
+        with self.assertRaises(PyBambooException):
+            mapped.array('rating')
+
+    def test_columnar_infers_untyped(self):
+        table = ColumnarTable.from_rows([{'index': 0, 'x': 'a'},
+                                         {'index': 1, 'x': 2}])
+        self.assertEqual(table.types, {'index': 'number', 'x': 'string'})
+        self.assertEqual(table.column('x'), [u'a', u'2'])
+
+    def test_columnar_large_integers(self):
+        rows = [{'count': 2 ** 53 + 1}, {'count': None},
+                {'count': -2 ** 63}]
+        schema = {'count': {'simpletype': 'integer'}}
+        table = ColumnarTable.from_rows(rows, schema)
+        self.assertEqual(list(table.rows()), rows)
+        path = os.path.join(self.directory, 'table.col')
+        table.write(path)
+        with open_table(path) as mapped:
+            self.assertEqual(list(mapped.rows()), rows)
+            doubles = list(mapped.array('count'))
+            self.assertEqual(doubles[0], 2.0 ** 53)
+            self.assertTrue(doubles[1] != doubles[1])  # NaN
+
+    def test_columnar_array_after_close(self):
+        table = ColumnarTable.from_rows(self.ROWS, self.SCHEMA)
+        path = os.path.join(self.directory, 'table.col')
+        table.write(path)
+        with open_table(path) as mapped:
+            amounts = mapped.array('amount')
+        self.assertEqual(list(amounts)[0], 2.5)
+        self.assertEqual(list(amounts)[2], 3)
+
+    def test_not_columnar(self):
+        path = os.path.join(self.directory, 'bad.col')
+        open(path, 'w').write('not a columnar file')
+        with self.assertRaises(PyBambooException):
+            open_table(path)
+
+    def test_fetch(self):
+        cache = DatasetCache(self.directory)
+        dataset = self.FakeDataset('abc', self.info, self.ROWS)
+        with cache.fetch(dataset) as table:
+            self.assertEqual(list(table.rows()), self.ROWS)
+        with cache.fetch(dataset) as table:
+            self.assertEqual(table.column('amount'), [2.5, None, 3.0])
+        self.assertEqual(dataset.downloads, 1)
+        dataset.info = dict(self.info, num_rows=4)
+        cache.fetch(dataset).close()
+        self.assertEqual(dataset.downloads, 2)
+
+    def test_corrupt_entry(self):
+        cache = DatasetCache(self.directory)
+        dataset = self.FakeDataset('abc', self.info, self.ROWS)
+        cache.fetch(dataset).close()
+        path = cache.path('abc')
+        size = os.path.getsize(path)
+        for length in [size - 8, 20, 10]:
+            with open(path, 'r+b') as f:
+                f.truncate(length)
+            self.assertEqual(cache.get('abc', self.info), None)
+            self.assertFalse(os.path.exists(path))
+            with cache.fetch(dataset) as table:
+                self.assertEqual(list(table.rows()), self.ROWS)
+        self.assertEqual(dataset.downloads, 4)
+
+    def test_signature(self):
+        other = dict(self.info, schema={'amount': {'simpletype': 'float'}})
+        self.assertNotEqual(signature(self.info), signature(other))
+        self.assertEqual(signature(self.info), signature(dict(self.info)))
+
+    def test_invalid_key(self):
+        cache = DatasetCache(self.directory)
+        with self.assertRaises(PyBambooException):
+            cache.path('../etc')
+
+    def test_evict_lru(self):
+        cache = DatasetCache(self.directory)
+        for key in ['a', 'b', 'c']:
+            cache.put(key, self.info, self.ROWS).close()
+        size = os.path.getsize(cache.path('a'))
+        os.utime(cache.path('a'), (1, 1))
+        os.utime(cache.path('b'), (2, 2))
+        # a becomes the most recently used
+        cache.get('a', self.info).close()
+        cache.max_bytes = 2 * size
+        cache.evict()
+        self.assertTrue(os.path.exists(cache.path('a')))
+        self.assertFalse(os.path.exists(cache.path('b')))
+        self.assertTrue(os.path.exists(cache.path('c')))
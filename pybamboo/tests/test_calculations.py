@@ -0,0 +1,101 @@
+from pybamboo import calculations
+from pybamboo.dataset import Dataset
+from pybamboo.exceptions import PyBambooException
+from pybamboo.tests.test_base import TestBase
+
+
+class TestCalculations(TestBase):
+
+    CALCULATIONS = [
+        {'name': 'double_amount', 'formula': 'amount * 2'},
+        {'name': 'quadruple_amount', 'formula': 'double_amount * 2'},
+        {'name': 'sum_amount', 'formula': 'sum(amount)'},
+        {'name': 'sum_amount', 'formula': 'sum(amount)',
+         'group': ['food_type']},
+    ]
+
+    def setUp(self):
+        TestBase.setUp(self)
+        self.fake = self.fake_connection()
+        self.stub_dataset = Dataset(path=self.CSV_FILE, connection=self.fake)
+
+    def _keys(self):
+        return sorted(calculations.calculation_key(calculation) for
+                      calculation in self.stub_dataset.get_calculations())
+
+    def test_calculation_key(self):
+        self.assertEqual(
+            calculations.calculation_key({'name': 'a', 'formula': ' b ',
+                                          'group': 'c,d'}),
+            ('a', 'b', ('c', 'd')))
+        self.assertEqual(
+            calculations.calculation_key({'name': 'a', 'formula': 'b',
+                                          'group': None}),
+            ('a', 'b', ()))
+        self.assertRaises(PyBambooException, calculations.calculation_key,
+                          {'name': 'a', 'formula': 3})
+
+    def test_diff(self):
+        current = [{'name': 'a', 'formula': 'x', 'group': None},
+                   {'name': 'b', 'formula': 'sum(x)', 'group': None},
+                   {'name': 'b', 'formula': 'sum(x)', 'group': 'y'},
+                   {'name': 'c', 'formula': 'x'}]
+        desired = [{'name': 'a', 'formula': 'x'},
+                   {'name': 'b', 'formula': 'sum(x)', 'group': ['y']},
+                   {'name': 'c', 'formula': 'x * 2'},
+                   {'name': 'd', 'formula': 'x'}]
+        removed, added = calculations.diff(current, desired)
+        self.assertEqual(removed, ['b', 'c'])
+        self.assertEqual([key[0] for key in added], ['b', 'c', 'd'])
+        self.assertRaises(PyBambooException, calculations.diff, [],
+                          [desired[0], desired[0]])
+
+    def test_waves(self):
+        added = [('c', 'b + 1', ()), ('b', 'a * 2', ()), ('a', 'x', ()),
+                 ('d', 'x.a', ())]
+        self.assertEqual(calculations.waves(added),
+                         [[('a', 'x', ()), ('d', 'x.a', ())],
+                          [('b', 'a * 2', ())], [('c', 'b + 1', ())]])
+        self.assertEqual(calculations.waves([]), [])
+
+    def test_sync_calculations(self):
+        result = self.stub_dataset.sync_calculations(self.CALCULATIONS)
+        self.assertEqual(sorted(result['added']),
+                         ['double_amount', 'quadruple_amount', 'sum_amount',
+                          'sum_amount'])
+        self.assertEqual(result['removed'], [])
+        self.assertEqual(len(self._keys()), 4)
+        self.assertTrue('quadruple_amount' in
+                        self.stub_dataset.get_data(limit=1)[0])
+
+        del self.fake.requests[:]
+        result = self.stub_dataset.sync_calculations(self.CALCULATIONS)
+        self.assertEqual(result, {'added': [], 'removed': []})
+        self.assertEqual([method for method, url, arguments
+                          in self.fake.requests], ['GET'])
+
+        desired = self.CALCULATIONS[:2] + [
+            {'name': 'sum_amount', 'formula': 'sum(amount)',
+             'group': ['rating']}]
+        del self.fake.requests[:]
+        result = self.stub_dataset.sync_calculations(desired)
+        self.assertEqual(result, {'added': ['sum_amount'],
+                                  'removed': ['sum_amount']})
+        self.assertEqual(self._keys(), sorted(
+            calculations.calculation_key(calculation)
+            for calculation in desired))
+        self.assertFalse(any('double_amount' in url
+                             for method, url, arguments
+                             in self.fake.requests))
+
+    def test_sync_calculations_dry_run(self):
+        result = self.stub_dataset.sync_calculations(self.CALCULATIONS[:1],
+                                                     dry_run=True)
+        self.assertEqual(result, {'added': ['double_amount'],
+                                  'removed': []})
+        self.assertEqual(self.stub_dataset.get_calculations(), [])
+
+    def test_sync_calculations_error(self):
+        with self.assertRaises(PyBambooException):
+            self.stub_dataset.sync_calculations(
+                [{'name': 'bad', 'formula': 'missing * 2'}])
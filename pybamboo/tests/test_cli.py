@@ -0,0 +1,90 @@
+import StringIO
+import csv
+import os
+import shutil
+import tempfile
+
+import simplejson as json
+
+from pybamboo import cli
+from pybamboo.tests import test_base
+from pybamboo.tests.test_base import TestBase
+
+
+class TestCli(TestBase):
+
+    class StubConnection(test_base.StubConnection):
+        """
+        Also records appended rows and answers merges.
+        """
+
+        def __init__(self):
+            test_base.StubConnection.__init__(self)
+            self.appended = []
+
+        def make_api_request(self, http_method, url, data=None, files=None,
+                             params=None, **kwargs):
+            if http_method == 'PUT':
+                with self.lock:
+                    self.appended.extend(json.loads(data['update']))
+                return {'id': 'abc'}
+            if url == '/datasets/merge':
+                return {'id': 'merged'}
+            return test_base.StubConnection.make_api_request(
+                self, http_method, url, data, files, params, **kwargs)
+
+    def setUp(self):
+        TestBase.setUp(self)
+        self.stub = self.StubConnection()
+        self.stdout = StringIO.StringIO()
+        self.stderr = StringIO.StringIO()
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def _main(self, *argv):
+        return cli.main(list(argv), connection=self.stub,
+                        stdout=self.stdout, stderr=self.stderr)
+
+    def test_batches(self):
+        self.assertEqual(list(cli.batches(range(5), 2)),
+                         [[0, 1], [2, 3], [4]])
+
+    def test_import_append(self):
+        self.assertEqual(self._main('import', '--dataset', 'abc',
+                                    '--batch-size', '5', self.CSV_FILE,
+                                    self.CSV_FILE), 0)
+        self.assertEqual(len(self.stub.appended), 2 * self.NUM_ROWS)
+        self.assertEqual(self.stub.appended[0]['food_type'],
+                         'lunch')
+        self.assertEqual(self.stdout.getvalue(), 'abc\n')
+        self.assertTrue('38 rows, 8 items' in self.stderr.getvalue())
+
+    def test_import_unknown_format(self):
+        path = os.path.join(self.directory, 'rows.txt')
+        open(path, 'w').write('a,b\n')
+        self.assertEqual(self._main('import', '--dataset', 'abc', path), 1)
+        self.assertTrue('--format' in self.stderr.getvalue())
+
+    def test_export_csv(self):
+        path = os.path.join(self.directory, 'export.csv')
+        self.assertEqual(self._main('export', 'abc', '--batch-size', '3',
+                                    '--select', 'index,amount', '-o', path),
+                         0)
+        rows = list(csv.reader(open(path)))
+        self.assertEqual(rows[0], ['index', 'amount'])
+        self.assertEqual(rows[1:3], [['0', '0.0'], ['1', '1.0']])
+        self.assertEqual(len(rows), 11)
+
+    def test_export_json(self):
+        self.assertEqual(self._main('--quiet', 'export', 'abc', '--format',
+                                    'json', '--query',
+                                    '{"food_type": "lunch"}'), 0)
+        rows = json.loads(self.stdout.getvalue())
+        self.assertEqual([row['index'] for row in rows], [1, 3, 5, 7, 9])
+        self.assertEqual(self.stderr.getvalue(), '')
+
+    def test_merge(self):
+        self.assertEqual(self._main('merge', 'abc', 'def'), 0)
+        self.assertEqual(self.stdout.getvalue(), 'merged\n')
@@ -0,0 +1,109 @@
+import datetime
+import unittest
+
+from bson.tz_util import utc
+
+from pybamboo import compute
+from pybamboo.columnar import ColumnarTable
+from pybamboo.dataset import Dataset
+from pybamboo.exceptions import PyBambooException
+from pybamboo.tests.test_base import TestBase
+
+
+@unittest.skipIf(compute.numpy is None, 'numpy is not installed')
+class TestCompute(TestBase):
+
+    SCHEMA = {
+        'submit_date': {'simpletype': 'datetime'},
+        'amount': {'simpletype': 'float'},
+        'rating': {'simpletype': 'string'},
+    }
+
+    def setUp(self):
+        TestBase.setUp(self)
+        rows = []
+        for day, amount in [(2, 1.0), (2, 3.0), (3, None), (5, 4.0),
+                            (9, 10.0)]:
+            rows.append({
+                'submit_date': datetime.datetime(2012, 1, day, 6,
+                                                 tzinfo=utc),
+                'amount': amount,
+                'rating': 'delectible',
+            })
+        self.table = ColumnarTable.from_rows(rows, self.SCHEMA)
+
+    def _date(self, day, month=1):
+        return datetime.datetime(2012, month, day, tzinfo=utc)
+
+    def test_resample_daily(self):
+        rows = compute.resample(self.table, 'submit_date', 'D', 'mean')
+        self.assertEqual(len(rows), 8)
+        self.assertEqual(rows[0], {'submit_date': self._date(2),
+                                   'amount': 2.0})
+        self.assertEqual(rows[1]['amount'], None)
+        self.assertEqual(rows[-1], {'submit_date': self._date(9),
+                                    'amount': 10.0})
+        counts = compute.resample(self.table, 'submit_date', 'D', 'count')
+        self.assertEqual([row['amount'] for row in counts],
+                         [2, 0, 0, 1, 0, 0, 0, 1])
+
+    def test_resample_weekly_monthly(self):
+        rows = compute.resample(self.table, 'submit_date', 'W', 'sum')
+        self.assertEqual(rows, [
+            {'submit_date': self._date(8), 'amount': 8.0},
+            {'submit_date': self._date(15), 'amount': 10.0},
+        ])
+        rows = compute.resample(self.table, 'submit_date', 'M', 'max')
+        self.assertEqual(rows, [{'submit_date': self._date(31),
+                                 'amount': 10.0}])
+
+    def test_resample_first_last(self):
+        rows = []
+        for day, hour, amount in [(2, 18, 2.0), (2, 6, 1.0), (3, 12, 5.0),
+                                  (2, 12, 3.0)]:
+            rows.append({
+                'submit_date': datetime.datetime(2012, 1, day, hour,
+                                                 tzinfo=utc),
+                'amount': amount,
+            })
+        table = ColumnarTable.from_rows(rows, self.SCHEMA)
+        firsts = compute.resample(table, 'submit_date', 'D', 'first')
+        self.assertEqual([row['amount'] for row in firsts], [1.0, 5.0])
+        lasts = compute.resample(table, 'submit_date', 'D', 'last')
+        self.assertEqual([row['amount'] for row in lasts], [2.0, 5.0])
+
+    def test_resample_invalid(self):
+        with self.assertRaises(PyBambooException):
+            compute.resample(self.table, 'rating', 'D')
+        with self.assertRaises(PyBambooException):
+            compute.resample(self.table, 'submit_date', '2W')
+        with self.assertRaises(PyBambooException):
+            compute.resample(self.table, 'submit_date', 'D', 'ohlc')
+
+    def test_window_weights(self):
+        self.assertEqual(list(compute.window_weights('boxcar', 3)),
+                         [1.0, 1.0, 1.0])
+        self.assertEqual(list(compute.window_weights('triang', 3)),
+                         [0.25, 0.75, 0.75])
+        with self.assertRaises(PyBambooException):
+            compute.window_weights('BAD', 3)
+
+    def test_rolling(self):
+        rows = compute.rolling(self.table, 2)
+        self.assertEqual([row['amount'] for row in rows],
+                         [None, 2.0, None, None, 7.0])
+        self.assertTrue('rating' not in rows[0])
+        rows = compute.rolling(self.table, 2, 'triang')
+        self.assertAlmostEqual(rows[1]['amount'], 3.5 / 1.5)
+
+    def test_dataset_local(self):
+        dataset = Dataset('abc', connection=self.connection)
+        rows = dataset.rolling(window=2, table=self.table)
+        self.assertEqual(rows[1]['amount'], 2.0)
+        rows = dataset.resample(date_column='submit_date', interval='D',
+                                how='sum', table=self.table)
+        self.assertEqual(rows[0]['amount'], 4.0)
+        with self.assertRaises(PyBambooException):
+            dataset.resample(date_column='submit_date', interval='D',
+                             query={'rating': 'delectible'},
+                             table=self.table)
@@ -0,0 +1,36 @@
+from pybamboo.connection import Connection
+from pybamboo.deadline import Deadline
+from pybamboo.exceptions import DeadlineExceeded
+from pybamboo.tests.test_base import TestBase
+
+
+class TestDeadline(TestBase):
+
+    def test_coerce(self):
+        self.assertTrue(Deadline.coerce(None) is None)
+        deadline = Deadline(10)
+        self.assertTrue(Deadline.coerce(deadline) is deadline)
+        self.assertTrue(isinstance(Deadline.coerce(1.5), Deadline))
+
+    def test_cap(self):
+        now = [0.0]
+        deadline = Deadline(2, clock=lambda: now[0])
+        self.assertEqual(deadline.cap((5, 60)), (2, 2))
+        self.assertEqual(deadline.cap((1, None)), (1, 2))
+        now[0] = 1.5
+        self.assertEqual(deadline.cap(1), 0.5)
+
+    def test_expired(self):
+        now = [0.0]
+        deadline = Deadline(1, clock=lambda: now[0])
+        deadline.check()
+        now[0] = 1.0
+        self.assertTrue(deadline.expired)
+        with self.assertRaises(DeadlineExceeded):
+            deadline.check()
+
+    def test_connection_expired_deadline(self):
+        connection = Connection(self.bamboo_url)
+        self.assertEqual(connection.timeout, (5, 60))
+        with self.assertRaises(DeadlineExceeded):
+            connection.make_api_request('GET', '/version', deadline=0)
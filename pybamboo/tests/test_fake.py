@@ -0,0 +1,118 @@
+import os
+import shutil
+import tempfile
+
+import simplejson as json
+
+from pybamboo.dataset import Dataset
+from pybamboo.exceptions import PyBambooException
+from pybamboo.fake import FakeBamboo, Formula, FakeError,\
+    describe, infer_simpletype, matches
+from pybamboo.tests.test_base import TestBase
+
+
+class TestFake(TestBase):
+
+    def setUp(self):
+        TestBase.setUp(self)
+        self.fake = self.fake_connection()
+        self.tmpdir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        TestBase.tearDown(self)
+        shutil.rmtree(self.tmpdir)
+
+    def _handle(self, bamboo, method, path, params=None, form=None,
+                files=None):
+        status, content_type, body = bamboo.handle(method, path, params,
+                                                   form, files)
+        return status, json.loads(body)
+
+    def test_infer_simpletype(self):
+        self.assertEqual(infer_simpletype(['1', '2.5', None]), 'float')
+        self.assertEqual(infer_simpletype(['2011-12-30']), 'datetime')
+        self.assertEqual(infer_simpletype(['1', 'lunch']), 'string')
+        self.assertEqual(infer_simpletype([True, False]), 'boolean')
+
+    def test_describe(self):
+        summary = describe([1.0, 2.0, 3.0, None])
+        self.assertEqual(summary['count'], 3)
+        self.assertEqual(summary['mean'], 2.0)
+        self.assertEqual(summary['50%'], 2.0)
+        self.assertEqual(summary['std'], 1.0)
+
+    def test_matches(self):
+        row = {'amount': 5.0, 'food_type': 'lunch'}
+        self.assertTrue(matches(row, {'food_type': 'lunch'}))
+        self.assertTrue(matches(row, {'amount': {'$gt': 4, '$lte': 5}}))
+        self.assertTrue(matches(row, {'$or': [{'amount': 1},
+                                              {'food_type': 'lunch'}]}))
+        self.assertFalse(matches(row, {'amount': {'$in': [1, 2]}}))
+        self.assertFalse(matches(row, {'rating': {'$gt': 1}}))
+        self.assertRaises(FakeError, matches, row, {'amount': {'$foo': 1}})
+
+    def test_formula(self):
+        formula = Formula('amount * 2 + 1', ['amount'])
+        self.assertEqual(formula.evaluate({'amount': 2.0}), 5.0)
+        self.assertEqual(formula.evaluate({'amount': None}), None)
+        total = Formula('sum(amount)', ['amount'])
+        self.assertEqual(total.aggregation, 'sum')
+        self.assertEqual(total.aggregate([{'amount': 1.0}, {'amount': 2.0},
+                                          {'amount': None}]), 3.0)
+        self.assertRaises(FakeError, Formula, 'rating + 1', ['amount'])
+        self.assertRaises(FakeError, Formula, '__import__("os")', [])
+        self.assertRaises(FakeError, Formula, 'amount +', ['amount'])
+
+    def test_calculation_state(self):
+        bamboo = FakeBamboo()
+        status, result = self._handle(
+            bamboo, 'POST', '/datasets',
+            files={'json_file': json.dumps([{'amount': 1}, {'amount': 2}])})
+        path = '/datasets/%s/calculations' % result['id']
+        self._handle(bamboo, 'POST', path,
+                     form={'name': 'double', 'formula': 'amount * 2'})
+        status, calculations = self._handle(bamboo, 'GET', path)
+        self.assertEqual(calculations[0]['state'], 'pending')
+        status, calculations = self._handle(bamboo, 'GET', path)
+        self.assertEqual(calculations[0]['state'], 'ready')
+        status, rows = self._handle(bamboo, 'GET',
+                                    '/datasets/%s' % result['id'])
+        self.assertEqual([row['double'] for row in rows], [2.0, 4.0])
+
+    def test_errors(self):
+        bamboo = FakeBamboo()
+        status, result = self._handle(bamboo, 'GET', '/datasets/nope')
+        self.assertEqual(status, 400)
+        self.assertTrue('error' in result)
+        status, result = self._handle(bamboo, 'GET', '/unknown')
+        self.assertEqual(status, 404)
+
+    def test_dataset(self):
+        dataset = Dataset(path=self.CSV_FILE, connection=self.fake)
+        self.assertEqual(dataset.get_info()['num_rows'], self.NUM_ROWS)
+        self.assertEqual(dataset.get_info()['num_columns'], self.NUM_COLS)
+        rows = dataset.get_data(query={'food_type': 'lunch'},
+                                select=['amount'])
+        self.assertTrue(rows)
+        self.assertEqual(rows[0].keys(), ['amount'])
+        self.assertEqual(dataset.get_data(count=True), self.NUM_ROWS)
+        self.assertTrue(dataset.add_calculation('total', 'sum(amount)'))
+        aggregations = dataset.get_aggregate_datasets()
+        self.assertEqual(aggregations.keys(), [''])
+        total = aggregations[''].get_data()[0]['total']
+        self.assertEqual(total, sum(row['amount']
+                                    for row in dataset.get_data()))
+        self.assertTrue(dataset.delete())
+        with self.assertRaises(PyBambooException):
+            Dataset(dataset_id=dataset.id, connection=self.fake)
+
+    def test_sync(self):
+        path = os.path.join(self.tmpdir, 'sync.csv')
+        with open(path, 'w') as f:
+            f.write('id,amount,comment\n1,2.5,\n2,3,good\n')
+        dataset = Dataset(path=path, connection=self.fake)
+        with open(path, 'a') as f:
+            f.write('3,4,\n')
+        self.assertEqual(dataset.sync(path, 'id'),
+                         {'added': 1, 'updated': 0, 'deleted': 0})
+        self.assertEqual(dataset.get_info()['num_rows'], 3)
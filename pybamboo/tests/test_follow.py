@@ -0,0 +1,75 @@
+import itertools
+
+from pybamboo.dataset import Dataset
+from pybamboo.deadline import Deadline
+from pybamboo.tests.test_base import TestBase
+
+
+class TestFollow(TestBase):
+
+    def setUp(self):
+        TestBase.setUp(self)
+        self.stub_dataset = Dataset(content='amount,kind\n1,a\n2,b\n',
+                                    connection=self.fake_connection())
+        self.delays = []
+        # rows appended before each sleep, None to append nothing
+        self.arrivals = []
+
+    def sleep(self, delay):
+        self.delays.append(delay)
+        arrival = self.arrivals.pop(0) if self.arrivals else None
+        if arrival:
+            self.stub_dataset.update_data(arrival)
+
+    def test_follow_new_rows(self):
+        self.arrivals = [None, None, [{'amount': 3, 'kind': 'a'}],
+                         [{'amount': 4, 'kind': 'b'},
+                          {'amount': 5, 'kind': 'a'}]]
+        rows = list(itertools.islice(
+            self.stub_dataset.follow(min_interval=1, max_interval=3,
+                                     sleep=self.sleep), 3))
+        self.assertEqual([row['amount'] for row in rows], [3, 4, 5])
+        self.assertFalse('index' in rows[0])
+        self.assertEqual(self.delays, [1, 2, 3, 1])
+
+    def test_follow_after_deletions(self):
+        self.stub_dataset.update_data([{'amount': 3, 'kind': 'a'},
+                                       {'amount': 4, 'kind': 'b'}])
+        self.stub_dataset.delete_rows([0, 1])
+        self.arrivals = [[{'amount': 5, 'kind': 'a'}]]
+        rows = list(itertools.islice(
+            self.stub_dataset.follow(index=True, sleep=self.sleep), 1))
+        self.assertEqual(rows, [{'amount': 5, 'kind': 'a', 'index': 4}])
+
+    def test_follow_batches(self):
+        self.arrivals = [[{'amount': i, 'kind': 'a'} for i in range(5)]]
+        follow = self.stub_dataset.follow(start=0, batch_size=2,
+                                          batches=True, index=True,
+                                          sleep=self.sleep)
+        batches = list(itertools.islice(follow, 4))
+        self.assertEqual([len(batch) for batch in batches], [2, 2, 2, 1])
+        self.assertEqual([row['index'] for batch in batches
+                          for row in batch], range(7))
+        # full batches are followed by another poll without sleeping
+        self.assertEqual(self.delays, [1])
+
+    def test_follow_query(self):
+        self.arrivals = [[{'amount': 3, 'kind': 'a'},
+                          {'amount': 4, 'kind': 'b'}],
+                         [{'amount': 5, 'kind': 'b'}]]
+        rows = itertools.islice(self.stub_dataset.follow(
+            query={'kind': 'b'}, sleep=self.sleep), 2)
+        self.assertEqual([row['amount'] for row in rows], [4, 5])
+
+    def test_follow_deadline(self):
+        clock = [0.0]
+
+        def sleep(delay):
+            self.delays.append(delay)
+            clock[0] += delay
+        deadline = Deadline(10, clock=lambda: clock[0])
+        rows = list(self.stub_dataset.follow(max_interval=4,
+                                             deadline=deadline,
+                                             sleep=sleep))
+        self.assertEqual(rows, [])
+        self.assertEqual(self.delays, [1, 2, 4, 3])
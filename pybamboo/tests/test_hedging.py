@@ -0,0 +1,159 @@
+import time
+
+from pybamboo.connection import Connection
+from pybamboo.dataset import Dataset
+from pybamboo.hedging import HedgeBudget, HedgePolicy, LatencyTracker
+from pybamboo.tests.test_base import TestBase
+from pybamboo.throttle import Throttle
+
+
+class TestHedging(TestBase):
+
+    class Closeable(object):
+
+        closed = False
+
+        def close(self):
+            self.closed = True
+
+    class Response(Closeable):
+
+        def __init__(self, value):
+            self.value = value
+            # the urllib3 response and its connection
+            self.raw = TestHedging.Closeable()
+            self.raw._connection = TestHedging.Closeable()
+
+    class RecordingThrottle(Throttle):
+
+        def __init__(self):
+            Throttle.__init__(self)
+            self.acquired = 0
+            self.released = 0
+
+        def acquire(self, deadline=None):
+            self.acquired += 1
+
+        def release(self, latency, success=True):
+            self.released += 1
+
+    def _warm_policy(self, latency=0.01, **kwargs):
+        policy = HedgePolicy(min_samples=5, **kwargs)
+        for i in range(5):
+            policy.tracker.record(latency)
+        return policy
+
+    def test_latency_tracker(self):
+        tracker = LatencyTracker(window=4)
+        self.assertTrue(tracker.percentile(50) is None)
+        for latency in [5, 1, 2, 3, 4]:
+            tracker.record(latency)
+        self.assertEqual(len(tracker), 4)
+        self.assertEqual(tracker.percentile(0), 1)
+        self.assertEqual(tracker.percentile(100), 4)
+
+    def test_budget(self):
+        budget = HedgeBudget(ratio=0.5, burst=1)
+        self.assertFalse(budget.withdraw())
+        for i in range(4):
+            budget.deposit()
+        self.assertTrue(budget.withdraw())
+        self.assertFalse(budget.withdraw())
+
+    def test_no_hedge_without_samples(self):
+        policy = HedgePolicy()
+        self.assertTrue(policy.delay() is None)
+        self.assertEqual(policy.execute(lambda session: 'ok', None), 'ok')
+        self.assertEqual(policy.hedges_sent, 0)
+
+    def test_hedge_wins(self):
+        policy = self._warm_policy(budget=HedgeBudget(ratio=1))
+        responses = []
+
+        def send(session):
+            responses.append(self.Response('slow' if not responses
+                                           else 'fast'))
+            response = responses[-1]
+            if response.value == 'slow':
+                time.sleep(0.5)
+            return response
+
+        self.assertEqual(policy.execute(send, None).value, 'fast')
+        self.assertEqual(policy.hedges_sent, 1)
+        time.sleep(0.6)
+        # the slow response arrived after it lost, and was closed along
+        # with its connection
+        self.assertTrue(responses[0].closed)
+        self.assertTrue(responses[0].raw._connection.closed)
+        self.assertFalse(responses[1].closed)
+        self.assertFalse(responses[1].raw._connection.closed)
+
+    def test_budget_exhausted(self):
+        policy = self._warm_policy(budget=HedgeBudget(ratio=0))
+
+        def send(session):
+            time.sleep(0.05)
+            return 'slow'
+
+        self.assertEqual(policy.execute(send, None), 'slow')
+        self.assertEqual(policy.hedges_sent, 0)
+
+    def test_error_waits_for_hedge(self):
+        policy = self._warm_policy(budget=HedgeBudget(ratio=1))
+        calls = []
+
+        def send(session):
+            calls.append(1)
+            if len(calls) == 1:
+                time.sleep(0.1)
+                raise IOError('reset')
+            return 'ok'
+
+        self.assertEqual(policy.execute(send, None), 'ok')
+
+    def test_connection_hedging(self):
+        policy = HedgePolicy()
+        connection = Connection(self.bamboo_url, hedging=policy)
+        self.assertTrue(connection.hedging is policy)
+
+    def test_connection_hedge(self):
+        server = self.start_fake_server()
+        dataset = Dataset(content='amount\n1\n',
+                          connection=Connection(server.url))
+        handle = server.bamboo.handle
+        calls = []
+
+        def slow_first_show(method, path, *args):
+            if method == 'GET' and path.endswith(dataset.id):
+                calls.append(path)
+                if len(calls) == 1:
+                    time.sleep(0.5)
+            return handle(method, path, *args)
+        server.bamboo.handle = slow_first_show
+
+        policy = self._warm_policy(latency=0.1,
+                                   budget=HedgeBudget(ratio=1))
+        throttle = self.RecordingThrottle()
+        connection = Connection(server.url, hedging=policy,
+                                limits={'read': throttle})
+        get = connection.session.get
+        streams = []
+
+        def recording_get(*args, **kwargs):
+            streams.append(kwargs['stream'])
+            return get(*args, **kwargs)
+        connection.session.get = recording_get
+        hedged = Dataset(dataset.id, connection=connection)
+        start = time.time()
+        self.assertEqual(hedged.get_data(), [{'amount': 1}])
+        elapsed = time.time() - start
+        self.assertEqual(policy.hedges_sent, 1)
+        self.assertEqual(len(calls), 2)
+        # only the body of the winning attempt is read
+        self.assertEqual(streams, [True, True])
+        # the hedge was throttled like the first request
+        self.assertEqual(throttle.acquired, 2)
+        # the latency is that of the request, hedging delay included
+        latency = policy.tracker.percentile(100)
+        self.assertTrue(0.1 <= latency <= elapsed)
+        self.assertTrue(elapsed < 0.5)
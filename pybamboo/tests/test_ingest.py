@@ -0,0 +1,99 @@
+import os
+import pickle
+import shutil
+import tempfile
+
+from pybamboo import ingest
+from pybamboo.connection import Connection
+from pybamboo.dataset import Dataset
+from pybamboo.deadline import Deadline
+from pybamboo.exceptions import PyBambooException
+from pybamboo.hedging import HedgePolicy
+from pybamboo.tests.test_base import TestBase
+from pybamboo.throttle import AdaptiveConcurrencyLimit, Throttle
+
+
+def parse(row):
+    if row['amount'] == 'skip':
+        return None
+    return {'amount': float(row['amount']) * 2, 'pid': os.getpid()}
+
+
+def fail(row):
+    raise PyBambooException('cannot parse %s' % row)
+
+
+class TestIngest(TestBase):
+
+    def setUp(self):
+        TestBase.setUp(self)
+        self.fake = self.fake_connection()
+        self.tmpdir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        TestBase.tearDown(self)
+        shutil.rmtree(self.tmpdir)
+
+    def test_pickle_connection(self):
+        connection = Connection('http://example.com',
+                                limits={'write': Throttle(rate=10,
+                                                          concurrency=4)},
+                                hedging=HedgePolicy(), pool_size=3)
+        session = connection.session
+        connection.limits['write'].acquire()
+        copy = pickle.loads(pickle.dumps(connection))
+        self.assertEqual(copy.url, 'http://example.com')
+        self.assertEqual(copy.pool_size, 3)
+        self.assertEqual(copy.limits['write'].concurrency.in_flight, 0)
+        self.assertEqual(copy.limits['write'].bucket.rate, 10)
+        self.assertEqual(copy.retry_policy.max_retries,
+                         connection.retry_policy.max_retries)
+        self.assertTrue(copy.session is not session)
+        self.assertTrue(connection.session is session)
+
+    def test_session_after_fork(self):
+        session = self.fake.session
+        self.fake._pid = -1  # as seen from a child process
+        self.assertTrue(self.fake.session is not session)
+        self.assertTrue(self.fake.session is self.fake.session)
+
+    def test_throttle_after_fork(self):
+        limit = AdaptiveConcurrencyLimit(initial=1)
+        limit.acquire()
+        condition = limit._condition
+        condition.acquire()  # held by a thread of the parent
+        limit._locks_pid = -1  # as seen from a child process
+        self.assertTrue(limit._condition is not condition)
+        self.assertEqual(limit.in_flight, 0)
+        limit.acquire(Deadline(1))
+        self.assertEqual(limit.in_flight, 1)
+        condition.release()
+
+    def test_pickle_dataset(self):
+        dataset = Dataset(content='amount\n1\n', connection=self.fake)
+        copy = pickle.loads(pickle.dumps(dataset))
+        self.assertEqual(copy.id, dataset.id)
+        self.assertEqual(copy.get_data(), [{'amount': 1.0}])
+
+    def test_chunks(self):
+        self.assertEqual(list(ingest.chunks(range(5), 2)),
+                         [[0, 1], [2, 3], [4]])
+
+    def test_ingest_file(self):
+        path = os.path.join(self.tmpdir, 'rows.csv')
+        with open(path, 'w') as f:
+            f.write('amount\n')
+            for i in range(50):
+                f.write('%s\n' % ('skip' if i == 7 else i))
+        dataset = Dataset(content='amount,pid\n0,0\n', connection=self.fake)
+        self.assertEqual(ingest.ingest_file(dataset, path, parse,
+                                            chunk_size=5, processes=2), 49)
+        rows = dataset.get_data()[1:]
+        self.assertEqual(sorted(row['amount'] for row in rows),
+                         [i * 2.0 for i in range(50) if i != 7])
+        self.assertTrue(os.getpid() not in [row['pid'] for row in rows])
+
+    def test_ingest_error(self):
+        dataset = Dataset(content='amount\n0\n', connection=self.fake)
+        with self.assertRaises(PyBambooException):
+            ingest.ingest(dataset, [{'amount': 1}], fail, processes=1)
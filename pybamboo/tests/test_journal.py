@@ -0,0 +1,151 @@
+import os
+import shutil
+import tempfile
+
+import requests
+
+from pybamboo import journal
+from pybamboo.dataset import Dataset
+from pybamboo.exceptions import PyBambooException
+from pybamboo.tests.test_base import TestBase
+
+
+class Crash(Exception):
+    pass
+
+
+class TestJournal(TestBase):
+
+    def setUp(self):
+        TestBase.setUp(self)
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, 'upload.journal')
+        self.stub_dataset = Dataset(content='amount\n0\n',
+                                    connection=self.fake_connection())
+
+    def tearDown(self):
+        TestBase.tearDown(self)
+        shutil.rmtree(self.directory)
+
+    def rows(self, count, crash_at=None):
+        for i in xrange(count):
+            if i == crash_at:
+                raise Crash()
+            yield {'amount': i + 1}
+
+    def amounts(self):
+        return sorted(row['amount'] for row in self.stub_dataset.get_data())
+
+    def test_bulk_update(self):
+        self.assertEqual(self.stub_dataset.bulk_update(
+            self.rows(25), self.path, chunk_size=10), 25)
+        self.assertEqual(self.amounts(), range(26))
+        keys = [row['row_key'] for row in self.stub_dataset.get_data(
+            query={'amount': {'$gt': 0}})]
+        self.assertEqual(len(set(keys)), 25)
+        # a finished upload is not sent again
+        self.assertEqual(self.stub_dataset.bulk_update(
+            self.rows(25, crash_at=0), self.path, chunk_size=10), 0)
+
+    def test_resume_after_crash(self):
+        with self.assertRaises(Crash):
+            self.stub_dataset.bulk_update(self.rows(25, crash_at=15),
+                                          self.path, chunk_size=10)
+        self.assertEqual(self.amounts(), range(11))
+        self.assertEqual(self.stub_dataset.bulk_update(
+            self.rows(25), self.path, chunk_size=10), 15)
+        self.assertEqual(self.amounts(), range(26))
+
+    def test_replayed_chunk(self):
+        update_data = self.stub_dataset.update_data
+        calls = []
+
+        def update_then_crash(rows, **kwargs):
+            calls.append(len(rows))
+            update_data(rows, **kwargs)
+            if len(calls) == 2:
+                raise Crash()  # the response to the second chunk is lost
+            return True
+        self.stub_dataset.update_data = update_then_crash
+        with self.assertRaises(Crash):
+            self.stub_dataset.bulk_update(self.rows(25), self.path,
+                                          chunk_size=10)
+        self.assertEqual(self.stub_dataset.bulk_update(
+            self.rows(25), self.path, chunk_size=10), 5)
+        self.assertEqual(calls, [10, 10, 5])
+        self.assertEqual(self.amounts(), range(26))
+
+    def test_lost_response(self):
+        connection = self.stub_dataset._connection
+        send = connection._send
+        puts = []
+
+        def lose_second_put(method, *args):
+            response = send(method, *args)
+            if method == 'PUT':
+                puts.append(response)
+                if len(puts) == 2:
+                    raise requests.exceptions.ReadTimeout()
+            return response
+        connection._send = lose_second_put
+        self.assertEqual(self.stub_dataset.bulk_update(
+            self.rows(25), self.path, chunk_size=10), 25)
+        self.assertEqual(len(puts), 3)
+        self.assertEqual(self.amounts(), range(26))
+        self.assertTrue(all(arguments['num_retries'] == 0
+                            for method, url, arguments in connection.requests
+                            if method == 'PUT'))
+
+    def test_present_keys_batched(self):
+        connection = self.stub_dataset._connection
+        keys = ['key-%d' % i for i in range(250)]
+        self.assertEqual(journal._present_keys(self.stub_dataset, 'row_key',
+                                               keys, None), set())
+        lookups = [url for method, url, arguments in connection.requests
+                   if method == 'GET']
+        self.assertEqual(len(lookups), 3)
+
+    def test_journal(self):
+        with journal.Journal(self.path) as upload:
+            upload.begin('abc', 10, 'key')
+            upload.write({'chunk': 0, 'rows': 10})
+            upload.write({'chunk': 0, 'acked': True})
+            upload.write({'chunk': 1, 'rows': 10})
+        with open(self.path, 'ab') as f:
+            f.write('{"chunk": 1, "ack')  # cut short by a crash
+        with journal.Journal(self.path) as upload:
+            self.assertEqual(upload.resume_chunk(), 1)
+            self.assertEqual(upload.sent, set([0, 1]))
+            upload.write({'chunk': 1, 'acked': True})
+            with self.assertRaises(PyBambooException):
+                upload.begin('abc', 20, 'key')
+        with journal.Journal(self.path) as upload:
+            self.assertEqual(upload.resume_chunk(), 2)
+            upload.begin('abc', 10, 'key')
+
+    def test_journal_locked(self):
+        with journal.Journal(self.path):
+            with self.assertRaises(PyBambooException):
+                self.stub_dataset.bulk_update(self.rows(5), self.path)
+        self.assertEqual(self.stub_dataset.bulk_update(
+            self.rows(5), self.path), 5)
+
+    def test_key_not_kept(self):
+        get_info = self.stub_dataset.get_info
+
+        def drop_key(**kwargs):
+            info = get_info(**kwargs)
+            del info['schema']['row_key']
+            return info
+        self.stub_dataset.get_info = drop_key
+        with self.assertRaises(PyBambooException):
+            self.stub_dataset.bulk_update(self.rows(25), self.path,
+                                          chunk_size=10)
+        self.assertEqual(self.amounts(), range(11))
+
+    def test_invalid_rows(self):
+        with self.assertRaises(PyBambooException):
+            self.stub_dataset.bulk_update([{'row_key': 'x'}], self.path)
+        with self.assertRaises(PyBambooException):
+            self.stub_dataset.bulk_update(self.rows(1), self.path,
+                                          chunk_size=5)
@@ -0,0 +1,60 @@
+import time
+
+from pybamboo.dataset import Dataset, merge_queries
+from pybamboo.exceptions import PyBambooException
+from pybamboo.parallel import ordered_map
+from pybamboo.tests.test_base import StubConnection, TestBase
+
+
+class TestParallel(TestBase):
+
+    def setUp(self):
+        TestBase.setUp(self)
+        self.stub = StubConnection()
+        self.stub_dataset = Dataset('abc', connection=self.stub)
+
+    def test_ordered_map(self):
+        def slow_square(x):
+            time.sleep(0.01 * (5 - x))
+            return x * x
+        self.assertEqual(list(ordered_map(slow_square, range(5), 3)),
+                         [0, 1, 4, 9, 16])
+        self.assertEqual(list(ordered_map(slow_square, range(5), 1)),
+                         [0, 1, 4, 9, 16])
+
+    def test_merge_queries(self):
+        part = {'index': {'$gte': 0}}
+        self.assertEqual(merge_queries(None, part), part)
+        self.assertEqual(merge_queries({'a': 1}, part),
+                         {'a': 1, 'index': {'$gte': 0}})
+        self.assertEqual(merge_queries({'index': 3}, part),
+                         {'$and': [{'index': 3}, part]})
+
+    def test_index_partitions(self):
+        batches = list(self.stub_dataset.iter_batches(partitions=3))
+        self.assertEqual([len(batch) for batch in batches], [4, 4, 2])
+        rows = [row for batch in batches for row in batch]
+        self.assertEqual(rows, StubConnection.ROWS)
+
+    def test_batch_size(self):
+        batches = list(self.stub_dataset.iter_batches(
+            batch_size=4, workers=2, query={'food_type': 'lunch'}))
+        self.assertEqual([len(batch) for batch in batches], [2, 2, 1])
+        self.assertTrue({'food_type': 'lunch', 'index': {'$gte': 8}}
+                        in self.stub.queries)
+
+    def test_partition_by(self):
+        batches = list(self.stub_dataset.iter_batches(
+            partition_by='food_type'))
+        self.assertEqual([batch[0]['food_type'] for batch in batches],
+                         ['dinner', 'lunch'])
+
+    def test_result_forms(self):
+        rows = self.stub_dataset.get_data_parallel(
+            partitions=[{'index': 1}, {'index': 0}])
+        self.assertEqual([row['index'] for row in rows], [1, 0])
+        table = self.stub_dataset.get_data_parallel(result='columnar')
+        self.assertEqual(table.num_rows, 10)
+        self.assertEqual(table.column('amount')[3], 3.0)
+        with self.assertRaises(PyBambooException):
+            self.stub_dataset.get_data_parallel(result='BAD')
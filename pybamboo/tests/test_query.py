@@ -0,0 +1,86 @@
+import shutil
+import tempfile
+
+import simplejson as json
+
+from pybamboo.cache import DatasetCache
+from pybamboo.dataset import Dataset
+from pybamboo.exceptions import PyBambooException
+from pybamboo.query import Param, PreparedQuery, data_params, summary_params
+from pybamboo.tests.test_base import StubConnection, TestBase
+
+
+class TestQuery(TestBase):
+
+    def setUp(self):
+        TestBase.setUp(self)
+        self.stub = StubConnection()
+        self.stub_dataset = Dataset('abc', connection=self.stub)
+
+    def test_params(self):
+        self.assertEqual(data_params(select=['a'], limit=5, index=True),
+                         {'select': '{"a": 1}', 'limit': '5',
+                          'index': True})
+        self.assertEqual(summary_params(groups=['a', 'b']),
+                         {'select': 'all', 'group': 'a,b'})
+        for kwargs in [{'select': 'a'}, {'query': [1]}, {'limit': '5'},
+                       {'format': 'xml'}, {'order_by': 1}]:
+            with self.assertRaises(PyBambooException):
+                data_params(**kwargs)
+        with self.assertRaises(PyBambooException):
+            summary_params(groups='a')
+
+    def test_bind(self):
+        prepared = self.stub_dataset.prepare(
+            select=['amount'], query={'food_type': Param('food'),
+                                      'index': {'$lt': Param('upper')}})
+        params = prepared.bind(food='lunch', upper=5)
+        self.assertEqual(params['select'], '{"amount": 1}')
+        self.assertEqual(json.loads(params['query']),
+                         {'food_type': 'lunch', 'index': {'$lt': 5}})
+        self.assertEqual(json.loads(prepared.bind(
+            food='a "quoted" value', upper=None)['query'])['food_type'],
+            'a "quoted" value')
+        with self.assertRaises(PyBambooException):
+            prepared.bind(food='lunch')
+        with self.assertRaises(PyBambooException):
+            prepared.bind(food='lunch', upper=5, other=1)
+        with self.assertRaises(PyBambooException):
+            Param('deadline')
+
+    def test_execute(self):
+        prepared = self.stub_dataset.prepare(query={'index': Param('index')})
+        self.assertTrue(isinstance(prepared, PreparedQuery))
+        self.assertEqual(prepared.execute(index=3)[0]['amount'], 3.0)
+        self.assertEqual(prepared(index=4)[0]['amount'], 4.0)
+        self.assertEqual(self.stub.queries, [{'index': 3}, {'index': 4}])
+        static = self.stub_dataset.prepare(query={'index': 1})
+        self.assertTrue(static.bind() is static.params)
+
+    def test_key(self):
+        prepared = self.stub_dataset.prepare(query={'index': Param('index')})
+        self.assertEqual(prepared.key(index=1), prepared.key(index=1))
+        self.assertNotEqual(prepared.key(index=1), prepared.key(index=2))
+        self.assertTrue(prepared.key(index=1).startswith('abc-'))
+        summary = self.stub_dataset.prepare_summary(
+            query={'index': Param('index')})
+        self.assertNotEqual(summary.key(index=1), prepared.key(index=1))
+
+    def test_cache(self):
+        directory = tempfile.mkdtemp()
+        try:
+            cache = DatasetCache(directory)
+            prepared = self.stub_dataset.prepare(
+                query={'food_type': Param('food')})
+            with cache.fetch(self.stub_dataset, query=prepared,
+                             values={'food': 'lunch'}) as table:
+                self.assertEqual(table.num_rows, 5)
+            cache.fetch(self.stub_dataset, query=prepared,
+                        values={'food': 'lunch'}).close()
+            self.assertEqual(len(self.stub.queries), 1)
+            with cache.fetch(self.stub_dataset, query=prepared,
+                             values={'food': 'dinner'}) as table:
+                self.assertEqual(table.column('food_type')[0], 'dinner')
+            self.assertEqual(len(self.stub.queries), 2)
+        finally:
+            shutil.rmtree(directory)
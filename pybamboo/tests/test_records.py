@@ -0,0 +1,69 @@
+import datetime
+import sys
+
+from bson.tz_util import utc
+
+from pybamboo.dataset import Dataset
+from pybamboo.exceptions import PyBambooException
+from pybamboo.records import Record, decode_rows, record_class
+from pybamboo.tests.test_base import StubConnection, TestBase
+
+
+class TestRecords(TestBase):
+
+    SCHEMA = {
+        'amount': {'simpletype': 'float'},
+        'count': {'simpletype': 'integer'},
+        'submit_date': {'simpletype': 'datetime'},
+        'food_type': {'simpletype': 'string'},
+        '1st choice': {'simpletype': 'string'},
+    }
+
+    def test_decode(self):
+        Row = record_class(self.SCHEMA, index=True)
+        self.assertEqual(Row._fields, ('index', '1st choice', 'amount',
+                                       'count', 'food_type', 'submit_date'))
+        row = Row.decode({'index': 3, 'amount': '9', 'count': 2.0,
+                          'food_type': u'lunch', '1st choice': u'kebab',
+                          'submit_date': 1325203200000, 'extra': 1})
+        self.assertTrue(isinstance(row, Record))
+        self.assertEqual(row.amount, 9.0)
+        self.assertTrue(isinstance(row.count, int))
+        self.assertEqual(row.submit_date,
+                         datetime.datetime(2011, 12, 30, tzinfo=utc))
+        self.assertEqual(row['1st choice'], u'kebab')
+        self.assertEqual(row[0], 3)
+        self.assertEqual(row.get('extra', 'n/a'), 'n/a')
+        self.assertEqual(row.as_dict()['food_type'], u'lunch')
+        self.assertFalse(hasattr(row, '__dict__'))
+        with self.assertRaises(KeyError):
+            row['extra']
+
+    def test_na_values(self):
+        Row = record_class(self.SCHEMA, ['amount', 'submit_date', 'count'])
+        row = Row.decode({'amount': 'n/a', 'count': float('nan')})
+        self.assertEqual(tuple(row), (None, None, None))
+
+    def test_shared_values(self):
+        rows = decode_rows([{'food_type': u'lunch' + u''},
+                            {'food_type': u''.join([u'lun', u'ch'])}],
+                           self.SCHEMA, ['food_type'])
+        self.assertTrue(rows[0].food_type is rows[1].food_type)
+
+    def test_compact(self):
+        Row = record_class(self.SCHEMA)
+        row = {'amount': 1.0, 'count': 1, 'food_type': u'lunch',
+               '1st choice': u'kebab', 'submit_date': None}
+        self.assertTrue(sys.getsizeof(Row.decode(row)) <
+                        sys.getsizeof(row) / 2)
+
+    def test_get_data_records(self):
+        dataset = Dataset('abc', connection=StubConnection())
+        rows = dataset.get_data(query={'index': 2}, records=True)
+        self.assertEqual([tuple(row) for row in rows], [(2.0,)])
+        rows = dataset.get_data(query={'index': 2}, select=['food_type'],
+                                index=True, records=True)
+        self.assertEqual(rows[0].index, 2)
+        self.assertEqual(rows[0].food_type, 'dinner')
+        with self.assertRaises(PyBambooException):
+            dataset.get_data(format='csv', records=True)
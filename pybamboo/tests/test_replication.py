@@ -0,0 +1,128 @@
+import time
+
+import requests
+
+from pybamboo.connection import Connection
+from pybamboo.dataset import Dataset
+from pybamboo.exceptions import BambooServerError
+from pybamboo.replication import Node, ReplicatedConnection
+from pybamboo.tests.test_base import TestBase
+
+
+class TestReplication(TestBase):
+
+    class Clock(object):
+
+        def __init__(self):
+            self.now = 0.0
+
+        def __call__(self):
+            return self.now
+
+    class StubServer(Connection):
+        """
+        Answers every request after *latency* seconds of a fake clock, or
+        fails while *down*.
+        """
+
+        def __init__(self, url, clock, latency):
+            Connection.__init__(self, url)
+            self.clock = clock
+            self.latency = latency
+            self.down = False
+            self.requests = []
+            self.arguments = []
+
+        def make_api_request(self, http_method, url, data=None, files=None,
+                             params=None, **kwargs):
+            self.requests.append((http_method, url))
+            self.arguments.append(kwargs)
+            if self.down:
+                raise requests.exceptions.ConnectionError(self.url)
+            self.clock.now += self.latency
+            return {'id': 'abc', 'url': self.url}
+
+    def setUp(self):
+        TestBase.setUp(self)
+        self.clock = self.Clock()
+        self.primary = self.StubServer('http://primary', self.clock, 0.3)
+        self.fast = self.StubServer('http://fast', self.clock, 0.1)
+        self.slow = self.StubServer('http://slow', self.clock, 0.5)
+        self.replicated = ReplicatedConnection(
+            self.primary, [self.slow, self.fast], start=False,
+            clock=self.clock)
+
+    def test_node(self):
+        node = Node(self.primary, smoothing=0.5, eject_after=2,
+                    readmit_after=2)
+        node.record(1.0)
+        node.record(2.0)
+        self.assertEqual(node.latency, 1.5)
+        node.record(success=False)
+        self.assertTrue(node.healthy)
+        node.record(success=False)
+        self.assertFalse(node.healthy)
+        node.record(1.0)
+        self.assertFalse(node.healthy)
+        node.record(1.0)
+        self.assertTrue(node.healthy)
+
+    def test_reads_go_to_fastest(self):
+        self.replicated.check()
+        dataset = Dataset('abc', connection=self.replicated)
+        self.assertEqual(dataset.get_info()['url'], 'http://fast')
+        self.assertTrue(dataset.update_data([{'a': 1}]))
+        self.assertEqual(self.primary.requests[-1], ('PUT', '/datasets/abc'))
+        self.assertEqual(self.replicated.url, 'http://primary')
+
+    def test_failover_and_readmission(self):
+        self.replicated.check()
+        self.fast.down = True
+        self.assertEqual(self.replicated.make_api_request(
+            'GET', '/datasets/abc/info')['url'], 'http://primary')
+        for i in range(2):
+            self.replicated.check()
+        self.assertEqual([node.url for node in self.replicated.read_nodes()
+                          if not node.healthy], ['http://fast'])
+        self.fast.down = False
+        self.replicated.check()
+        self.replicated.check()
+        self.assertEqual(self.replicated.read_nodes()[0].url, 'http://fast')
+
+    def test_failover_without_retries(self):
+        self.replicated.check()
+        self.fast.down = self.primary.down = True
+        self.assertEqual(self.replicated.make_api_request(
+            'GET', '/version', deadline=10, num_retries=2)['url'],
+            'http://slow')
+        fast, primary, slow = [server.arguments[-1] for server
+                               in (self.fast, self.primary, self.slow)]
+        # only the last node retries, all within the same deadline
+        self.assertEqual([fast['num_retries'], primary['num_retries'],
+                          slow['num_retries']], [0, 0, 2])
+        self.assertTrue(fast['deadline'] is slow['deadline'])
+
+    def test_all_down(self):
+        for server in (self.primary, self.fast, self.slow):
+            server.down = True
+        with self.assertRaises(requests.exceptions.ConnectionError):
+            self.replicated.make_api_request('GET', '/version')
+        self.assertEqual(len(self.slow.requests), 1)
+
+    def test_server_errors_fail_over(self):
+        def fail(*args, **kwargs):
+            raise BambooServerError('500: down')
+        self.replicated.check()
+        self.fast.make_api_request = fail
+        self.assertEqual(self.replicated.make_api_request(
+            'GET', '/version')['url'], 'http://primary')
+
+    def test_background_checks(self):
+        replicated = ReplicatedConnection(self.primary, [self.fast],
+                                          check_interval=0.01)
+        try:
+            while not self.fast.requests:
+                time.sleep(0.005)
+        finally:
+            replicated.close()
+        self.assertEqual(self.fast.requests[0], ('GET', '/version'))
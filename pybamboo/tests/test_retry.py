@@ -0,0 +1,140 @@
+import requests
+
+from pybamboo.connection import Connection
+from pybamboo.dataset import Dataset
+from pybamboo.exceptions import BambooServerError
+from pybamboo.retry import FATAL, RETRYABLE, SUCCESS, RetryBudget,\
+    RetryPolicy
+from pybamboo.tests.test_base import TestBase
+
+
+class TestRetry(TestBase):
+
+    def setUp(self):
+        TestBase.setUp(self)
+        self.sleeps = []
+        self.policy = RetryPolicy(max_retries=3, budget=RetryBudget(),
+                                  sleep=self.sleeps.append)
+
+    def _response(self, status_code, headers=None):
+        response = self.MockResponse()
+        response.status_code = status_code
+        response.headers = headers or {}
+        response.text = '{}'
+        return response
+
+    def _sender(self, outcomes):
+        outcomes = list(outcomes)
+
+        def send():
+            outcome = outcomes.pop(0)
+            if isinstance(outcome, Exception):
+                raise outcome
+            return outcome
+        return send
+
+    def test_classify(self):
+        self.assertEqual(self.policy.classify(self._response(200)), SUCCESS)
+        self.assertEqual(self.policy.classify(self._response(400)), SUCCESS)
+        self.assertEqual(self.policy.classify(self._response(503)),
+                         RETRYABLE)
+        self.assertEqual(self.policy.classify(self._response(501)), FATAL)
+        self.assertEqual(self.policy.classify(
+            error=requests.exceptions.ConnectionError()), RETRYABLE)
+        self.assertEqual(self.policy.classify(error=ValueError()), FATAL)
+
+    def test_retries_idempotent(self):
+        send = self._sender([self._response(502), self._response(503),
+                             self._response(200)])
+        response = self.policy.call(send, 'GET')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(self.sleeps), 2)
+
+    def test_no_retry_unsafe(self):
+        send = self._sender([self._response(503), self._response(200)])
+        self.assertEqual(self.policy.call(send, 'POST').status_code, 503)
+        send = self._sender([self._response(503), self._response(200)])
+        self.assertEqual(
+            self.policy.call(send, 'POST', safe=True).status_code, 200)
+        send = self._sender([requests.exceptions.ConnectTimeout(),
+                             self._response(201)])
+        self.assertEqual(self.policy.call(send, 'POST').status_code, 201)
+
+    def test_gives_up(self):
+        send = self._sender([requests.exceptions.ConnectionError()] * 4)
+        with self.assertRaises(requests.exceptions.ConnectionError):
+            self.policy.call(send, 'GET')
+        self.assertEqual(len(self.sleeps), 3)
+
+    def test_backoff(self):
+        for attempt in range(5):
+            delay = self.policy.backoff(attempt)
+            self.assertTrue(0 <= delay <= min(30, 0.5 * 2 ** attempt))
+        response = self._response(429, {'retry-after': '7'})
+        self.assertTrue(self.policy.backoff(0, response) >= 7)
+
+    def test_budget(self):
+        policy = RetryPolicy(max_retries=5,
+                             budget=RetryBudget(ratio=0, burst=1),
+                             sleep=self.sleeps.append)
+        send = self._sender([self._response(503)] * 3)
+        self.assertEqual(policy.call(send, 'GET').status_code, 503)
+        self.assertEqual(len(self.sleeps), 1)
+
+    def test_connection_server_error(self):
+        connection = Connection(self.bamboo_url, retry_policy=self.policy)
+        connection._send = lambda *args: self._response(500)
+        with self.assertRaises(BambooServerError):
+            connection.make_api_request('GET', '/version')
+        self.assertEqual(len(self.sleeps), 3)
+
+    def _lose_first_response(self, connection, http_method):
+        """
+        Makes the first *http_method* request of *connection* reach bamboo
+        but lose its response.
+        """
+        send = connection._send
+        lost = []
+
+        def lossy_send(method, *args):
+            response = send(method, *args)
+            if method == http_method and not lost:
+                lost.append(response)
+                raise requests.exceptions.ReadTimeout()
+            return response
+        connection._send = lossy_send
+
+    def test_no_duplicate_rows(self):
+        connection = self.fake_connection(retry_policy=self.policy)
+        dataset = Dataset(content='amount\n1\n', connection=connection)
+        self._lose_first_response(connection, 'PUT')
+        with self.assertRaises(requests.exceptions.ReadTimeout):
+            dataset.update_data([{'amount': 2}])
+        self.assertEqual(len(self.sleeps), 0)
+        self.assertEqual(dataset.get_info()['num_rows'], 2)
+
+    def test_rewinds_file_bodies(self):
+        connection = self.fake_connection(retry_policy=self.policy)
+        send = connection._send
+        attempts = []
+
+        def unconnected_send(*args):
+            attempts.append(args)
+            if len(attempts) == 1:
+                # as if the body was read before the connection failed
+                args[3]['csv_file'][1].read()
+                raise requests.exceptions.ConnectTimeout()
+            return send(*args)
+        connection._send = unconnected_send
+        dataset = Dataset(path=self.CSV_FILE, connection=connection)
+        self.assertEqual(len(attempts), 2)
+        self.assertEqual(dataset.get_info()['num_rows'], self.NUM_ROWS)
+
+    def test_no_retry_unreadable_body(self):
+        connection = Connection(self.bamboo_url, retry_policy=self.policy)
+        send = self._sender([self._response(503), self._response(200)])
+        connection._send = lambda *args: send()
+        with self.assertRaises(BambooServerError):
+            connection.make_api_request('PUT', '/datasets/x',
+                                        data=iter(['a', 'b']))
+        self.assertEqual(len(self.sleeps), 0)
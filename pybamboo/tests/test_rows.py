@@ -0,0 +1,58 @@
+from pybamboo.dataset import Dataset
+from pybamboo.exceptions import PyBambooException
+from pybamboo.tests.test_base import TestBase
+
+
+class TestRows(TestBase):
+
+    def setUp(self):
+        TestBase.setUp(self)
+        self.fake = self.fake_connection()
+        self.stub_dataset = Dataset(
+            content='amount,kind\n' + ''.join('%d,%s\n' % (i, 'ab'[i % 2])
+                                              for i in range(10)),
+            connection=self.fake)
+        del self.fake.requests[:]
+
+    def test_get_rows(self):
+        rows = self.stub_dataset.get_rows([7, 2, 3, 2, 42], batch_size=2)
+        self.assertEqual(sorted(rows), [2, 3, 7, 42])
+        self.assertEqual(rows[7], {'amount': 7.0, 'kind': 'b'})
+        self.assertEqual(rows[2]['amount'], 2.0)
+        self.assertEqual(rows[42], None)
+        self.assertEqual(len(self.fake.requests), 2)
+
+    def test_get_rows_batch_size(self):
+        rows = self.stub_dataset.get_rows(range(450))
+        self.assertEqual(len(rows), 450)
+        self.assertEqual(len(self.fake.requests), 3)
+
+    def test_get_rows_select_records(self):
+        rows = self.stub_dataset.get_rows([1, 4, 99], select=['amount'],
+                                          records=True)
+        self.assertEqual(rows[1].amount, 1.0)
+        self.assertEqual(rows[4].keys(), ['amount'])
+        self.assertEqual(rows[99], None)
+
+    def test_update_delete_rows(self):
+        results = self.stub_dataset.update_rows({1: {'amount': 10},
+                                                 3: {'amount': 30}})
+        self.assertEqual(sorted(results), [1, 3])
+        self.assertTrue(all('success' in result
+                            for result in results.values()))
+        results = self.stub_dataset.delete_rows([0, 3, 99])
+        self.assertTrue('success' in results[0])
+        self.assertTrue('error' in results[99])
+        rows = self.stub_dataset.get_rows(range(5))
+        self.assertEqual(rows[0], None)
+        self.assertEqual(rows[1]['amount'], 10.0)
+        self.assertEqual(rows[3], None)
+
+    def test_invalid_indexes(self):
+        for method, argument in ((self.stub_dataset.get_rows, ['1']),
+                                 (self.stub_dataset.delete_rows, [1.5]),
+                                 (self.stub_dataset.update_rows, [1]),
+                                 (self.stub_dataset.update_rows, {'1': {}})):
+            with self.assertRaises(PyBambooException):
+                method(argument)
+        self.assertEqual(self.fake.requests, [])
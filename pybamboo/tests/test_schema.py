@@ -0,0 +1,102 @@
+import StringIO
+
+import simplejson as json
+
+from pybamboo import schema
+from pybamboo.dataset import Dataset
+from pybamboo.exceptions import PyBambooException
+from pybamboo.tests.test_base import TestBase
+
+
+class TestSchema(TestBase):
+
+    CSV = ('count,price,day,flag,code,note\n'
+           '1,2.5,2013-01-02,true,007,-\n'
+           '2,-,2013-01-03,False,010,\n'
+           '3,.5,2013-01-04,TRUE,x,n/a\n')
+
+    def setUp(self):
+        TestBase.setUp(self)
+        self.connection = self.fake_connection()
+
+    def test_sdf(self):
+        result = schema.sdf('{"code": "string", "amount": '
+                            '{"simpletype": "float", "label": "Amount"}}')
+        self.assertEqual(result['code'], {'simpletype': 'string',
+                                          'olap_type': 'dimension',
+                                          'label': 'code'})
+        self.assertEqual(result['amount']['olap_type'], 'measure')
+        self.assertEqual(result['amount']['label'], 'Amount')
+        for invalid in ('{', [], {'code': 1}, {'code': {'label': 'x'}}):
+            with self.assertRaises(PyBambooException):
+                schema.sdf(invalid)
+
+    def test_infer_csv(self):
+        inference = schema.infer_csv(StringIO.StringIO(self.CSV),
+                                     na_values=['x'])
+        simpletypes = dict((column, description['simpletype'])
+                           for column, description
+                           in inference.sdf().iteritems())
+        self.assertEqual(simpletypes, {'count': 'integer', 'price': 'float',
+                                       'day': 'datetime', 'flag': 'boolean',
+                                       'code': 'float', 'note': 'string'})
+        # '-' is a value in the string column note, not an n/a value
+        self.assertEqual(inference.all_na_values(), ['x'])
+        self.assertEqual(inference.sdf()['flag']['olap_type'], 'dimension')
+        inference = schema.infer_csv(StringIO.StringIO(
+            'price,note\n2.5,a\n-,b\nNULL,-\n'))
+        self.assertEqual(inference.all_na_values(), ['NULL'])
+
+    def test_infer_csv_sample(self):
+        csv = 'amount\n' + '1\n' * 10 + 'many\n'
+        inference = schema.infer_csv(StringIO.StringIO(csv), sample_size=10)
+        self.assertEqual(inference.sdf()['amount']['simpletype'], 'integer')
+        self.assertEqual(inference.rows, 10)
+        inference = schema.infer_csv(StringIO.StringIO(csv))
+        self.assertEqual(inference.sdf()['amount']['simpletype'], 'string')
+        inference = schema.infer_csv(StringIO.StringIO(
+            'amount,kind\n1,a\n,b\n2,c\n'))
+        self.assertEqual(inference.sdf()['amount']['simpletype'], 'float')
+
+    def test_dataset_infer_schema(self):
+        dataset = Dataset(content=self.CSV, infer_schema=True,
+                          connection=self.connection)
+        method, url, sent = self.connection.requests[0]
+        self.assertEqual(json.loads(sent['files']['schema'][1])['day'][
+            'simpletype'], 'datetime')
+        self.assertEqual(json.loads(sent['data']['na_values']), [])
+        self.assertEqual(dataset.NA_VALUES, [])
+        schema = dataset.get_info()['schema']
+        self.assertEqual(schema['count']['simpletype'], 'integer')
+        self.assertEqual(schema['day']['simpletype'], 'datetime')
+        rows = dataset.get_data(order_by='count')
+        self.assertEqual([row['price'] for row in rows], [2.5, None, 0.5])
+
+        dataset = Dataset(path=self.CSV_FILE, infer_schema=True,
+                          connection=self.connection)
+        self.assertEqual(dataset.get_data(count=True), self.NUM_ROWS)
+        schema = dataset.get_info()['schema']
+        self.assertEqual(schema['amount']['simpletype'], 'float')
+        self.assertEqual(schema['submit_date']['simpletype'], 'datetime')
+
+    def test_dataset_infer_schema_invalid(self):
+        with self.assertRaises(PyBambooException):
+            Dataset(url='http://example.com/data.csv', infer_schema=True,
+                    connection=self.connection)
+        with self.assertRaises(PyBambooException):
+            Dataset(path=self.JSON_FILE, data_format='json',
+                    infer_schema=True, connection=self.connection)
+        self.assertEqual(self.connection.requests, [])
+
+    def test_from_rows_infer_schema(self):
+        rows = ({'amount': i if i % 3 else 'n/a', 'code': '%03d' % i}
+                for i in xrange(10))
+        dataset = Dataset.from_rows(rows, na_values=['?'],
+                                    infer_schema=True,
+                                    connection=self.connection)
+        self.assertEqual(dataset.NA_VALUES, ['?', 'n/a'])
+        schema = dataset.get_info()['schema']
+        self.assertEqual(schema['amount']['simpletype'], 'float')
+        self.assertEqual(schema['code']['simpletype'], 'integer')
+        self.assertEqual(dataset.get_data(query={'amount': None},
+                                          count=True), 4)
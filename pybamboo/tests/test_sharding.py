@@ -0,0 +1,127 @@
+import itertools
+
+from pybamboo.connection import Connection
+from pybamboo.dataset import Dataset
+from pybamboo.exceptions import PyBambooException
+from pybamboo.sharding import HashRing, ShardedConnection, merge_summaries
+from pybamboo.tests.test_base import TestBase
+
+
+class TestSharding(TestBase):
+
+    class StubShard(Connection):
+        """
+        Creates datasets and answers summaries without a bamboo server.
+        """
+
+        ids = itertools.count()
+
+        def __init__(self, url):
+            Connection.__init__(self, url)
+            self.requests = []
+
+        def make_api_request(self, http_method, url, data=None, files=None,
+                             params=None, **kwargs):
+            self.requests.append((http_method, url))
+            if url.endswith('/summary'):
+                return {'amount': {'summary': {
+                    'count': 2, 'mean': 1.0 if 'a' in self.url else 4.0,
+                    'std': 0.0, 'min': 1.0, 'max': 4.0}}}
+            if url.endswith('/aggregations'):
+                return {'': 'aggregated'}
+            if http_method == 'DELETE':
+                return {'success': 'deleted'}
+            return {'id': 'ds%d' % next(self.ids)}
+
+    def setUp(self):
+        TestBase.setUp(self)
+        self.a = self.StubShard('http://a')
+        self.b = self.StubShard('http://b')
+        self.sharded = ShardedConnection([self.a, self.b])
+
+    def test_ring(self):
+        ring = HashRing(['a', 'b', 'c'])
+        keys = ['dataset%d' % i for i in range(300)]
+        before = dict((key, ring.node(key)) for key in keys)
+        self.assertEqual(set(before.values()), set(['a', 'b', 'c']))
+        after = HashRing(['a', 'b', 'c', 'd'])
+        moved = [key for key in keys if after.node(key) != before[key]]
+        self.assertTrue(all(after.node(key) == 'd' for key in moved))
+        self.assertTrue(len(moved) < 150)
+
+    def test_routing(self):
+        dataset = Dataset('some-id', connection=self.sharded)
+        dataset.get_info()
+        shard = self.sharded.connection_for('some-id')
+        self.assertEqual(shard.requests, [('GET', '/datasets/some-id/info')])
+        self.sharded.version
+        self.assertEqual(self.a.requests[-1], ('GET', '/version'))
+
+    def test_placement_by_load(self):
+        datasets = [Dataset(content='a,b\n1,2\n', connection=self.sharded)
+                    for i in range(4)]
+        urls = [self.sharded.shard_url(dataset.id) for dataset in datasets]
+        self.assertEqual(sorted(urls), ['http://a', 'http://a',
+                                        'http://b', 'http://b'])
+        for dataset, url in zip(datasets, urls):
+            dataset.get_info()
+            self.assertTrue(('GET', '/datasets/%s/info' % dataset.id) in
+                            self.sharded.shards[url].requests)
+        self.assertTrue(datasets[0].delete())
+        self.assertFalse(datasets[0].id in self.sharded.placements)
+
+    def test_aggregations_placed_with_dataset(self):
+        self.sharded.place('agg-source', 'http://b')
+        Dataset('agg-source', connection=self.sharded).get_aggregations()
+        self.assertEqual(self.sharded.shard_url('aggregated'), 'http://b')
+
+    def test_merge_requires_colocation(self):
+        self.sharded.place('left', 'http://a')
+        self.sharded.place('right', 'http://b')
+        datasets = [Dataset('left', connection=self.sharded),
+                    Dataset('right', connection=self.sharded)]
+        with self.assertRaises(PyBambooException):
+            Dataset.merge(datasets, connection=self.sharded)
+        with self.sharded.colocate('left'):
+            other = Dataset(content='a\n1\n', connection=self.sharded)
+        self.assertEqual(self.sharded.shard_url(other.id), 'http://a')
+        merged = Dataset.merge([datasets[0], other], connection=self.sharded)
+        self.assertEqual(self.sharded.shard_url(merged.id), 'http://a')
+        joined = Dataset.join(datasets[0], other, 'a',
+                              connection=self.sharded)
+        self.assertEqual(self.sharded.shard_url(joined.id), 'http://a')
+
+    def test_summary_fan_out(self):
+        self.sharded.place('left', 'http://a')
+        self.sharded.place('right', 'http://b')
+        summary = self.sharded.get_summary(['left', 'right'])['amount']
+        self.assertEqual(summary['summary']['count'], 4)
+        self.assertEqual(summary['summary']['mean'], 2.5)
+        self.assertAlmostEqual(summary['summary']['std'], 3 ** 0.5)
+
+    def test_merge_summaries(self):
+        merged = merge_summaries([
+            {'food_type': {'lunch': {'rating': {'summary': {'good': 2}}}}},
+            {'food_type': {'lunch': {'rating': {'summary': {'good': '1',
+                                                            'bad': 1}}},
+                           'dinner': {'rating': {'summary': {'bad': 3}}}}},
+        ])
+        self.assertEqual(merged, {'food_type': {
+            'lunch': {'rating': {'summary': {'good': 3, 'bad': 1}}},
+            'dinner': {'rating': {'summary': {'bad': 3}}}}})
+
+    def test_locate_unrecorded_placement(self):
+        servers = [self.start_fake_server() for i in range(2)]
+        shards = [Connection(server.url) for server in servers]
+        sharded = ShardedConnection(shards)
+        # created off its hash ring shard, e.g. by another process
+        url = shards[0].url
+        dataset = Dataset(content='amount\n1\n', connection=shards[0])
+        while sharded.ring.node(dataset.id) == url:
+            dataset = Dataset(content='amount\n1\n', connection=shards[0])
+        self.assertNotEqual(sharded.shard_url(dataset.id), url)
+        located = Dataset(dataset.id, connection=sharded)
+        self.assertEqual(located.get_data(), [{'amount': 1}])
+        self.assertEqual(sharded.placements, {dataset.id: url})
+        self.assertEqual(sharded.locate(dataset.id), url)
+        self.assertEqual(sharded.locate('missing'), None)
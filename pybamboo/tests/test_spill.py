@@ -0,0 +1,85 @@
+import StringIO
+import itertools
+
+from pybamboo import spill
+from pybamboo.connection import Connection
+from pybamboo.dataset import Dataset
+from pybamboo.exceptions import ErrorParsingBambooData, PyBambooException
+from pybamboo.tests.test_base import TestBase
+
+
+class TestSpill(TestBase):
+
+    class StreamedResponse(object):
+
+        def __init__(self, body):
+            self.body = body
+
+        def iter_content(self, chunk_size):
+            for i in xrange(0, len(self.body), chunk_size):
+                yield self.body[i:i + chunk_size]
+
+    def setUp(self):
+        TestBase.setUp(self)
+        self.server = self.start_fake_server()
+
+    def test_read_body(self):
+        response = self.StreamedResponse('a,b\n1,2\n')
+        self.assertEqual(spill.read_body(response, 8, chunk_size=3),
+                         'a,b\n1,2\n')
+        body = spill.read_body(response, 7, chunk_size=3)
+        self.assertTrue(isinstance(body, spill.SpilledBody))
+        with body:
+            self.assertEqual(len(body), 8)
+            self.assertEqual(list(body), ['a,b\n', '1,2\n'])
+            self.assertEqual(body.buffer[4:7], '1,2')
+
+    def test_iter_json_list(self):
+        text = ' [ {"a": 1.5, "b": "caf\\u00e9"}, {"$date": 0}, 12 , [3]] '
+        for chunk_size in (1, 2, 3, 7, 1000):
+            items = list(spill.iter_json_list(StringIO.StringIO(text),
+                                              chunk_size))
+            self.assertEqual(items[0], {'a': 1.5, 'b': u'caf\xe9'})
+            self.assertEqual(items[1].year, 1970)
+            self.assertEqual(items[2:], [12, [3]])
+        self.assertEqual(list(spill.iter_json_list(
+            StringIO.StringIO('[ ]'), 1)), [])
+        for text in ('{"a": 1}', '[1, 2', '[1 2]', '[1, 2.'):
+            with self.assertRaises(ErrorParsingBambooData):
+                list(spill.iter_json_list(StringIO.StringIO(text), 2))
+
+    def test_spilled_responses(self):
+        connection = Connection(self.server.url, spill_threshold=100)
+        dataset = Dataset(path=self.CSV_FILE, connection=connection)
+        rows = dataset.get_data()
+        self.assertTrue(isinstance(rows, spill.SpilledRows))
+        expected = Dataset(dataset.id, connection=Connection(
+            self.server.url)).get_data()
+        self.assertEqual(list(rows), expected)
+        # the rows are read through once, and the file removed
+        self.assertTrue(rows.body.file.closed)
+        with self.assertRaises(PyBambooException):
+            list(rows)
+        self.assertEqual(spill.as_list(dataset.get_data()), expected)
+
+        self.assertEqual(dataset.get_data(count=True), self.NUM_ROWS)
+        self.assertEqual(dataset.get_info()['num_rows'], self.NUM_ROWS)
+        self.assertEqual(len(dataset.get_data(select=['rating'], limit=1)),
+                         1)
+        with dataset.get_data(format='csv') as body:
+            self.assertTrue(isinstance(body, spill.SpilledBody))
+            self.assertEqual(len(list(body)), self.NUM_ROWS + 1)
+            self.assertTrue(body.buffer[:100].startswith('_id,'))
+
+    def test_spilled_callers(self):
+        connection = Connection(self.server.url, spill_threshold=100)
+        dataset = Dataset(path=self.CSV_FILE, connection=connection)
+        table = dataset.get_columnar()
+        self.assertEqual(len(table), self.NUM_ROWS)
+        self.assertEqual(len(table.column('amount')), self.NUM_ROWS)
+        rows = list(itertools.islice(dataset.follow(start=0), 3))
+        self.assertEqual(len(rows), 3)
+        self.assertFalse(any('index' in row for row in rows))
+        self.assertEqual(sum(len(batch) for batch in
+                             dataset.iter_batches(batch_size=5)),
+                         self.NUM_ROWS)
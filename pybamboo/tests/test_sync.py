@@ -0,0 +1,127 @@
+import datetime
+import os
+import shutil
+import tempfile
+import threading
+
+import simplejson as json
+
+from pybamboo import sync
+from pybamboo.dataset import Dataset
+from pybamboo.exceptions import PyBambooException
+from pybamboo.tests.test_base import TestBase
+
+
+class TestSync(TestBase):
+
+    class StubConnection(object):
+        """
+        Keeps the rows of a dataset in memory and applies row edits.
+        """
+
+        SCHEMA = {
+            'id': {'simpletype': 'integer'},
+            'amount': {'simpletype': 'float'},
+            'day': {'simpletype': 'datetime'},
+            'name': {'simpletype': 'string'},
+        }
+
+        def __init__(self, rows):
+            self.rows = dict(enumerate(rows))
+            self.requests = []
+            self.lock = threading.Lock()
+
+        def make_api_request(self, http_method, url, data=None, files=None,
+                             params=None, **kwargs):
+            with self.lock:
+                self.requests.append((http_method, url))
+                if url.endswith('/info'):
+                    return {'num_rows': len(self.rows),
+                            'schema': self.SCHEMA}
+                if '/row/' in url:
+                    index = int(url.rsplit('/', 1)[1])
+                    if http_method == 'DELETE':
+                        del self.rows[index]
+                    else:
+                        self.rows[index] = json.loads(data['data'])
+                    return {'success': 'ok', 'id': 'abc'}
+                if http_method == 'PUT':
+                    for row in json.loads(data['update']):
+                        self.rows[max(self.rows) + 1] = row
+                    return {'id': 'abc'}
+                bounds = json.loads(params['query'])['index']
+                return [dict(row, index=index)
+                        for index, row in sorted(self.rows.items())
+                        if bounds['$gte'] <= index <
+                        bounds.get('$lt', index + 1)]
+
+    def setUp(self):
+        TestBase.setUp(self)
+        self.stub = self.StubConnection([
+            {'id': 1, 'amount': 9.0, 'name': u'durum',
+             'day': datetime.datetime(2011, 12, 30)},
+            {'id': 2, 'amount': 2.5, 'name': u'kebab',
+             'day': datetime.datetime(2011, 12, 31)},
+            {'id': 3, 'amount': None, 'name': u'pide',
+             'day': datetime.datetime(2012, 1, 1)},
+        ])
+        self.stub_dataset = Dataset('abc', connection=self.stub)
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, 'rows.csv')
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def _write(self, *lines):
+        with open(self.path, 'w') as f:
+            f.write('id,amount,name,day\n')
+            for line in lines:
+                f.write(line + '\n')
+
+    def test_canonical(self):
+        self.assertEqual(sync.canonical('9', 'float'), sync.canonical(9.0))
+        self.assertEqual(sync.canonical('2011-12-30', 'datetime'),
+                         sync.canonical(datetime.datetime(2011, 12, 30)))
+        self.assertEqual(sync.canonical(' n/a ', 'float', ['n/a']), None)
+        self.assertEqual(sync.canonical('', 'string'), None)
+        self.assertEqual(sync.canonical(float('nan')), None)
+        self.assertEqual(sync.canonical('abc', 'float'), 'abc')
+
+    def test_unchanged(self):
+        self._write('1,9,durum,2011-12-30', '2,2.5,kebab,2011-12-31',
+                    '3,,pide,2012-01-01')
+        self.assertEqual(self.stub_dataset.sync(self.path, 'id'),
+                         {'added': 0, 'updated': 0, 'deleted': 0})
+        self.assertFalse([method for method, url in self.stub.requests
+                          if method != 'GET'])
+
+    def test_sync(self):
+        self._write('3,,lahmacun,2012-01-01', '1,9,durum,2011-12-30',
+                    '4,1,ayran,2012-01-02', '5,2,baklava,2012-01-02',
+                    '6,3,simit,2012-01-03')
+        counts = self.stub_dataset.sync(self.path, 'id', batch_size=2)
+        self.assertEqual(counts, {'added': 3, 'updated': 1, 'deleted': 1})
+        self.assertEqual(sorted(row['name'] for row in
+                                self.stub.rows.values()),
+                         ['ayran', 'baklava', 'durum', 'lahmacun', 'simit'])
+        self.assertEqual(self.stub.rows[2]['name'], 'lahmacun')
+        self.assertFalse(1 in self.stub.rows)
+        self.assertEqual(self.stub.requests.count(('PUT', '/datasets/abc')),
+                         2)
+
+    def test_dry_run(self):
+        self._write('1,10,durum,2011-12-30')
+        self.assertEqual(self.stub_dataset.sync(self.path, 'id',
+                                                dry_run=True),
+                         {'added': 0, 'updated': 1, 'deleted': 2})
+        self.assertEqual(len(self.stub.rows), 3)
+
+    def test_errors(self):
+        self._write('1,9,durum,2011-12-30', '1,9,durum,2011-12-30')
+        with self.assertRaises(PyBambooException):
+            self.stub_dataset.sync(self.path, 'id')
+        with self.assertRaises(PyBambooException):
+            self.stub_dataset.sync(self.path, 'missing')
+        self._write(',9,durum,2011-12-30')
+        with self.assertRaises(PyBambooException):
+            self.stub_dataset.sync(self.path, 'id')
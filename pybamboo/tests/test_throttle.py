@@ -0,0 +1,105 @@
+from pybamboo.connection import Connection
+from pybamboo.deadline import Deadline
+from pybamboo.exceptions import DeadlineExceeded, PyBambooException
+from pybamboo.tests.test_base import TestBase
+from pybamboo.throttle import AdaptiveConcurrencyLimit, Throttle,\
+    TokenBucket, endpoint_class
+
+
+class TestThrottle(TestBase):
+
+    class FakeClock(object):
+
+        def __init__(self):
+            self.now = 0.0
+
+        def __call__(self):
+            return self.now
+
+        def sleep(self, seconds):
+            self.now += seconds
+
+    def test_endpoint_class(self):
+        self.assertEqual(endpoint_class('GET'), 'read')
+        for method in ['POST', 'PUT', 'DELETE']:
+            self.assertEqual(endpoint_class(method), 'write')
+
+    def test_token_bucket_burst(self):
+        clock = self.FakeClock()
+        bucket = TokenBucket(2, capacity=3, clock=clock, sleep=clock.sleep)
+        for i in range(3):
+            self.assertTrue(bucket.try_acquire())
+        self.assertFalse(bucket.try_acquire())
+        clock.now += 0.5
+        self.assertTrue(bucket.try_acquire())
+
+    def test_token_bucket_acquire_waits(self):
+        clock = self.FakeClock()
+        bucket = TokenBucket(4, capacity=1, clock=clock, sleep=clock.sleep)
+        self.assertEqual(bucket.acquire(), 0.0)
+        self.assertAlmostEqual(bucket.acquire(), 0.25)
+        with self.assertRaises(PyBambooException):
+            bucket.acquire(2)
+
+    def test_token_bucket_deadline(self):
+        clock = self.FakeClock()
+        bucket = TokenBucket(1, clock=clock, sleep=clock.sleep)
+        deadline = Deadline(0.5, clock=clock)
+        self.assertEqual(bucket.acquire(deadline=deadline), 0.0)
+        with self.assertRaises(DeadlineExceeded):
+            bucket.acquire(deadline=deadline)
+        # nothing was slept or taken
+        self.assertEqual(clock.now, 0.0)
+        self.assertEqual(bucket.acquire(deadline=Deadline(1, clock=clock)),
+                         1.0)
+
+    def test_aimd_deadline(self):
+        limit = AdaptiveConcurrencyLimit(initial=1)
+        limit.acquire()
+        with self.assertRaises(DeadlineExceeded):
+            limit.acquire(Deadline(0.05))
+        self.assertEqual(limit.in_flight, 1)
+        limit.release(0.1)
+        limit.acquire(Deadline(0.05))
+        self.assertEqual(limit.in_flight, 1)
+
+    def test_connection_acquire_deadline(self):
+        limit = AdaptiveConcurrencyLimit(initial=1)
+        connection = Connection(self.bamboo_url, limits={
+            'read': Throttle(concurrency=limit)})
+        limit.acquire()
+        with self.assertRaises(DeadlineExceeded):
+            connection.make_api_request('GET', '/datasets', deadline=0.05)
+
+    def test_aimd_increase(self):
+        limit = AdaptiveConcurrencyLimit(initial=2, maximum=4)
+        for i in range(20):
+            limit.acquire()
+            limit.release(0.1)
+        self.assertEqual(limit.limit, 4)
+        self.assertEqual(limit.in_flight, 0)
+
+    def test_aimd_decrease_on_errors(self):
+        limit = AdaptiveConcurrencyLimit(initial=8, minimum=2)
+        for i in range(40):
+            limit.acquire()
+            limit.release(0.1, success=False)
+        self.assertEqual(limit.limit, 2)
+
+    def test_aimd_decrease_on_latency(self):
+        limit = AdaptiveConcurrencyLimit(initial=8, latency_tolerance=2.0)
+        for i in range(8):
+            limit.acquire()
+            limit.release(0.1)
+        before = limit.limit
+        for i in range(8):
+            limit.acquire()
+            limit.release(5.0)
+        self.assertTrue(limit.limit < before)
+
+    def test_connection_limits(self):
+        read = Throttle(rate=10, concurrency=2)
+        connection = Connection(self.bamboo_url, limits={'read': read})
+        self.assertEqual(connection.limits['read'], read)
+        self.assertEqual(read.concurrency.limit, 2)
+        self.assertTrue('write' not in connection.limits)
@@ -0,0 +1,81 @@
+import threading
+
+from pybamboo import transfer
+from pybamboo.connection import Connection
+from pybamboo.dataset import Dataset
+from pybamboo.exceptions import PyBambooException
+from pybamboo.tests.test_base import TestBase
+
+
+class TestTransfer(TestBase):
+
+    def setUp(self):
+        TestBase.setUp(self)
+        self.source = self.start_fake_server()
+        self.target = self.start_fake_server()
+        self.stub_dataset = Dataset(path=self.CSV_FILE,
+                                    connection=Connection(self.source.url))
+
+    def test_buffered(self):
+        produced = []
+
+        def items():
+            for i in range(10):
+                produced.append(i)
+                yield i
+        threads = threading.active_count()
+        buffered = transfer.buffered(items(), 2)
+        self.assertEqual([buffered.next() for i in range(4)], [0, 1, 2, 3])
+        buffered.close()
+        # the producer stops at most the queue size ahead of the consumer
+        self.assertTrue(len(produced) <= 7)
+        self.assertEqual(threading.active_count(), threads)
+        self.assertEqual(list(transfer.buffered(iter(range(5)), 1)),
+                         range(5))
+
+    def test_buffered_error(self):
+        def items():
+            yield 1
+            raise PyBambooException('download failed')
+        buffered = transfer.buffered(items())
+        self.assertEqual(buffered.next(), 1)
+        with self.assertRaises(PyBambooException):
+            buffered.next()
+
+    def test_copy_to(self):
+        self.stub_dataset.add_calculation('double_amount', 'amount * 2')
+        self.stub_dataset.add_calculation('total', 'sum(amount)',
+                                          groups=['food_type'])
+        self.stub_dataset.set_info(label='Good eats', license='Public')
+        copy = self.stub_dataset.copy_to(Connection(self.target.url),
+                                         batch_size=5, buffered_batches=1)
+        self.assertEqual(copy._connection.url, self.target.url)
+        self.assertNotEqual(copy.id, None)
+
+        info = self.stub_dataset.get_info()
+        copied = copy.get_info()
+        self.assertEqual(copied['num_rows'], self.NUM_ROWS)
+        self.assertEqual(copied['label'], 'Good eats')
+        self.assertEqual(copied['license'], 'Public')
+        self.assertEqual(
+            dict((column, description['simpletype'])
+                 for column, description in copied['schema'].iteritems()),
+            dict((column, description['simpletype'])
+                 for column, description in info['schema'].iteritems()))
+
+        self.assertEqual(
+            sorted((calculation['name'], calculation['formula'])
+                   for calculation in copy.get_calculations()),
+            [('double_amount', 'amount * 2'), ('total', 'sum(amount)')])
+
+        def key(row):
+            return (row['submit_date'], row['amount'], row['food_type'],
+                    row['gps'])
+        self.assertEqual(sorted(copy.get_data(), key=key),
+                         sorted(self.stub_dataset.get_data(), key=key))
+        self.assertEqual(copy.get_aggregations().keys(), ['food_type'])
+
+    def test_copy_to_missing_dataset(self):
+        missing = Dataset('missing', connection=Connection(self.source.url))
+        with self.assertRaises(PyBambooException):
+            missing.copy_to(Connection(self.target.url))
@@ -0,0 +1,60 @@
+from pybamboo.dataset import Dataset
+from pybamboo.exceptions import PyBambooException
+from pybamboo.tests.test_base import TestBase
+
+
+class TestUpdateData(TestBase):
+
+    def setUp(self):
+        TestBase.setUp(self)
+        self.fake = self.fake_connection()
+        self.stub_dataset = Dataset(content='amount\n0\n',
+                                    connection=self.fake)
+        self.consumed = 0
+        # the number of rows consumed when each request was sent
+        self.sent = []
+
+        def record(http_method, url):
+            if http_method == 'PUT':
+                self.sent.append(self.consumed)
+        self.fake.on_request = record
+
+    def rows(self, count, bad=None):
+        for i in xrange(count):
+            self.consumed += 1
+            yield {'amount': i} if i != bad else ['not', 'a', 'row']
+
+    def test_generator(self):
+        self.assertTrue(self.stub_dataset.update_data(self.rows(25),
+                                                      chunk_size=10))
+        self.assertEqual(self.sent, [10, 20, 25])
+        self.assertEqual(self.stub_dataset.get_data(count=True), 26)
+
+    def test_iterables(self):
+        self.assertTrue(self.stub_dataset.update_data(
+            ({'amount': i} for i in range(3))))
+        self.assertTrue(self.stub_dataset.update_data(
+            tuple({'amount': i} for i in range(3))))
+        self.assertEqual(len(self.sent), 2)
+
+    def test_list(self):
+        self.assertTrue(self.stub_dataset.update_data(
+            [{'amount': i} for i in range(25)]))
+        self.assertEqual(len(self.sent), 1)
+        self.assertTrue(self.stub_dataset.update_data(
+            [{'amount': i} for i in range(25)], chunk_size=20))
+        self.assertEqual(len(self.sent), 3)
+        self.assertEqual(self.stub_dataset.get_data(count=True), 51)
+
+    def test_invalid_rows(self):
+        with self.assertRaises(PyBambooException):
+            self.stub_dataset.update_data(self.rows(25, bad=15),
+                                          chunk_size=10)
+        self.assertEqual(self.sent, [10])
+        with self.assertRaises(PyBambooException):
+            self.stub_dataset.update_data(self.rows(0))
+        with self.assertRaises(PyBambooException):
+            self.stub_dataset.update_data(42)
+        with self.assertRaises(PyBambooException):
+            self.stub_dataset.update_data([{'amount': 1}, {'amount': set()}])
+        self.assertEqual(len(self.sent), 1)
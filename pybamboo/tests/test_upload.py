@@ -0,0 +1,79 @@
+import datetime
+
+from pybamboo import upload
+from pybamboo.dataset import Dataset
+from pybamboo.exceptions import PyBambooException
+from pybamboo.sharding import ShardedConnection
+from pybamboo.tests.test_base import TestBase
+
+
+class TestUpload(TestBase):
+
+    def setUp(self):
+        TestBase.setUp(self)
+        self.connection = self.fake_connection()
+        self.consumed = 0
+
+    def rows(self, count):
+        for i in xrange(count):
+            self.consumed += 1
+            yield {'amount': i, 'kind': u'caf\xe9' if i % 2 else None}
+
+    def test_csv_chunks(self):
+        chunks = upload.csv_chunks(self.rows(5), ['amount', 'kind'],
+                                   rows_per_chunk=2)
+        self.assertEqual(chunks.next(),
+                         'amount,kind\r\n0,\r\n1,caf\xc3\xa9\r\n')
+        self.assertEqual(self.consumed, 2)
+        self.assertEqual(list(chunks), ['2,\r\n3,caf\xc3\xa9\r\n', '4,\r\n'])
+        with self.assertRaises(PyBambooException):
+            list(upload.csv_chunks(self.rows(2), ['amount']))
+
+    def test_from_rows(self):
+        dataset = Dataset.from_rows(self.rows(2500),
+                                    connection=self.connection)
+        self.assertEqual(self.consumed, 2500)
+        self.assertEqual(dataset.get_data(count=True), 2500)
+        rows = dataset.get_data(order_by='amount', limit=2)
+        self.assertEqual([row['amount'] for row in rows], [0, 1])
+        self.assertEqual(rows[1]['kind'], u'caf\xe9')
+
+    def test_from_rows_schema(self):
+        rows = [{'code': '007', 'day': datetime.date(2013, 1, 2)},
+                {'code': '010'}]
+        dataset = Dataset.from_rows(rows, schema={'code': 'string',
+                                                  'day': 'datetime'},
+                                    connection=self.connection)
+        schema = dataset.get_info()['schema']
+        self.assertEqual(schema['code']['simpletype'], 'string')
+        self.assertEqual(schema['day']['simpletype'], 'datetime')
+        self.assertEqual(sorted(row['code'] for row in dataset.get_data()),
+                         ['007', '010'])
+
+    def test_from_rows_columns_na_values(self):
+        rows = [{'amount': 1, 'note': 'n/a'}, {'amount': 2, 'note': 'ok'}]
+        dataset = Dataset.from_rows(rows, columns=['amount', 'note', 'x'],
+                                    na_values=['n/a'],
+                                    connection=self.connection)
+        self.assertEqual(dataset.NA_VALUES, ['n/a'])
+        info = dataset.get_info()
+        self.assertEqual(sorted(info['schema']), ['amount', 'note', 'x'])
+        self.assertEqual(dataset.get_data(query={'note': 'ok'},
+                                          select=['amount']),
+                         [{'amount': 2}])
+
+    def test_from_rows_sharded(self):
+        connection = ShardedConnection([self.connection.url])
+        dataset = Dataset.from_rows(self.rows(3), connection=connection)
+        self.assertEqual(dataset.get_data(count=True), 3)
+
+    def test_from_rows_invalid(self):
+        for rows in ([], [['not', 'a', 'dict']]):
+            with self.assertRaises(PyBambooException):
+                Dataset.from_rows(rows, connection=self.connection)
+        with self.assertRaises(PyBambooException):
+            Dataset.from_rows(self.rows(1), na_values='n/a',
+                              connection=self.connection)
+        with self.assertRaises(PyBambooException):
+            Dataset.from_rows([{'amount': 1}, {'other': 2}],
+                              connection=self.connection)
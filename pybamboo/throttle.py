@@ -0,0 +1,216 @@
+import threading
+import time
+
+from pybamboo.exceptions import DeadlineExceeded, PyBambooException
+from pybamboo.utils import PicklableLocks
+
+
+READ = 'read'
+WRITE = 'write'
+ENDPOINT_CLASSES = {
+    'GET': READ,
+    'POST': WRITE,
+    'PUT': WRITE,
+    'DELETE': WRITE,
+}
+
+
+def endpoint_class(http_method):
+    """
+    Returns the endpoint class (read | write) of an HTTP method.
+    """
+    return ENDPOINT_CLASSES.get(http_method.upper(), WRITE)
+
+
+class TokenBucket(PicklableLocks):
+    """
+    A token bucket rate limiter.
+
+    *rate* tokens are added to the bucket every second, up to *capacity*
+    tokens (defaults to *rate*, i.e. one second worth of burst).
+    """
+
+    def __init__(self, rate, capacity=None, clock=time.time,
+                 sleep=time.sleep):
+        if rate <= 0:
+            raise PyBambooException('rate must be greater than 0.')
+        self.rate = float(rate)
+        self.capacity = float(capacity if capacity is not None else rate)
+        if self.capacity < 1:
+            raise PyBambooException('capacity must be at least 1.')
+        self._tokens = self.capacity
+        self._clock = clock
+        self._sleep = sleep
+        self._last = clock()
+        PicklableLocks.__init__(self)
+
+    def _refill(self):
+        now = self._clock()
+        elapsed = max(0.0, now - self._last)
+        self._tokens = min(self.capacity, self._tokens + elapsed * self.rate)
+        self._last = now
+
+    def try_acquire(self, tokens=1):
+        """
+        Takes *tokens* from the bucket if they are available.
+        Returns whether or not they were taken.
+        """
+        with self._lock:
+            self._refill()
+            if self._tokens >= tokens:
+                self._tokens -= tokens
+                return True
+            return False
+
+    def acquire(self, tokens=1, deadline=None):
+        """
+        Takes *tokens* from the bucket, sleeping until they are available.
+        Returns the time spent waiting.
+
+        Raises DeadlineExceeded, without waiting, if they will not be
+        available before the pybamboo.deadline.Deadline *deadline*.
+        """
+        if tokens > self.capacity:
+            raise PyBambooException('cannot acquire more tokens than the '
+                                    'bucket capacity.')
+        waited = 0.0
+        while True:
+            with self._lock:
+                self._refill()
+                if self._tokens >= tokens:
+                    self._tokens -= tokens
+                    return waited
+                delay = (tokens - self._tokens) / self.rate
+            if deadline is not None and delay > deadline.remaining():
+                raise DeadlineExceeded('Deadline exceeded waiting for the '
+                                       'rate limit.')
+            self._sleep(delay)
+            waited += delay
+
+
+class AdaptiveConcurrencyLimit(PicklableLocks):
+    """
+    An AIMD (additive increase, multiplicative decrease) limit on the
+    number of requests in flight.
+
+    Every successful, fast request grows the limit by *increase* per
+    window of *limit* requests; every failed or slow request shrinks it
+    by the factor *decrease*.  A request is slow when its latency is
+    above *latency_tolerance* times the smoothed baseline latency (or
+    above *max_latency* seconds when given).  The limit is decreased at
+    most once per window so that a burst of concurrent failures counts
+    as a single congestion signal.
+    """
+
+    LOCKS = {'_condition': threading.Condition}
+
+    def __init__(self, initial=4, minimum=1, maximum=64, increase=1.0,
+                 decrease=0.5, latency_tolerance=2.0, max_latency=None,
+                 smoothing=0.1):
+        if not 1 <= minimum <= initial <= maximum:
+            raise PyBambooException('limits must satisfy '
+                                    '1 <= minimum <= initial <= maximum.')
+        if not 0 < decrease < 1:
+            raise PyBambooException('decrease must be between 0 and 1.')
+        self.minimum = minimum
+        self.maximum = maximum
+        self.increase = float(increase)
+        self.decrease = float(decrease)
+        self.latency_tolerance = latency_tolerance
+        self.max_latency = max_latency
+        self.smoothing = smoothing
+        self._limit = float(initial)
+        self._in_flight = 0
+        self._baseline = None
+        self._since_decrease = 0
+        PicklableLocks.__init__(self)
+
+    def __getstate__(self):
+        state = PicklableLocks.__getstate__(self)
+        state['_in_flight'] = 0  # the requests of the pickling process
+        return state
+
+    def _after_fork(self):
+        self._in_flight = 0  # the requests of the parent process
+
+    @property
+    def limit(self):
+        return int(self._limit)
+
+    @property
+    def in_flight(self):
+        return self._in_flight
+
+    def acquire(self, deadline=None):
+        """
+        Blocks until a request slot is available and takes it.  Raises
+        DeadlineExceeded if none is before the pybamboo.deadline.Deadline
+        *deadline*.
+        """
+        with self._condition:
+            while self._in_flight >= int(self._limit):
+                if deadline is None:
+                    self._condition.wait()
+                    continue
+                if deadline.expired:
+                    raise DeadlineExceeded('Deadline exceeded waiting for a '
+                                           'request slot.')
+                self._condition.wait(deadline.remaining())
+            self._in_flight += 1
+
+    def release(self, latency, success=True):
+        """
+        Gives back a request slot, adjusting the limit from the *latency*
+        (in seconds) and the *success* of the request.
+        """
+        with self._condition:
+            self._in_flight -= 1
+            self._since_decrease += 1
+            if success and not self._is_slow(latency):
+                self._limit = min(self.maximum,
+                                  self._limit + self.increase / self._limit)
+            elif self._since_decrease >= int(self._limit):
+                self._limit = max(self.minimum, self._limit * self.decrease)
+                self._since_decrease = 0
+            if success:
+                self._update_baseline(latency)
+            self._condition.notify_all()
+
+    def _is_slow(self, latency):
+        if self.max_latency is not None and latency > self.max_latency:
+            return True
+        if self._baseline is None or not self.latency_tolerance:
+            return False
+        return latency > self._baseline * self.latency_tolerance
+
+    def _update_baseline(self, latency):
+        if self._baseline is None:
+            self._baseline = latency
+        else:
+            self._baseline += self.smoothing * (latency - self._baseline)
+
+
+class Throttle(object):
+    """
+    Client-side limits for one endpoint class: an optional token bucket
+    (*rate* requests per second with bursts of *burst*) and an optional
+    adaptive concurrency limit (*concurrency*, either an int for the
+    initial limit or an AdaptiveConcurrencyLimit).
+    """
+
+    def __init__(self, rate=None, burst=None, concurrency=None):
+        self.bucket = TokenBucket(rate, burst) if rate is not None else None
+        if isinstance(concurrency, (int, long)):
+            concurrency = AdaptiveConcurrencyLimit(
+                initial=concurrency, maximum=max(concurrency, 64))
+        self.concurrency = concurrency
+
+    def acquire(self, deadline=None):
+        if self.bucket is not None:
+            self.bucket.acquire(deadline=deadline)
+        if self.concurrency is not None:
+            self.concurrency.acquire(deadline)
+
+    def release(self, latency, success=True):
+        if self.concurrency is not None:
+            self.concurrency.release(latency, success)
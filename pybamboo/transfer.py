@@ -0,0 +1,131 @@
+"""
+Copying a dataset to another bamboo instance, its rows streamed from the
+source to the target without touching the local disk.
+
+A thread downloads the rows in batches (see Dataset.iter_batches) into a
+queue holding at most a few batches, while the rows taken from the queue
+are encoded and uploaded to the target (see pybamboo.upload): downloading
+and uploading overlap, and memory use does not grow with the dataset.
+The schema, info and calculations of the dataset are copied with it.
+"""
+import Queue
+import sys
+import threading
+
+from pybamboo import upload
+from pybamboo.deadline import Deadline
+from pybamboo.exceptions import PyBambooException
+from pybamboo.parallel import DEFAULT_WORKERS
+from pybamboo.sync import NULL
+
+
+BATCH_SIZE = 10000
+# batches downloaded ahead of the upload
+BUFFERED_BATCHES = 2
+SCHEMA_FIELDS = ['label', 'olap_type', 'simpletype']
+INFO_FIELDS = ['attribution', 'description', 'label', 'license']
+# how often a blocked producer checks whether it should stop, in seconds
+POLL_INTERVAL = 0.1
+
+_DONE = object()
+
+
+def buffered(items, size=BUFFERED_BATCHES):
+    """
+    Yields the items of the iterable *items*, produced ahead by a thread
+    into a queue of at most *size* items.  Errors raised producing them
+    are raised here; the thread stops when the items stop being consumed.
+    """
+    queue = Queue.Queue(size)
+    stop = threading.Event()
+
+    def put(item):
+        while not stop.is_set():
+            try:
+                queue.put(item, timeout=POLL_INTERVAL)
+                return True
+            except Queue.Full:
+                pass
+        return False
+
+    def produce():
+        try:
+            for item in items:
+                if not put((item, None)):
+                    return
+            put((_DONE, None))
+        except Exception:
+            put((None, sys.exc_info()))
+        finally:
+            close = getattr(items, 'close', None)
+            if close is not None:
+                close()
+
+    thread = threading.Thread(target=produce)
+    thread.daemon = True
+    thread.start()
+    try:
+        while True:
+            item, error = queue.get()
+            if error is not None:
+                raise error[0], error[1], error[2]
+            if item is _DONE:
+                return
+            yield item
+    finally:
+        stop.set()
+        thread.join()
+
+
+def _copied_rows(batches, schema):
+    strings = set(column for column, description in schema.iteritems()
+                  if description.get('simpletype') == 'string')
+    for rows in batches:
+        for row in rows:
+            for column, value in row.iteritems():
+                if value != value or (value == NULL and column in strings):
+                    # NaN or a missing string
+                    row[column] = None
+            yield row
+
+
+def copy_dataset(dataset, connection, batch_size=BATCH_SIZE,
+                 workers=DEFAULT_WORKERS,
+                 buffered_batches=BUFFERED_BATCHES, deadline=None):
+    """
+    Copies *dataset* to the bamboo of *connection* and returns the copy.
+    Its rows are downloaded in batches of *batch_size* rows, up to
+    *workers* at once and *buffered_batches* ahead of the upload.
+    Calculated columns are not copied: the calculations are added to
+    the copy once its rows are uploaded.
+    """
+    deadline = Deadline.coerce(deadline)
+    info = dataset.get_info(deadline=deadline)
+    calculations = dataset.get_calculations(deadline=deadline)
+    for response in (info, calculations):
+        if isinstance(response, dict) and 'error' in response:
+            raise PyBambooException(response['error'])
+    calculated = set(calculation['name'] for calculation in calculations
+                     if not calculation.get('group'))
+    schema = dict(
+        (column, dict((field, description[field])
+                      for field in SCHEMA_FIELDS if field in description))
+        for column, description in info['schema'].iteritems()
+        if column not in calculated)
+    columns = sorted(schema)
+    batches = dataset.iter_batches(select=columns, batch_size=batch_size,
+                                   workers=workers, deadline=deadline)
+    rows = _copied_rows(buffered(batches, buffered_batches), schema)
+    response, na_values = upload.upload_rows(connection, rows, columns,
+                                             schema, deadline=deadline)
+    if not response.get('id'):
+        raise PyBambooException(response.get('error', response))
+    copy = type(dataset)(response['id'], connection=connection)
+    fields = dict((field, info[field]) for field in INFO_FIELDS
+                  if info.get(field) is not None)
+    if fields:
+        copy.set_info(deadline=deadline, **fields)
+    if calculations:
+        copy.sync_calculations(calculations, workers=workers,
+                               deadline=deadline)
+    return copy
@@ -0,0 +1,172 @@
+"""
+Datasets created from iterables of rows, encoded to CSV as they are
+uploaded.
+
+The rows are written into a multipart/form-data body generated a chunk at
+a time, which requests sends with chunked transfer encoding: neither the
+rows nor their CSV are ever held in memory in full or written to disk.
+"""
+import StringIO
+import csv
+import datetime
+import itertools
+import uuid
+
+from pybamboo import schema as _schema
+from pybamboo.exceptions import PyBambooException
+from pybamboo.schema import sdf
+from pybamboo.utils import safe_json_dumps
+
+
+ROWS_PER_CHUNK = 1000
+
+
+def first_columns(rows):
+    """
+    Returns the sorted columns of the first of *rows* and an iterator
+    over all of *rows*.
+    """
+    rows = iter(rows)
+    for first in rows:
+        if not isinstance(first, dict):
+            raise PyBambooException('rows must be dicts.')
+        return sorted(first), itertools.chain([first], rows)
+    raise PyBambooException('rows must contain at least one row.')
+
+
+def _csv_value(value):
+    if value is None:
+        return ''
+    if isinstance(value, unicode):
+        return value.encode('utf-8')
+    if isinstance(value, datetime.datetime) and value.tzinfo is not None:
+        value = (value - value.utcoffset()).replace(tzinfo=None)
+    if isinstance(value, (datetime.date, datetime.datetime)):
+        return value.isoformat()
+    return value
+
+
+def csv_chunks(rows, columns, rows_per_chunk=ROWS_PER_CHUNK, observe=None,
+               observed_rows=None):
+    """
+    Yields the CSV of the dicts *rows* with the header *columns*,
+    *rows_per_chunk* rows at a time.  Columns missing from a row are left
+    empty, rows with other columns raise PyBambooException.
+
+    *observe* is called with the string values of each of the first
+    *observed_rows* rows (all rows if None).
+    """
+    known = set(columns)
+    buffer = StringIO.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow([_csv_value(column) for column in columns])
+    for count, row in enumerate(rows, 1):
+        if not isinstance(row, dict):
+            raise PyBambooException('rows must be dicts.')
+        unknown = set(row) - known
+        if unknown:
+            raise PyBambooException('Unknown columns in row %d: %s.' % (
+                count, ', '.join(sorted(unknown))))
+        values = [_csv_value(row.get(column)) for column in columns]
+        writer.writerow(values)
+        if observe is not None and (observed_rows is None or
+                                    count <= observed_rows):
+            observe([value if isinstance(value, str) else str(value)
+                     for value in values])
+        if count % rows_per_chunk == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue()
+
+
+def multipart_body(boundary, parts):
+    """
+    Yields the multipart/form-data body of the (name, filename, content)
+    *parts*, form fields having no filename.  The content is a string, an
+    iterable of strings, or a callable returning either, called once the
+    preceding parts are sent.
+    """
+    for name, filename, content in parts:
+        if filename is None:
+            yield ('--%s\r\nContent-Disposition: form-data; name="%s"'
+                   '\r\n\r\n' % (boundary, name))
+        else:
+            yield ('--%s\r\nContent-Disposition: form-data; name="%s"; '
+                   'filename="%s"\r\nContent-Type: application/octet-stream'
+                   '\r\n\r\n' % (boundary, name, filename))
+        if callable(content):
+            content = content()
+        if isinstance(content, basestring):
+            content = [content]
+        for chunk in content:
+            if isinstance(chunk, unicode):
+                chunk = chunk.encode('utf-8')
+            # an empty chunk would end the chunked transfer encoding
+            if chunk:
+                yield chunk
+        yield '\r\n'
+    yield '--%s--\r\n' % boundary
+
+
+def post_multipart(connection, url, parts, deadline=None):
+    """
+    POSTs the multipart/form-data body of *parts* (see multipart_body) to
+    *url*, streaming it.  The body is consumed as it is sent, so the
+    request is never retried.
+    """
+    boundary = uuid.uuid4().hex
+    return connection.make_api_request(
+        'POST', url, data=multipart_body(boundary, parts),
+        headers={'Content-Type': 'multipart/form-data; boundary=%s' %
+                 boundary},
+        deadline=deadline, num_retries=0)
+
+
+def _json(data, name):
+    return safe_json_dumps(data, PyBambooException(
+        '%s are not JSON-serializable' % name))
+
+
+def upload_rows(connection, rows, columns=None, schema=None,
+                na_values=None, infer_schema=False, deadline=None):
+    """
+    Creates a dataset from the dicts *rows*, encoded to CSV as they are
+    uploaded, and returns bamboo's response and the n/a values sent.
+    *columns* default to those of *schema* (see sdf), or else to those of
+    the first row.
+
+    With *infer_schema* and no *schema*, the schema and n/a values are
+    inferred from the first rows as they are encoded (see
+    pybamboo.schema) and sent after them.
+    """
+    if na_values is not None:
+        na_values = list(na_values)
+    if schema is not None:
+        schema = sdf(schema)
+    if columns is None:
+        if schema:
+            columns = sorted(schema)
+        else:
+            columns, rows = first_columns(rows)
+    if schema is None and infer_schema:
+        inference = _schema.SchemaInference(columns, na_values)
+        parts = [
+            ('csv_file', 'data.csv', csv_chunks(
+                rows, columns, observe=inference.observe,
+                observed_rows=_schema.SAMPLE_SIZE)),
+            ('schema', 'data.schema.json',
+             lambda: _json(inference.sdf(), 'schema')),
+            ('na_values', None,
+             lambda: _json(inference.all_na_values(), 'na_values')),
+        ]
+        response = post_multipart(connection, '/datasets', parts, deadline)
+        return response, inference.all_na_values()
+    parts = []
+    if na_values is not None:
+        parts.append(('na_values', None, _json(na_values, 'na_values')))
+    if schema is not None:
+        parts.append(('schema', 'data.schema.json', _json(schema, 'schema')))
+    parts.append(('csv_file', 'data.csv', csv_chunks(rows, columns)))
+    return post_multipart(connection, '/datasets', parts, deadline), \
+        na_values
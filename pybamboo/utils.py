@@ -1,7 +1,20 @@
+import datetime
+import os
+import threading
+
 import simplejson as json
 from bson import json_util
 
 
+DATETIME_FORMATS = [
+    '%Y-%m-%d',
+    '%Y-%m-%dT%H:%M:%S',
+    '%Y-%m-%d %H:%M:%S',
+    '%Y-%m-%dT%H:%M:%S.%f',
+    '%Y-%m-%d %H:%M:%S.%f',
+]
+
+
 def safe_json_loads(string, exception):
     try:
         return json.loads(string, object_hook=json_util.object_hook)
@@ -14,3 +27,69 @@ def safe_json_dumps(data, exception):
         return json.dumps(data)
     except TypeError:
         raise exception
+
+
+def decode_csv_rows(reader):
+    """
+    Yields the rows of the csv.DictReader *reader* with their UTF-8 keys
+    and values decoded, leaving out missing and extra fields.
+    """
+    for row in reader:
+        yield dict((key.decode('utf-8'), value.decode('utf-8'))
+                   for key, value in row.iteritems()
+                   if key is not None and value is not None)
+
+
+def parse_datetime(value):
+    """
+    Returns the naive datetime of the string *value* in one of
+    DATETIME_FORMATS, None if it is not a date.
+    """
+    for date_format in DATETIME_FORMATS:
+        try:
+            return datetime.datetime.strptime(value, date_format)
+        except ValueError:
+            pass
+    return None
+
+
+class PicklableLocks(object):
+    """
+    Mixin for objects holding locks: the attributes named in LOCKS,
+    created by their factory in each process.  They are left out when the
+    object is pickled, and created anew when it is unpickled or first used
+    in a forked child, where a thread of the parent may have held them.
+    _after_fork() is then called to reset the state those threads left.
+    """
+
+    LOCKS = {'_lock': threading.Lock}
+
+    def __init__(self):
+        self._create_locks()
+
+    def _create_locks(self):
+        self._locks = dict((name, factory())
+                           for name, factory in self.LOCKS.iteritems())
+        self._locks_pid = os.getpid()
+
+    def _after_fork(self):
+        pass
+
+    def __getattr__(self, name):
+        # only called for the locks, which are not instance attributes
+        if name not in self.LOCKS or '_locks' not in self.__dict__:
+            raise AttributeError(name)
+        if self._locks_pid != os.getpid():
+            self._create_locks()
+            self._after_fork()
+        return self._locks[name]
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state.pop('_locks', None)
+        state.pop('_locks_pid', None)
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._create_locks()
@@ -1,4 +1,4 @@
-from distutils.core import setup
+from setuptools import setup
 
 setup(
     name='pybamboo',
@@ -11,8 +11,13 @@ setup(
     description='A Python package to interact with bamboo.io.',
     long_description=open('README.rst', 'rt').read(),
     install_requires=[
-        'requests==0.14.0',
+        'requests==2.4.3',
         'simplejson==2.6.2',
         'pymongo==2.5'
     ],
+    entry_points={
+        'console_scripts': [
+            'pybamboo = pybamboo.cli:main',
+        ],
+    },
 )